@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Longest amenity name stored in the amenities table
+MAX_NAME_LENGTH = 64
+
+
+def amenity_key(name):
+    """Normalize an amenity name for matching, e.g. " Jacuzzi  tub" -> "jacuzzi tub"."""
+    return ' '.join(name.split()).lower()
+
+def parse_amenities(text):
+    """Split a comma-separated amenities string into distinct names, in order.
+
+    Returns:
+        dict: key -> display name
+    """
+    names = {}
+    for part in (text or '').split(','):
+        name = ' '.join(part.split())[:MAX_NAME_LENGTH]
+        if name:
+            names.setdefault(amenity_key(name), name)
+    return names
+
+
+class AmenityIndex:
+    """Bitsets of the rooms that have each amenity.
+
+    Each amenity maps to a Python int with bit n set when the room with
+    id n has the amenity, so rooms having every one of several amenities
+    are found by AND-ing a few ints, without touching the database.
+
+    Args:
+        names: amenity id -> display name
+        pairs: Iterable of (room id, amenity id)
+    """
+
+    def __init__(self, names, pairs):
+        self.names = dict(names)
+        self.bits = dict.fromkeys(self.names, 0)
+        for room_id, amenity_id in pairs:
+            self.bits[amenity_id] = self.bits.get(amenity_id, 0) | (1 << room_id)
+
+    def choices(self):
+        """(amenity id, name) pairs for the amenities at least one room has, by name."""
+        return sorted(((amenity_id, self.names[amenity_id]) for amenity_id, bits in self.bits.items() if bits),
+                      key=lambda choice: choice[1].lower())
+
+    def rooms_with_all(self, amenity_ids):
+        """Return the IDs of the rooms that have every one of the given amenities."""
+        matched = None
+        for amenity_id in amenity_ids:
+            bits = self.bits.get(amenity_id, 0)
+            matched = bits if matched is None else matched & bits
+            if not matched:
+                return []
+
+        room_ids = []
+        while matched:
+            lowest = matched & -matched
+            room_ids.append(lowest.bit_length() - 1)
+            matched ^= lowest
+        return room_ids
+
+
+_index = None
+_index_loaded_at = 0
+_index_lock = threading.Lock()
+
+def load_amenity_index():
+    """Build an AmenityIndex from the amenities tables."""
+    from app import db
+    from models import Amenity, room_amenities
+
+    names = db.session.query(Amenity.id, Amenity.name).all()
+    pairs = db.session.query(room_amenities.c.room_id, room_amenities.c.amenity_id).all()
+    return AmenityIndex(names, pairs)
+
+def get_amenity_index():
+    """Return the cached amenity index, rebuilding it when stale."""
+    from flask import current_app
+
+    global _index, _index_loaded_at
+    ttl = current_app.config.get('AMENITY_INDEX_TTL', 300)
+    with _index_lock:
+        if _index is not None and time.monotonic() - _index_loaded_at <= ttl:
+            return _index
+
+    index = load_amenity_index()
+    with _index_lock:
+        _index = index
+        _index_loaded_at = time.monotonic()
+    logger.info(f"Amenity index loaded: {len(index.names)} amenities")
+    return index
+
+def invalidate_amenity_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+def set_room_amenities(session, room, pending=None):
+    """Point a room's amenity tags at the amenities listed in its amenities text.
+
+    Amenities not seen before are created. `pending` maps keys to
+    amenities created earlier in the same flush, so two rooms gaining
+    the same new amenity share one row.
+    """
+    from models import Amenity
+
+    pending = {} if pending is None else pending
+    names = parse_amenities(room.amenities)
+    with session.no_autoflush:
+        known = {a.key: a for a in session.query(Amenity).filter(Amenity.key.in_(list(names)))} if names else {}
+        tags = []
+        for key, name in names.items():
+            amenity = known.get(key) or pending.get(key)
+            if amenity is None:
+                amenity = pending[key] = Amenity(name=name, key=key)
+                session.add(amenity)
+            tags.append(amenity)
+        room.amenity_tags = tags
+
+def sync_all_room_amenities():
+    """Re-derive every room's amenity tags, e.g. for rooms added before tags existed.
+
+    Returns:
+        int: Number of rooms synced
+    """
+    from app import db
+    from models import Room
+
+    rooms = Room.query.all()
+    pending = {}
+    for room in rooms:
+        set_room_amenities(db.session, room, pending)
+    db.session.commit()
+    return len(rooms)
+
+@event.listens_for(Session, 'before_flush')
+def _tag_changed_rooms(session, flush_context, instances):
+    from models import Room
+
+    pending = {}
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Room) and (obj in session.new or inspect(obj).attrs.amenities.history.has_changes()):
+            set_room_amenities(session, obj, pending)
+
+@event.listens_for(Session, 'after_flush')
+def _note_amenity_changes(session, flush_context):
+    from models import Room, Amenity
+
+    if any(isinstance(obj, (Room, Amenity)) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info['amenities_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _reload_amenities(session):
+    if session.info.pop('amenities_changed', False):
+        invalidate_amenity_index()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_amenity_changes(session):
+    session.info.pop('amenities_changed', None)
@@ -1,11 +1,13 @@
 import os
 import logging
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from flask_login import LoginManager
 from flask_mail import Mail
 from flask_wtf.csrf import CSRFProtect
+import replicas
 
 # Configure logging
 logging.basicConfig(
@@ -22,7 +24,7 @@ logger = logging.getLogger(__name__)
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': replicas.RoutingSession})
 login_manager = LoginManager()
 mail = Mail()
 csrf = CSRFProtect()
@@ -44,6 +46,53 @@ login_manager.login_message_category = 'info'
 mail.init_app(app)
 csrf.init_app(app)
 
+# Route read-only views to replicas when SQLALCHEMY_BINDS configures any
+replicas.init_app(app)
+
+# Cache rendered room card fragments
+import fragment_cache
+fragment_cache.init_app(app)
+
+# Memoize check_availability answers for a few seconds
+import availability_cache
+availability_cache.init_app(app)
+
+# Hash passwords in a bounded pool with the configured parameters
+import passwords
+passwords.init_app(app)
+
+# Serve the logged-in user from a short-lived identity cache
+import user_cache
+user_cache.init_app(app)
+
+# Answer username/email availability probes from a Bloom filter
+import identity_filter
+identity_filter.init_app(app)
+
+# Async engine for the JSON API
+import async_db
+async_db.init_app(app)
+
+# Fingerprinted, precompressed static assets from `flask build-assets`
+import static_assets
+static_assets.init_app(app)
+
+# Compiled templates cached on disk across worker restarts
+import template_cache
+template_cache.init_app(app)
+
+# Uploaded room images and their responsive variants
+import room_images
+room_images.init_app(app)
+
+# Compress HTML and JSON responses
+import compression
+compression.init_app(app)
+
+# Admin dashboard statistics served from a background-refreshed snapshot
+import dashboard_stats
+dashboard_stats.init_app(app)
+
 # Import models and initialize them
 with app.app_context():
     from models import User, Room, Booking
@@ -52,23 +101,123 @@ with app.app_context():
     db.create_all()
     logger.info("Database tables created or already exist")
 
+# Full-text index for keyword room search
+import room_search
+room_search.init_app(app)
+
 # Import and register blueprints
 from routes.auth import bp as auth_bp
 from routes.admin import bp as admin_bp
 from routes.booking import bp as booking_bp
 from routes.main import bp as main_bp
+from routes.api import bp as api_bp
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(admin_bp)
 app.register_blueprint(booking_bp)
 app.register_blueprint(main_bp)
+app.register_blueprint(api_bp)
+csrf.exempt(api_bp)  # JSON-only POSTs, see routes/api.py
 logger.info("Blueprints registered")
 
+# Idempotency keys for booking form posts
+from idempotency import new_idempotency_key, purge_expired_keys
+app.jinja_env.globals['idempotency_key'] = new_idempotency_key
+
+@app.cli.command('purge-idempotency-keys')
+def purge_idempotency_keys_command():
+    """Delete expired idempotency keys."""
+    deleted = purge_expired_keys()
+    print(f"Deleted {deleted} expired idempotency keys.")
+
+@app.cli.command('sync-sqlite-replicas')
+def sync_sqlite_replicas_command():
+    """Copy the primary SQLite database into the configured SQLite replicas."""
+    for path in replicas.sync_sqlite_replicas(app):
+        print(f"Synced replica {path}")
+
+@app.cli.command('optimize-rooms')
+@click.option('--apply', is_flag=True, help='Save the new room assignments instead of only reporting them.')
+def optimize_rooms_command(apply):
+    """Re-pack bookings made by room type and report the room-nights recovered."""
+    from room_assignment import optimize_room_assignments
+    for result in optimize_room_assignments(apply=apply):
+        print(f"{result.room_type}: {result.rooms} rooms, {result.bookings} bookings "
+              f"({result.flexible_bookings} flexible), {result.moved} moved, "
+              f"stranded nights {result.stranded_before} -> {result.stranded_after} "
+              f"(recovered {result.recovered})")
+
+@app.cli.command('sync-amenities')
+def sync_amenities_command():
+    """Derive the amenity tags of every room from its amenities text."""
+    from amenities import sync_all_room_amenities
+    print(f"Synced amenities of {sync_all_room_amenities()} rooms.")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the keyword search index from the rooms table."""
+    room_search.rebuild_index()
+    print("Rebuilt the room keyword search index.")
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress the static assets; run on every deploy, before starting the app."""
+    manifest = static_assets.build_assets(app)
+    print(f"Built {len(manifest)} static assets.")
+
+@app.cli.command('render-room-images')
+def render_room_images_command():
+    """Render the variants of uploaded room images that have none, e.g. after a restart dropped queued renders."""
+    print(f"Rendered images of {room_images.render_missing_variants()} rooms.")
+
+@app.cli.command('import-room-images')
+def import_room_images_command():
+    """Download the remote images of the rooms and render their variants, so they get srcsets too."""
+    print(f"Imported images of {room_images.import_remote_images()} rooms.")
+
+@app.cli.command('precompile-templates')
+def precompile_templates_command():
+    """Compile every template into the bytecode cache; run on every deploy, before starting the app."""
+    print(f"Precompiled {template_cache.precompile_templates(app)} templates.")
+
+@app.cli.command('run-reports')
+@click.option('--job', 'jobs', multiple=True, help='Run only this report job (repeatable).')
+@click.option('--rebuild', is_flag=True, help='Start the jobs over from the first booking.')
+def run_reports_command(jobs, rebuild):
+    """Fold the bookings changed since the last run into the report summary tables; run nightly."""
+    from reporting import JOBS, rebuild_job, run_jobs
+    unknown = set(jobs) - set(JOBS)
+    if unknown:
+        raise click.BadParameter(f"Unknown report jobs: {', '.join(sorted(unknown))}", param_hint='--job')
+    if rebuild:
+        for name in jobs or JOBS:
+            rebuild_job(JOBS[name], app.config.get('REPORTING_BATCH_SIZE', 500))
+    for name, processed in run_jobs(jobs or None).items():
+        print(f"{name}: {processed} bookings processed")
+
+@app.cli.command('archive-bookings')
+@click.option('--batch-size', default=1000, show_default=True, help='Bookings moved per transaction.')
+def archive_bookings_command(batch_size):
+    """Move bookings that checked out more than BOOKING_RETENTION_DAYS ago into bookings_archive; run nightly."""
+    from archive import archive_bookings
+    print(f"Archived {archive_bookings(batch_size=batch_size)} bookings.")
+
+@app.cli.command('expire-waitlist-offers')
+def expire_waitlist_offers_command():
+    """Put lapsed or lost waitlist offers back on the waitlist and offer their nights again."""
+    from waitlist import expire_offers
+    print(f"Put {expire_offers()} waitlist offers back on the waitlist.")
+
+@app.cli.command('rematch-waitlist')
+def rematch_waitlist_command():
+    """Offer free rooms to every waiting guest, e.g. after a restart dropped queued matches."""
+    from waitlist import rematch_waitlist
+    print(f"Made {rematch_waitlist()} waitlist offers.")
+
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    return user_cache.load_cached_user(int(user_id))
 
 # Error handlers
 @app.errorhandler(404)
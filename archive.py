@@ -0,0 +1,85 @@
+import logging
+from datetime import date, timedelta
+from sqlalchemy import delete, insert, select, text
+
+logger = logging.getLogger(__name__)
+
+# Columns copied from bookings into bookings_archive
+ARCHIVED_COLUMNS = (
+    'id', 'user_id', 'room_id', 'check_in_date', 'check_out_date', 'guests', 'total_price',
+    'booking_status', 'payment_status', 'group_id', 'room_flexible', 'created_at', 'updated_at',
+)
+
+def _reuses_ids(db):
+    """Whether a new booking could be given the ID of an archived one.
+
+    SQLite hands out the highest free rowid unless the table was created
+    with AUTOINCREMENT, so once the newest bookings are archived their IDs
+    would be given to new ones.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    schema = db.session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bookings'")).scalar()
+    return 'AUTOINCREMENT' not in (schema or '').upper()
+
+def archive_bookings(before=None, batch_size=1000):
+    """Move bookings whose stay ended before a date into bookings_archive.
+
+    Each batch is copied and deleted in one transaction, so a booking is
+    always in exactly one of the two tables, and an interrupted run can
+    simply be started again.
+
+    Args:
+        before: Archive stays that checked out before this date; defaults to
+            BOOKING_RETENTION_DAYS before today
+        batch_size: Bookings moved per transaction
+
+    Returns:
+        int: Number of bookings archived
+
+    Raises:
+        RuntimeError: On a SQLite bookings table that would reuse archived IDs
+    """
+    from flask import current_app
+    from app import db
+    from models import Booking, ArchivedBooking
+
+    if _reuses_ids(db):
+        raise RuntimeError("The bookings table reuses IDs; rebuild it with AUTOINCREMENT before archiving.")
+    if before is None:
+        before = date.today() - timedelta(days=current_app.config.get('BOOKING_RETENTION_DAYS', 90))
+    columns = [getattr(Booking, name) for name in ARCHIVED_COLUMNS]
+    archived = 0
+
+    while True:
+        ids = db.session.scalars(
+            select(Booking.id).where(Booking.check_out_date < before).order_by(Booking.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        db.session.execute(insert(ArchivedBooking).from_select(
+            list(ARCHIVED_COLUMNS),
+            select(*columns).where(Booking.id.in_(ids))
+        ))
+        db.session.execute(delete(Booking).where(Booking.id.in_(ids)), execution_options={'synchronize_session': False})
+        db.session.commit()
+        archived += len(ids)
+        logger.info(f"Archived {len(ids)} bookings (up to ID {ids[-1]})")
+
+    return archived
+
+def find_booking(booking_id):
+    """Return a booking by ID, from the archive if it has been moved there, or None."""
+    from app import db
+    from models import Booking, ArchivedBooking
+
+    return db.session.get(Booking, booking_id) or db.session.get(ArchivedBooking, booking_id)
+
+def with_history(bookings, archived):
+    """Merge current and archived bookings, newest first.
+
+    Args:
+        bookings: Query of current bookings
+        archived: The matching query of archived bookings
+    """
+    return sorted(bookings.all() + archived.all(), key=lambda booking: booking.created_at, reverse=True)
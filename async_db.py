@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+# Async driver for each database backend the app runs on
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+}
+
+# Session factories for reads and for writes
+_sessionmakers = {}
+_initialized = False
+_initialize_lock = threading.Lock()
+
+def async_url(url):
+    """Turn a sync database URL into the same URL on the backend's async driver."""
+    url = make_url(url)
+    backend = url.drivername.split('+', 1)[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def _begin_immediate(engine):
+    """Make SQLite transactions take the write lock when they start.
+
+    A deferred transaction that reads and then writes fails with
+    "database is locked" if another writer got in between, and nothing
+    stops two of them from reading the same free room. Taking the lock
+    up front queues writers behind each other instead. SQLite's busy
+    handler isn't fair, so under load a writer can wait through several
+    others; the engine gets a longer busy timeout for that, and must have
+    the driver's own transaction handling turned off (isolation_level=None).
+    """
+    @event.listens_for(engine.sync_engine, 'begin')
+    def _begin(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+async def _initialize(engine):
+    async with engine.connect():
+        pass
+
+def _initialize_engines():
+    """Connect each engine once, on a thread of its own, before any request uses it.
+
+    The first connection initializes the dialect under an asyncio lock,
+    which can't be shared by requests running on different event loops.
+    So the first API request does it on a fresh loop, in a worker thread,
+    while any other request that arrives meanwhile waits.
+    """
+    global _initialized
+    with _initialize_lock:
+        if not _initialized:
+            for sessionmaker in _sessionmakers.values():
+                asyncio.run(_initialize(sessionmaker.kw['bind']))
+            _initialized = True
+
+@asynccontextmanager
+async def async_session(write=False):
+    """Open a session on the async engine for the duration of a block.
+
+    Pass write=True for sessions that check and then change data, such as
+    booking a room, so their transaction is serialized with other writers.
+    """
+    if not _initialized:
+        await asyncio.to_thread(_initialize_engines)
+    async with _sessionmakers['write' if write else 'read']() as session:
+        yield session
+
+def init_app(app):
+    """Create the async engines the JSON API reads and writes through.
+
+    Flask runs each async view in an event loop of its own, and pooled
+    async connections can't move between event loops, so every session
+    opens a fresh connection (cheap for SQLite; put PgBouncer in front
+    of PostgreSQL). The ORM session hooks used by the sync routes run for
+    these sessions as well. Nothing connects until the first API request.
+    """
+    global _initialized
+    from app import db
+
+    url = app.config.get('API_DATABASE_URI')
+    if not url:
+        # The primary engine's URL, after Flask-SQLAlchemy resolved relative SQLite paths
+        with app.app_context():
+            url = async_url(db.engine.url)
+
+    sqlite = make_url(url).get_backend_name() == 'sqlite'
+    for kind in ('read', 'write'):
+        if kind == 'write' and sqlite:
+            engine = create_async_engine(url, poolclass=NullPool, connect_args={
+                'isolation_level': None,
+                'timeout': app.config.get('API_SQLITE_BUSY_TIMEOUT', 30)
+            })
+            _begin_immediate(engine)
+        else:
+            engine = create_async_engine(url, poolclass=NullPool)
+        _sessionmakers[kind] = async_sessionmaker(engine, expire_on_commit=False)
+    _initialized = False
+    logger.info(f"Async API engine configured for {make_url(url).drivername}")
@@ -0,0 +1,105 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """A small thread-safe LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, ttl=10, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+availability_cache = TTLCache()
+
+def room_version(room_id):
+    """Return a room's availability version, shared by every worker through the rooms table."""
+    from app import db
+    from models import Room
+
+    return db.session.query(Room.availability_version).filter(Room.id == room_id).scalar()
+
+def cached_availability(room_id, check_in, check_out, compute):
+    """Return the (available, total_price) answer for a stay, computing it on a miss.
+
+    The key includes the room's version as read before the database is
+    queried. A booking committed while the answer is being computed bumps
+    the version, so the possibly stale answer lands under a key that is
+    never read again.
+    """
+    key = (room_id, check_in, check_out, room_version(room_id))
+    answer = availability_cache.get(key)
+    if answer is None:
+        answer = compute()
+        availability_cache.set(key, answer)
+    return answer
+
+@event.listens_for(Session, 'after_flush')
+def _bump_changed_rooms(session, flush_context):
+    """Bump the version of every room a flush changed the availability or price of.
+
+    The UPDATE runs in the flush's own transaction, so the new version
+    becomes visible to all workers exactly when the booking does.
+    """
+    from models import Room, Booking, RatePlan, Season
+
+    changed = set()
+    rates_changed = False
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Booking):
+            changed.add(obj.room_id)
+            # A reassigned booking frees its previous room as well
+            changed.update(inspect(obj).attrs.room_id.history.deleted)
+        elif isinstance(obj, Room) and obj not in session.new:
+            changed.add(obj.id)
+        elif isinstance(obj, (RatePlan, Season)):
+            rates_changed = True
+
+    if not changed and not rates_changed:
+        return
+    # Leave updated_at alone: it keys the room's page and fragment caches
+    statement = update(Room).values(availability_version=Room.availability_version + 1, updated_at=Room.updated_at)
+    if not rates_changed:
+        statement = statement.where(Room.id.in_(changed))
+    session.connection().execute(statement)
+
+def init_app(app):
+    """Configure the availability cache from the app config."""
+    availability_cache.ttl = app.config.get('AVAILABILITY_CACHE_TTL', availability_cache.ttl)
+    availability_cache.max_entries = app.config.get('AVAILABILITY_CACHE_MAX_ENTRIES', availability_cache.max_entries)
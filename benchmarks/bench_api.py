@@ -0,0 +1,145 @@
+"""Load test the sync booking routes against the async /api/v1 routes.
+
+Serves the app from a fixed pool of request threads, like gunicorn with
+--threads, on a scratch SQLite database, and drives it with concurrent
+aiohttp clients. Sending mail is replaced by a sleep of MAIL_LATENCY
+seconds standing in for a slow SMTP server. Needs the bench dependency
+group (uv sync --group bench). Run from the project root:
+
+    python -m benchmarks.bench_api
+"""
+import os
+import time
+import logging
+import asyncio
+import tempfile
+import threading
+import itertools
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_api.db')}")
+
+import aiohttp
+import numpy as np
+from werkzeug.serving import BaseWSGIServer
+from app import app, db, mail
+from models import User, Room
+
+SERVER_THREADS = 4
+CONCURRENCY = (1, 8, 32)
+REQUESTS = 256
+ROOM_COUNT = 200
+MAIL_LATENCY = 0.2
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug's server, handling requests on a fixed number of threads."""
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def setup_database():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench-password')
+        db.session.add(user)
+        db.session.add_all(
+            Room(room_number=str(1000 + i), room_type='standard', capacity=2, price_per_night=100.0,
+                 description='Benchmark room', amenities='Free Wi-Fi', image_url='https://example.com/room.jpg')
+            for i in range(ROOM_COUNT)
+        )
+        db.session.commit()
+
+def start_server():
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.engine.echo = False
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    mail.send = lambda message: time.sleep(MAIL_LATENCY)
+    server = PooledWSGIServer('127.0.0.1', 0, app, threads=SERVER_THREADS)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+# Every booking request gets a stay of its own, so none is refused as a double booking
+_stays = itertools.count()
+
+def next_stay():
+    n = next(_stays)
+    check_in = date.today() + timedelta(days=30 + 2 * (n // ROOM_COUNT))
+    return n % ROOM_COUNT + 1, check_in.isoformat(), (check_in + timedelta(days=1)).isoformat()
+
+def sync_quote(session, base):
+    room, check_in, check_out = next_stay()
+    return session.post(f"{base}/booking/check_availability/{room}", data={'check_in': check_in, 'check_out': check_out})
+
+def api_quote(session, base):
+    room, check_in, check_out = next_stay()
+    return session.get(f"{base}/api/v1/rooms/{room}/quote", params={'check_in': check_in, 'check_out': check_out})
+
+def sync_book(session, base):
+    room, check_in, check_out = next_stay()
+    return session.post(f"{base}/booking/book/{room}", data={'check_in': check_in, 'check_out': check_out, 'guests': 1}, allow_redirects=False)
+
+def api_book(session, base):
+    room, check_in, check_out = next_stay()
+    return session.post(f"{base}/api/v1/bookings", json={'room': room, 'check_in': check_in, 'check_out': check_out, 'guests': 1})
+
+async def run_load(base, request, concurrency):
+    """Send REQUESTS requests from `concurrency` clients and return (requests/s, p50 ms, p95 ms, errors)."""
+    latencies = []
+    errors = 0
+    remaining = itertools.count(REQUESTS, -1)
+
+    async with aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True)) as session:
+        await session.post(f"{base}/auth/login", data={'email': 'bench@example.com', 'password': 'bench-password'})
+
+        async def client():
+            nonlocal errors
+            while next(remaining) > 0:
+                start = time.perf_counter()
+                async with request(session, base) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+    return len(latencies) / elapsed, p50, p95, errors
+
+def main():
+    setup_database()
+    base = start_server()
+    scenarios = [
+        ('quote, sync route', sync_quote),
+        ('quote, /api/v1', api_quote),
+        ('booking, sync route', sync_book),
+        ('booking, /api/v1', api_book),
+    ]
+    print(f"{REQUESTS} requests per run, {SERVER_THREADS} server threads, {MAIL_LATENCY * 1000:.0f} ms per email:")
+    for name, request in scenarios:
+        for concurrency in CONCURRENCY:
+            rate, p50, p95, errors = asyncio.run(run_load(base, request, concurrency))
+            print(f"  {name:<20} {concurrency:3d} clients: {rate:8.1f} req/s, p50 {p50:7.1f} ms, p95 {p95:7.1f} ms, {errors} errors")
+
+if __name__ == '__main__':
+    main()
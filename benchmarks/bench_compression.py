@@ -0,0 +1,81 @@
+"""Measure bytes on the wire and CPU time per response at several compression levels.
+
+Renders the admin rooms page (an edit and a delete modal per room) and a
+check_availability JSON answer on a scratch SQLite database, then runs
+each body through the compression middleware's encoders. Run from the
+project root:
+
+    python -m benchmarks.bench_compression
+"""
+import os
+import time
+import tempfile
+
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_compression.db')}")
+
+from app import app, db
+from models import User, Room
+from compression import GzipCompressor, BrotliCompressor, CompressionMiddleware, brotli
+
+ROOM_COUNT = 200
+ROUNDS = 20
+GZIP_LEVELS = (1, 4, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 9, 11)
+
+def setup_database():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = User(username='bench-admin', email='admin@example.com', is_admin=True)
+        admin.set_password('bench-password')
+        db.session.add(admin)
+        db.session.add_all(
+            Room(room_number=str(1000 + i), room_type=('standard', 'deluxe', 'suite')[i % 3], capacity=2 + i % 4,
+                 price_per_night=99.99 + i,
+                 description="Spacious deluxe room featuring a king-sized bed, seating area, and premium amenities. "
+                             "Enjoy extra space and comfort during your stay.",
+                 amenities="King Bed, Free Wi-Fi, 50-inch TV, Mini-fridge, Lounge Area, Coffee Machine",
+                 image_url=f"https://images.example.com/rooms/{i}.jpg")
+            for i in range(ROOM_COUNT)
+        )
+        db.session.commit()
+
+def fetch_bodies():
+    """Return the uncompressed bodies of the responses to measure, by name."""
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.engine.echo = False
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'admin@example.com', 'password': 'bench-password'})
+    identity = {'Accept-Encoding': 'identity'}
+    return {
+        f'admin rooms ({ROOM_COUNT})': client.get('/admin/rooms', headers=identity).data,
+        'check_availability': client.post('/booking/check_availability/1', headers=identity,
+                                          data={'check_in': '2030-01-01', 'check_out': '2030-01-04'}).data,
+    }
+
+def measure(make_compressor, body):
+    """Return (compressed size, mean CPU milliseconds) of encoding a body."""
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        compressor = make_compressor()
+        size = len(compressor.compress(body) + compressor.finish())
+    return size, (time.process_time() - start) / ROUNDS * 1000
+
+def main():
+    setup_database()
+    bodies = fetch_bodies()
+    encoders = [(f"gzip -{level}", lambda level=level: GzipCompressor(level)) for level in GZIP_LEVELS]
+    if brotli is not None:
+        encoders += [(f"br q{quality}", lambda quality=quality: BrotliCompressor(quality)) for quality in BROTLI_QUALITIES]
+
+    defaults = CompressionMiddleware(None)
+    print(f"Defaults: gzip -{defaults.gzip_level}, br q{defaults.brotli_quality}, min size {defaults.min_size} bytes; mean of {ROUNDS} runs")
+    for name, body in bodies.items():
+        print(f"\n{name}: {len(body)} bytes uncompressed")
+        for label, make_compressor in encoders:
+            size, cpu_ms = measure(make_compressor, body)
+            print(f"  {label:<8} {size:8d} bytes ({size / len(body):6.1%}), {cpu_ms:7.3f} ms CPU")
+
+if __name__ == '__main__':
+    main()
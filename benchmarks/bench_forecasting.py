@@ -0,0 +1,47 @@
+"""Measure booking pace forecasting on synthetic booking histories of growing size.
+
+Two years of 1-7 night stays are generated for each hotel size, booked
+0-365 days ahead (most of them in the last few weeks), then expanded to
+room-nights and forecast as the admin dashboard does, minus the database
+load. Run from the project root:
+
+    python -m benchmarks.bench_forecasting
+"""
+import time
+import numpy as np
+from forecasting import expand_stays, forecast_nights
+
+ROOM_COUNTS = (500, 2000, 5000)
+DAYS = 730
+HORIZON = 60
+OCCUPANCY = 0.75
+
+def make_bookings(room_count, today, seed):
+    """Book about OCCUPANCY of every night in the two years up to `today` plus the horizon, as date ordinals."""
+    rng = np.random.default_rng(seed)
+    count = int(room_count * DAYS * OCCUPANCY / 4)
+    check_in = today - DAYS + HORIZON + rng.integers(0, DAYS, count)
+    check_out = check_in + rng.integers(1, 8, count)
+    booked_on = check_in - np.minimum(rng.exponential(30, count).astype(np.int64), 365)
+    # Bookings for future nights can only have been made by today
+    future = booked_on < today
+    return (booked_on[future], check_in[future], check_out[future],
+            rng.integers(0, 3, future.sum()).astype(np.int16), rng.uniform(100, 500, future.sum()))
+
+def main():
+    today = 739000
+    print(f"Forecasting {HORIZON} nights from {DAYS} days of bookings:")
+    for rooms in ROOM_COUNTS:
+        columns = make_bookings(rooms, today, rooms)
+
+        start = time.perf_counter()
+        stays = expand_stays(*columns)
+        expanded = time.perf_counter()
+        forecast_nights(stays, today, rooms, HORIZON)
+        elapsed = time.perf_counter()
+
+        print(f"  {rooms:>5} rooms, {len(columns[0]):>8} bookings, {len(stays.night):>9} room-nights: "
+              f"expand {expanded - start:5.2f} s, forecast {elapsed - expanded:5.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Measure search page render time with and without the room card fragment cache.
+
+Run from the project root:
+
+    python -m benchmarks.bench_fragment_cache
+"""
+import time
+from datetime import datetime
+from flask import render_template
+from app import app
+from models import Room
+from forms import SearchForm
+from fragment_cache import fragment_cache
+
+ROOM_COUNT = 500
+ROUNDS = 20
+
+def make_rooms(count):
+    """Build unsaved rooms that look like the seed data."""
+    updated_at = datetime.utcnow()
+    return [
+        Room(
+            id=i,
+            room_number=str(100 + i),
+            room_type=('standard', 'deluxe', 'suite')[i % 3],
+            capacity=2 + i % 4,
+            price_per_night=99.99 + i,
+            description="Spacious deluxe room featuring a king-sized bed, seating area, and premium amenities. "
+                        "Enjoy extra space and comfort during your stay. Perfect for extended visits.",
+            amenities="King Bed, Free Wi-Fi, 50-inch TV, Mini-fridge, Lounge Area, Coffee Machine, Premium Toiletries",
+            image_url=f"https://images.example.com/rooms/{i}.jpg",
+            updated_at=updated_at
+        )
+        for i in range(1, count + 1)
+    ]
+
+def time_render(rooms, rounds):
+    """Return the mean render time of the search results page in milliseconds."""
+    with app.test_request_context('/booking/search'):
+        form = SearchForm(meta={'csrf': False})
+        quotes = {room.id: room.price_per_night * 3 for room in rooms}
+        render_template('booking/search.html', form=form, rooms=rooms, quotes=quotes)  # Compile the template first
+        start = time.perf_counter()
+        for _ in range(rounds):
+            render_template('booking/search.html', form=form, rooms=rooms, quotes=quotes)
+        return (time.perf_counter() - start) / rounds * 1000
+
+def main():
+    rooms = make_rooms(ROOM_COUNT)
+    max_bytes = fragment_cache.max_bytes
+
+    fragment_cache.max_bytes = 0
+    uncached = time_render(rooms, ROUNDS)
+
+    fragment_cache.max_bytes = max_bytes
+    fragment_cache.clear()
+    warm = time_render(rooms, ROUNDS)
+
+    print(f"Search page with {ROOM_COUNT} rooms ({ROUNDS} renders each):")
+    print(f"  without fragment cache: {uncached:8.2f} ms/render")
+    print(f"  with warm cache:        {warm:8.2f} ms/render")
+    print(f"  speedup:                {uncached / warm:8.2f}x")
+    print(f"  cache entries: {len(fragment_cache)}, {fragment_cache.size / 1024:.0f} KiB, "
+          f"hit rate {fragment_cache.hits / max(fragment_cache.hits + fragment_cache.misses, 1):.1%}")
+
+if __name__ == '__main__':
+    main()
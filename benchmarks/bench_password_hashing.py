@@ -0,0 +1,73 @@
+"""Measure logins per second for a few password hash settings, through passwords.py.
+
+A login costs one hash verification. Each setting is measured as the app
+runs it: on the request thread (PASSWORD_HASH_WORKERS = 0), so one
+thread's rate is what one core sustains, and through the bounded pool
+with two request threads per core calling verify_password at once,
+counting the logins the pool turns away as busy. Run from the project
+root:
+
+    python -m benchmarks.bench_password_hashing
+"""
+import os
+import time
+import logging
+import threading
+from flask import Flask
+import passwords
+
+METHODS = ('scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000')
+MIN_SECONDS = 1.0
+
+def configure(method, workers, max_pending):
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_MAX_PENDING=max_pending)
+    passwords.init_app(app)
+
+def logins_per_second(password_hash, threads):
+    """Verify the password from `threads` request threads for at least MIN_SECONDS.
+
+    Returns:
+        tuple: (verifications per second, logins turned away)
+    """
+    counts = {'done': 0, 'busy': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + MIN_SECONDS
+
+    def request_thread():
+        while time.perf_counter() < deadline:
+            try:
+                assert passwords.verify_password(password_hash, 'correct horse')
+                key = 'done'
+            except passwords.HashingBusy:
+                key = 'busy'
+                time.sleep(0.001)
+            with lock:
+                counts[key] += 1
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=request_thread) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return counts['done'] / (time.perf_counter() - start), counts['busy']
+
+def main():
+    # Turned-away logins are counted, not logged one by one
+    logging.getLogger('passwords').setLevel(logging.ERROR)
+    cores = os.cpu_count() or 1
+    pool = max(cores // 2, 1)
+    print(f"Logins per second ({cores} cores available; pool of {pool} with {cores * 2} request threads):")
+    for method in METHODS:
+        configure(method, workers=0, max_pending=1)
+        password_hash = passwords.hash_password('correct horse')
+        per_core, _ = logins_per_second(password_hash, threads=1)
+
+        configure(method, workers=pool, max_pending=pool)
+        pooled, busy = logins_per_second(password_hash, threads=cores * 2)
+        print(f"  {method:<22} {per_core:8.1f}/s per core ({1000 / per_core:6.1f} ms each), "
+              f"{pooled:8.1f}/s through the pool, {busy} turned away")
+
+if __name__ == '__main__':
+    main()
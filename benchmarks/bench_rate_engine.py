@@ -0,0 +1,84 @@
+"""Compare the vectorized rate engine against pricing each room in a Python loop.
+
+Run from the project root:
+
+    python -m benchmarks.bench_rate_engine
+"""
+import time
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+import numpy as np
+from rates import RateEngine, WEEKEND_NIGHTS
+
+ROOM_COUNTS = (100, 1000, 10000)
+ROOM_TYPES = ('standard', 'deluxe', 'suite')
+
+def make_rate_plans(today):
+    plans = [
+        SimpleNamespace(room_type='standard', weekend_uplift=0.10, los_discounts={'7': 0.05}),
+        SimpleNamespace(room_type='deluxe', weekend_uplift=0.15, los_discounts={'5': 0.05, '10': 0.10}),
+        SimpleNamespace(room_type='suite', weekend_uplift=0.20, los_discounts={'7': 0.10, '14': 0.15}),
+    ]
+    seasons = [
+        SimpleNamespace(room_type=None, start_date=today + timedelta(days=20), end_date=today + timedelta(days=90), rate_multiplier=1.25),
+        SimpleNamespace(room_type='suite', start_date=today + timedelta(days=120), end_date=today + timedelta(days=170), rate_multiplier=0.85),
+    ]
+    return plans, seasons
+
+def quote_loop(rooms, plans, seasons, check_in, check_out):
+    """Reference implementation: price every night of every room in Python."""
+    plans_by_type = {plan.room_type: plan for plan in plans}
+    quotes = {}
+    for room in rooms:
+        plan = plans_by_type.get(room.room_type)
+        total = 0.0
+        night = check_in
+        while night < check_out:
+            rate = room.price_per_night
+            for season in seasons:
+                if season.start_date <= night < season.end_date and season.room_type in (None, room.room_type):
+                    rate *= season.rate_multiplier
+            if plan and night.weekday() in WEEKEND_NIGHTS:
+                rate *= 1 + plan.weekend_uplift
+            total += rate
+            night += timedelta(days=1)
+        nights = (check_out - check_in).days
+        discount = 0.0
+        if plan:
+            for min_nights, rate in sorted((int(n), r) for n, r in plan.los_discounts.items()):
+                if nights >= min_nights:
+                    discount = rate
+        quotes[room.id] = round(total * (1 - discount), 2)
+    return quotes
+
+def main():
+    today = date.today()
+    plans, seasons = make_rate_plans(today)
+    engine = RateEngine(seasons, plans, today, 730)
+    check_in = today + timedelta(days=80)
+    check_out = check_in + timedelta(days=7)
+    engine.quote_rooms([SimpleNamespace(id=0, room_type='suite', price_per_night=100.0)], check_in, check_out)  # Warm up
+
+    print(f"Quoting a {(check_out - check_in).days}-night stay:")
+    for count in ROOM_COUNTS:
+        rng = random.Random(count)
+        rooms = [
+            SimpleNamespace(id=i, room_type=rng.choice(ROOM_TYPES), price_per_night=round(rng.uniform(90, 350), 2))
+            for i in range(count)
+        ]
+
+        start = time.perf_counter()
+        looped = quote_loop(rooms, plans, seasons, check_in, check_out)
+        loop_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        vectorized = engine.quote_rooms(rooms, check_in, check_out)
+        vector_ms = (time.perf_counter() - start) * 1000
+
+        assert np.allclose([looped[i] for i in range(count)], [vectorized[i] for i in range(count)], atol=0.011)
+        print(f"  {count:>6} rooms: python loop {loop_ms:9.2f} ms, vectorized {vector_ms:7.2f} ms "
+              f"({loop_ms / vector_ms:6.1f}x)")
+
+if __name__ == '__main__':
+    main()
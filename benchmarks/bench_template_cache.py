@@ -0,0 +1,97 @@
+"""Measure first-request latency per page in a fresh worker, with and without precompiled templates.
+
+Each measurement starts a new Python process, as a freshly scaled-up
+gunicorn worker would be, on a scratch SQLite database. The process
+serves one untemplated request first, so database connections and the
+like are warm, then times the first request to one page, which has to
+load its templates. Run from the project root:
+
+    python -m benchmarks.bench_template_cache
+"""
+import os
+import sys
+import json
+import tempfile
+import statistics
+import subprocess
+from datetime import date, timedelta
+
+REPEATS = 5
+
+# (path, whether the page needs the admin logged in)
+PAGES = (
+    ('/', False),
+    ('/auth/login', False),
+    ('/auth/register', False),
+    ('/booking/search', False),
+    ('/booking/room/1', False),
+    ('/auth/profile', True),
+    ('/booking/view/1', True),
+    ('/admin/dashboard', True),
+    ('/admin/bookings', True),
+    ('/admin/rooms', True),
+    ('/admin/room_assignments', True),
+)
+
+def setup(directory):
+    """Seed a scratch database and precompile the templates into a scratch cache."""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench_templates.db')}"
+    os.environ['JINJA_BYTECODE_CACHE_DIR'] = os.path.join(directory, 'jinja_cache')
+    from app import app, db
+    from models import User, Room, Booking
+    import seed_data
+    import template_cache
+
+    with app.app_context():
+        db.engine.echo = False
+        seed_data.seed_rooms()
+        seed_data.seed_users()
+        seed_data.seed_rate_plans()
+        admin = User.query.filter_by(is_admin=True).first()
+        room = db.session.get(Room, 1)
+        check_in = date.today() + timedelta(days=30)
+        db.session.add(Booking(user_id=admin.id, room_id=room.id, check_in_date=check_in, check_out_date=check_in + timedelta(days=2),
+                               guests=1, total_price=2 * room.price_per_night, booking_status='confirmed', payment_status='paid'))
+        db.session.commit()
+    return template_cache.precompile_templates(app)
+
+def first_request(path, admin, cache):
+    """Return the latency in ms of the first request to a page in a new process."""
+    env = dict(os.environ, JINJA_BYTECODE_CACHE='true' if cache else 'false')
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_template_cache', 'worker', path, str(int(admin))],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])['ms']
+
+def worker(path, admin):
+    import time
+    from app import app, db
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.engine.echo = False
+    client = app.test_client()
+    if admin:
+        client.post('/auth/login', data={'email': 'admin@luxuryhotel.com', 'password': 'admin123'})
+    client.get('/api/v1/rooms')
+
+    start = time.perf_counter()
+    response = client.get(path)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert response.status_code == 200, f"{path} answered {response.status_code}"
+    print(json.dumps({'ms': elapsed}))
+
+def main():
+    directory = tempfile.mkdtemp()
+    print(f"Precompiled {setup(directory)} templates")
+    print(f"First request per page in a new process, median of {REPEATS}:")
+    print(f"  {'page':<24} {'compiled':>10} {'precompiled':>12}")
+    for path, admin in PAGES:
+        compiled = statistics.median(first_request(path, admin, cache=False) for _ in range(REPEATS))
+        precompiled = statistics.median(first_request(path, admin, cache=True) for _ in range(REPEATS))
+        print(f"  {path:<24} {compiled:8.1f} ms {precompiled:9.1f} ms  ({compiled / precompiled:4.1f}x)")
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['worker']:
+        worker(sys.argv[2], sys.argv[3] == '1')
+    else:
+        main()
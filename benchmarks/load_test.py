@@ -0,0 +1,351 @@
+"""Drive a running instance with a mix of guest and admin traffic and report latency per endpoint.
+
+Each virtual user is a thread with its own cookie session: it registers
+an account, logs in, then runs the MIX below until the time is up,
+booking, modifying and canceling real stays along the way. One more
+thread browses the admin pages. Every form post carries the CSRF token
+scraped from the user's pages, and bookings an idempotency key, as a
+browser would send them.
+
+Start the app on a scratch database first, e.g. one of
+
+    gunicorn --bind 127.0.0.1:5000 --workers 4 main:app
+    flask --app main run --port 5000
+
+then, from the project root:
+
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --users 20 --duration 60
+
+Stays are drawn from the next --days nights, so a short window makes
+users compete for the same rooms. The run ends with throughput and
+p50/p95/p99 latency per endpoint, the number of errors (5xx answers,
+failed connections, and the app's "An error occurred" message), and the
+number of double bookings: pairs of confirmed stays the app gave out
+for the same room on overlapping nights. Redirects are followed, as a
+browser would, and timed separately. A modification's outcome is read
+back from /api/v1/bookings/<id>, so only dates the app saved count.
+"""
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+import numpy as np
+
+# Relative weight of each guest action
+MIX = {
+    'search': 25,
+    'room_detail': 25,
+    'check_availability': 20,
+    'book': 12,
+    'modify': 5,
+    'cancel': 5,
+    'login': 8,
+}
+
+ADMIN_PAGES = ('/admin/dashboard', '/admin/bookings', '/admin/rooms', '/admin/room_assignments')
+
+CSRF_PATTERN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"|value="([^"]+)"[^>]*name="csrf_token"')
+CONFIRMATION_PATTERN = re.compile(r'/booking/confirmation/(\d+)$')
+ERROR_MESSAGE = b'An error occurred'
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Stats:
+    """Latencies and errors per endpoint, shared by all virtual users."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.outcomes = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, error=False):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if error:
+                self.errors[endpoint] += 1
+
+    def record_error(self, endpoint):
+        with self._lock:
+            self.errors[endpoint] += 1
+
+    def count(self, outcome):
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+
+class Ledger:
+    """The confirmed stays the app has given out, to count double bookings."""
+
+    def __init__(self):
+        self.stays = {}
+        self._lock = threading.Lock()
+
+    def confirm(self, booking_id, room_id, check_in, check_out):
+        with self._lock:
+            self.stays[booking_id] = (room_id, check_in, check_out)
+
+    def cancel(self, booking_id):
+        with self._lock:
+            self.stays.pop(booking_id, None)
+
+    def double_bookings(self):
+        """Return the number of pairs of stays in the same room on overlapping nights."""
+        by_room = defaultdict(list)
+        for room_id, check_in, check_out in self.stays.values():
+            by_room[room_id].append((check_in, check_out))
+        overlaps = 0
+        for stays in by_room.values():
+            stays.sort()
+            for i, (_, check_out) in enumerate(stays):
+                for other_in, _ in stays[i + 1:]:
+                    if other_in >= check_out:
+                        break
+                    overlaps += 1
+        return overlaps
+
+
+class Client:
+    """One browser session against the app."""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.csrf_token = None
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, endpoint, path, data=None):
+        """Send one request, timing it under `endpoint`, then load the page it redirects to.
+
+        The app reports most failures by flashing "An error occurred" on the
+        page it redirects to, so that page counts as an error of `endpoint`.
+        Loading it is timed separately, as "(redirected page)".
+
+        Returns:
+            tuple: (status, redirect location or None), or (None, None) if the request failed
+        """
+        status, location, content = self._send(endpoint, path, data)
+        if location:
+            _, _, content = self._send('(redirected page)', urllib.parse.urljoin(path, location))
+        if ERROR_MESSAGE in content:
+            self.stats.record_error(endpoint)
+        return status, location
+
+    def _send(self, endpoint, path, data=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        start = time.perf_counter()
+        try:
+            try:
+                response = self._opener.open(self.base_url + path, data=body, timeout=self.timeout)
+            except urllib.error.HTTPError as e:
+                # Redirects and error pages both arrive here, as redirects aren't followed
+                response = e
+            content = response.read()
+            status, location = response.status, response.headers.get('Location')
+        except (OSError, urllib.error.URLError):
+            self.stats.record(endpoint, time.perf_counter() - start, error=True)
+            return None, None, b''
+        self.stats.record(endpoint, time.perf_counter() - start, error=status >= 500)
+        if status == 200:
+            match = CSRF_PATTERN.search(content.decode('utf-8', 'replace'))
+            if match:
+                self.csrf_token = match.group(1) or match.group(2)
+        return status, urllib.parse.urlsplit(location).path if location else None, content
+
+    def get_json(self, endpoint, path):
+        """Fetch a JSON resource, e.g. from the API.
+
+        Returns:
+            dict: The decoded body, or None unless the answer was 200
+        """
+        status, _, content = self._send(endpoint, path)
+        return json.loads(content) if status == 200 else None
+
+    def post(self, endpoint, path, data, idempotent=False):
+        data = dict(data, csrf_token=self.csrf_token or '')
+        if idempotent:
+            data['idempotency_key'] = uuid.uuid4().hex
+        return self.request(endpoint, path, data)
+
+
+class VirtualUser:
+    """A guest looking for, booking and changing stays."""
+
+    def __init__(self, client, email, password, rooms, days, ledger, rng):
+        self.client = client
+        self.email = email
+        self.password = password
+        self.rooms = rooms
+        self.days = days
+        self.ledger = ledger
+        self.rng = rng
+        self.bookings = {}
+
+    def stay(self):
+        check_in = date.today() + timedelta(days=self.rng.randint(1, self.days))
+        return check_in, check_in + timedelta(days=self.rng.randint(1, 4))
+
+    def register(self):
+        self.client.request('register_form', '/auth/register')
+        self.client.post('register', '/auth/register', {
+            'username': self.email.split('@')[0], 'email': self.email, 'phone_number': '',
+            'password': self.password, 'confirm_password': self.password,
+        })
+
+    def login(self):
+        self.client.request('logout', '/auth/logout')
+        self.client.request('login_form', '/auth/login')
+        self.client.post('login', '/auth/login', {'email': self.email, 'password': self.password})
+
+    def search(self):
+        check_in, check_out = self.stay()
+        self.client.post('search', '/booking/search', {
+            'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(),
+            'room_type': self.rng.choice(['', 'standard', 'deluxe', 'suite']), 'guests': 1, 'nights': 3,
+        })
+
+    def room_detail(self):
+        self.client.request('room_detail', f"/booking/room/{self.rng.choice(self.rooms)}")
+
+    def check_availability(self):
+        check_in, check_out = self.stay()
+        self.client.post('check_availability', f"/booking/check_availability/{self.rng.choice(self.rooms)}", {
+            'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(),
+        })
+
+    def book(self):
+        room_id = self.rng.choice(self.rooms)
+        check_in, check_out = self.stay()
+        self.client.request('room_detail', f"/booking/room/{room_id}")
+        _, location = self.client.post('book', f"/booking/book/{room_id}", {
+            'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(), 'guests': 1,
+        }, idempotent=True)
+        match = CONFIRMATION_PATTERN.search(location or '')
+        if match:
+            booking_id = int(match.group(1))
+            self.bookings[booking_id] = room_id
+            self.ledger.confirm(booking_id, room_id, check_in, check_out)
+            self.client.stats.count('bookings confirmed')
+        else:
+            self.client.stats.count('bookings refused')
+
+    def modify(self):
+        if not self.bookings:
+            return self.book()
+        booking_id = self.rng.choice(list(self.bookings))
+        check_in, check_out = self.stay()
+        self.client.request('modify_form', f"/booking/modify/{booking_id}")
+        self.client.post('modify', f"/booking/modify/{booking_id}", {
+            'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(), 'guests': 1,
+        }, idempotent=True)
+        # The app redirects to the booking whether or not it made the change, so read back what it saved
+        saved = self.client.get_json('api_booking', f"/api/v1/bookings/{booking_id}")
+        if saved is None:
+            self.client.stats.count('modifications unconfirmed')
+            return
+        self.bookings[booking_id] = saved['room']
+        self.ledger.confirm(booking_id, saved['room'], date.fromisoformat(saved['check_in']), date.fromisoformat(saved['check_out']))
+        if (saved['check_in'], saved['check_out']) == (check_in.isoformat(), check_out.isoformat()):
+            self.client.stats.count('modifications made')
+        else:
+            self.client.stats.count('modifications refused')
+
+    def cancel(self):
+        if not self.bookings:
+            return self.book()
+        booking_id = self.rng.choice(list(self.bookings))
+        _, location = self.client.post('cancel', f"/booking/cancel/{booking_id}", {}, idempotent=True)
+        if (location or '').endswith('/auth/profile'):
+            del self.bookings[booking_id]
+            self.ledger.cancel(booking_id)
+            self.client.stats.count('cancellations made')
+
+    def run(self, deadline):
+        actions, weights = zip(*MIX.items())
+        self.register()
+        self.login()
+        while time.monotonic() < deadline:
+            getattr(self, self.rng.choices(actions, weights)[0])()
+
+def run_admin(client, email, password, deadline, rng):
+    client.request('login_form', '/auth/login')
+    client.post('login', '/auth/login', {'email': email, 'password': password})
+    while time.monotonic() < deadline:
+        path = rng.choice(ADMIN_PAGES)
+        client.request(path.replace('/admin/', 'admin_'), path)
+
+def list_rooms(base_url, timeout):
+    with urllib.request.urlopen(f"{base_url.rstrip('/')}/api/v1/rooms", timeout=timeout) as response:
+        return [room['id'] for room in json.load(response)['rooms']]
+
+def report(stats, ledger, elapsed):
+    total = sum(len(latencies) for latencies in stats.latencies.values())
+    print(f"{total} requests in {elapsed:.1f} s ({total / elapsed:.1f} req/s)")
+    print(f"  {'endpoint':<26} {'requests':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for endpoint in sorted(stats.latencies):
+        latencies = np.array(stats.latencies[endpoint]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"  {endpoint:<26} {len(latencies):>8} {len(latencies) / elapsed:>7.1f} "
+              f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {stats.errors[endpoint]:>7}")
+    for outcome in sorted(stats.outcomes):
+        print(f"  {outcome}: {stats.outcomes[outcome]}")
+    print(f"Errors: {sum(stats.errors.values())}")
+    print(f"Double bookings: {ledger.double_bookings()}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Base URL of the running app')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent guest sessions, one thread each')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run for')
+    parser.add_argument('--days', type=int, default=30, help='Stays start within this many days from today')
+    parser.add_argument('--admin-email', default='admin@luxuryhotel.com')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--no-admin', action='store_true', help='Leave out the admin session')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for each response')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    rooms = list_rooms(args.url, args.timeout)
+    stats, ledger = Stats(), Ledger()
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    run_id = uuid.uuid4().hex[:8]
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=VirtualUser(
+            Client(args.url, stats, args.timeout), f"load-{run_id}-{i}@example.com", 'load-test-password',
+            rooms, args.days, ledger, random.Random(seed + i)
+        ).run, args=(deadline,), name=f'load-user-{i}')
+        for i in range(args.users)
+    ]
+    if not args.no_admin:
+        threads.append(threading.Thread(target=run_admin, args=(
+            Client(args.url, stats, args.timeout), args.admin_email, args.admin_password, deadline, random.Random(seed - 1)
+        ), name='load-admin'))
+
+    print(f"Running {args.users} users{'' if args.no_admin else ' and an admin'} against {args.url} "
+          f"for {args.duration:.0f} s ({len(rooms)} rooms, seed {seed})")
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report(stats, ledger, time.monotonic() - start)
+
+if __name__ == '__main__':
+    main()
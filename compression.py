@@ -0,0 +1,187 @@
+import zlib
+import logging
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # Responses are then gzipped only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Content types compressed by default; images, fonts and archives are compressed already
+DEFAULT_MIMETYPES = (
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+)
+
+# Responses without these carry no body, or a body the client addressed by byte range
+UNCOMPRESSIBLE_STATUSES = ('204', '206', '304')
+
+
+class GzipCompressor:
+    """Streaming gzip encoder."""
+
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        # A sync flush sends each chunk the app yields on at once, so streamed pages still stream
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    """Streaming brotli encoder."""
+
+    encoding = 'br'
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip, whichever the client prefers.
+
+    Only responses of an allowed content type and at least `min_size`
+    bytes are compressed. When the app doesn't set Content-Length, the
+    body is buffered until it reaches `min_size` (or ends) before deciding;
+    after that every chunk is compressed and passed on as it arrives.
+    Responses that already have a Content-Encoding, such as precompressed
+    static assets, are passed through untouched.
+
+    Args:
+        app: The WSGI application to wrap
+        min_size: Smallest body in bytes worth compressing
+        mimetypes: Content types to compress
+        gzip_level: zlib compression level, 1-9
+        brotli_quality: Brotli quality, 0-11
+    """
+
+    def __init__(self, app, min_size=1024, mimetypes=DEFAULT_MIMETYPES, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def choose_compressor(self, environ):
+        """Return a compressor for the best encoding the client accepts, or None."""
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and accepted['br']:
+            return BrotliCompressor(self.brotli_quality)
+        if accepted['gzip']:
+            return GzipCompressor(self.gzip_level)
+        return None
+
+    def should_compress(self, status, headers):
+        if status.split(' ', 1)[0] in UNCOMPRESSIBLE_STATUSES:
+            return False
+        if 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        if headers.get('Content-Type', '').split(';', 1)[0].strip().lower() not in self.mimetypes:
+            return False
+        length = headers.get('Content-Length', type=int)
+        return length is None or length >= self.min_size
+
+    def __call__(self, environ, start_response):
+        compressor = self.choose_compressor(environ) if environ.get('REQUEST_METHOD') != 'HEAD' else None
+        if compressor is None:
+            return self.app(environ, start_response)
+
+        response = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = status
+            response['headers'] = Headers(headers)
+            response['exc_info'] = exc_info
+            return response.setdefault('chunks', []).append
+
+        app_iter = self.app(environ, capture_start_response)
+        return self._respond(app_iter, compressor, response, start_response)
+
+    def _respond(self, app_iter, compressor, response, start_response):
+        try:
+            chunks = iter(app_iter)
+            # Anything passed to the legacy write() callable comes first
+            buffered = list(response.get('chunks', []))
+            size = sum(len(chunk) for chunk in buffered)
+            finished = False
+
+            headers = response['headers']
+            compress = self.should_compress(response['status'], headers)
+            if compress and headers.get('Content-Length') is None:
+                # Unknown length: wait until the body proves big enough, or ends short
+                while size < self.min_size:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        finished = True
+                        break
+                    buffered.append(chunk)
+                    size += len(chunk)
+                compress = size >= self.min_size
+
+            if not compress:
+                response['started'] = True
+                start_response(response['status'], list(headers.items()), response['exc_info'])
+                yield from buffered
+                if not finished:
+                    yield from chunks
+                return
+
+            del headers['Content-Length']
+            headers['Content-Encoding'] = compressor.encoding
+            vary = headers.get('Vary')
+            if vary != '*':
+                headers['Vary'] = f"{vary}, Accept-Encoding" if vary else 'Accept-Encoding'
+            etag = headers.get('ETag')
+            if etag and not etag.startswith('W/'):
+                # The compressed bytes differ from the ones the strong tag was computed on
+                headers['ETag'] = f"W/{etag}"
+            response['started'] = True
+            start_response(response['status'], list(headers.items()), response['exc_info'])
+
+            for chunk in buffered:
+                if chunk:
+                    yield compressor.compress(chunk)
+            if not finished:
+                for chunk in chunks:
+                    if chunk:
+                        yield compressor.compress(chunk)
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+
+def init_app(app):
+    """Compress the app's responses per the COMPRESSION_* settings."""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config.get('COMPRESSION_MIN_SIZE', 1024),
+        mimetypes=app.config.get('COMPRESSION_MIMETYPES', DEFAULT_MIMETYPES),
+        gzip_level=app.config.get('COMPRESSION_GZIP_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', 4)
+    )
+    logger.info(f"Response compression enabled ({'brotli and gzip' if brotli else 'gzip only'})")
@@ -16,6 +16,13 @@ class Config:
         "max_overflow": 15
     }
     
+    # Read replica settings (comma-separated URLs, e.g. a second SQLite file for local testing)
+    SQLALCHEMY_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    SQLALCHEMY_BINDS = {f"replica_{i}": url for i, url in enumerate(SQLALCHEMY_REPLICA_URLS)}
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get("DATABASE_REPLICA_MAX_LAG", 10))
+    REPLICA_LAG_CHECK_INTERVAL = 5
+    REPLICA_STICKY_SECONDS = float(os.environ.get("DATABASE_REPLICA_STICKY_SECONDS", 5))
+    
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
@@ -30,6 +37,93 @@ class Config:
     # Application settings
     HOTEL_NAME = "Luxury Hotel"
     ADMIN_EMAIL = os.environ.get("ADMIN_EMAIL", "admin@luxuryhotel.com")
+    
+    # Rendered room card fragment cache size (0 disables it)
+    FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get("FRAGMENT_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+    
+    # check_availability answer cache (answers are also dropped when the room's bookings change)
+    AVAILABILITY_CACHE_TTL = int(os.environ.get("AVAILABILITY_CACHE_TTL", 10))
+    AVAILABILITY_CACHE_MAX_ENTRIES = 10000
+    
+    # Logged-in user cache, admins excluded (this process drops entries on changes at once; other
+    # processes only when the TTL runs out, so a deleted or renamed user may be served that long)
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 30))
+    USER_CACHE_MAX_ENTRIES = 10000
+    
+    # Seconds before the amenity search index is rebuilt (room edits in this process rebuild it at once)
+    AMENITY_INDEX_TTL = int(os.environ.get("AMENITY_INDEX_TTL", 300))
+    
+    # Seconds before the in-memory keyword search index is rebuilt, when the database has no full-text search of its own
+    ROOM_SEARCH_INDEX_TTL = int(os.environ.get("ROOM_SEARCH_INDEX_TTL", 300))
+    
+    # Seconds before the nightly rate grid is rebuilt from the rate plans (edits in this process rebuild it at once)
+    RATE_ENGINE_TTL = int(os.environ.get("RATE_ENGINE_TTL", 300))
+    
+    # Waitlist settings: the longest stay a guest can wait for, which also bounds how far around freed nights entries are matched
+    WAITLIST_MAX_NIGHTS = int(os.environ.get("WAITLIST_MAX_NIGHTS", 30))
+    # Offers lapse after WAITLIST_OFFER_TTL_HOURS; the matcher checks for lapsed and lost offers every WAITLIST_EXPIRY_INTERVAL seconds
+    WAITLIST_OFFER_TTL_HOURS = int(os.environ.get("WAITLIST_OFFER_TTL_HOURS", 24))
+    WAITLIST_EXPIRY_INTERVAL = int(os.environ.get("WAITLIST_EXPIRY_INTERVAL", 300))
+    
+    # Password hashing: a werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+    # Hashes made with other parameters are upgraded when their owner logs in.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_SALT_LENGTH = 16
+    
+    # Hashing pool ("thread" or "process"; 0 workers hashes on the request thread). Once
+    # PASSWORD_HASH_MAX_PENDING hashes are running or waiting, further logins are turned away at once (or after PASSWORD_HASH_WAIT_SECONDS).
+    PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread")
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 8))
+    PASSWORD_HASH_WAIT_SECONDS = 0
+    
+    # Username/email availability probe: Bloom filter sizing, and how often users registered by other processes are loaded
+    IDENTITY_FILTER_CAPACITY = 100000
+    IDENTITY_FILTER_FALSE_POSITIVE_RATE = 0.01
+    IDENTITY_FILTER_REFRESH_SECONDS = int(os.environ.get("IDENTITY_FILTER_REFRESH_SECONDS", 5))
+    
+    # JSON API (/api/v1): its async engine defaults to the primary database on the backend's async driver
+    API_DATABASE_URI = os.environ.get("API_DATABASE_URL")
+    API_NOTIFICATION_WORKERS = int(os.environ.get("API_NOTIFICATION_WORKERS", 2))
+    API_SQLITE_BUSY_TIMEOUT = 30  # Seconds an API booking waits for SQLite's write lock
+    
+    # Bookings move to bookings_archive this many days after check-out
+    BOOKING_RETENTION_DAYS = int(os.environ.get("BOOKING_RETENTION_DAYS", 90))
+    
+    # Report jobs commit every REPORTING_BATCH_SIZE bookings, and leave bookings changed in the
+    # last REPORTING_WATERMARK_LAG seconds for the next run, in case older changes are still uncommitted
+    REPORTING_BATCH_SIZE = 500
+    REPORTING_WATERMARK_LAG = int(os.environ.get("REPORTING_WATERMARK_LAG", 60))
+    
+    # Compiled templates are cached here (default instance/jinja_cache) and shared by all workers
+    JINJA_BYTECODE_CACHE = os.environ.get("JINJA_BYTECODE_CACHE", "true").lower() == "true"
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get("JINJA_BYTECODE_CACHE_DIR")
+    
+    # Room image uploads; UPLOAD_FOLDER defaults to instance/uploads. Variants are rendered
+    # at each width (up to the upload's own) in WebP and JPEG by a pool of worker processes
+    UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER")
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    ROOM_IMAGE_WIDTHS = (320, 640, 1024, 1600)
+    ROOM_IMAGE_QUALITY = 80
+    ROOM_IMAGE_WORKERS = int(os.environ.get("ROOM_IMAGE_WORKERS", 2))
+    
+    # Response compression: bodies below COMPRESSION_MIN_SIZE bytes aren't worth it;
+    # see benchmarks/bench_compression.py for the cost of each level
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+    
+    # The admin dashboard forecasts occupancy for this many nights ahead
+    FORECAST_HORIZON_DAYS = int(os.environ.get("FORECAST_HORIZON_DAYS", 60))
+    
+    # Admin dashboard statistics are served from a snapshot refreshed in the background once this many seconds old
+    DASHBOARD_SNAPSHOT_MAX_AGE = int(os.environ.get("DASHBOARD_SNAPSHOT_MAX_AGE", 30))
+    
+    # Idempotency settings
+    IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.environ.get("IDEMPOTENCY_KEY_TTL_HOURS", 24)))
+    # A key whose request never finished (e.g. the worker was killed) can be reused after this long
+    IDEMPOTENCY_PENDING_TIMEOUT = timedelta(seconds=int(os.environ.get("IDEMPOTENCY_PENDING_TIMEOUT", 60)))
 
 
 class DevelopmentConfig(Config):
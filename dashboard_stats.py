@@ -0,0 +1,124 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Everything the admin dashboard shows, computed at `computed_at` (time.time())
+Snapshot = namedtuple('Snapshot', ['stats', 'recent_bookings', 'pace', 'computed_at'])
+
+# A recent booking as shown on the dashboard, detached from any session
+RecentBooking = namedtuple('RecentBooking', [
+    'id', 'username', 'room_number', 'check_in_date', 'check_out_date', 'booking_status', 'total_price'
+])
+
+_settings = {
+    'max_age': 30,
+}
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_refreshing = False
+
+def compute_snapshot():
+    """Compute the dashboard statistics, recent bookings and booking pace.
+
+    Returns:
+        Snapshot
+    """
+    from flask import current_app
+    from sqlalchemy import func
+    from sqlalchemy.orm import joinedload
+    from app import db
+    from models import Room, Booking
+    from forecasting import booking_pace
+
+    # Calculate statistics for the past 30 days
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    today = datetime.utcnow().date()
+
+    total_bookings = Booking.query.filter(Booking.created_at >= thirty_days_ago).count()
+    total_revenue = db.session.query(func.sum(Booking.total_price)).filter(
+        Booking.created_at >= thirty_days_ago
+    ).scalar() or 0
+
+    # Current occupancy rate
+    total_rooms = Room.query.count()
+    occupied_rooms = Booking.query.filter(
+        Booking.check_in_date <= today,
+        Booking.check_out_date > today,
+        Booking.booking_status != 'cancelled'
+    ).count()
+    occupancy_rate = round((occupied_rooms / total_rooms * 100), 2) if total_rooms > 0 else 0
+
+    recent_bookings = [
+        RecentBooking(b.id, b.user.username, b.room.room_number, b.check_in_date, b.check_out_date,
+                      b.booking_status, b.total_price)
+        for b in Booking.query.options(joinedload(Booking.user), joinedload(Booking.room)).order_by(
+            Booking.created_at.desc()
+        ).limit(10)
+    ]
+
+    stats = {
+        'total_bookings': total_bookings,
+        'total_revenue': round(total_revenue, 2),
+        'occupancy_rate': occupancy_rate,
+        'available_rooms': total_rooms - occupied_rooms
+    }
+    pace = booking_pace(current_app.config.get('FORECAST_HORIZON_DAYS', 60))
+    return Snapshot(stats, recent_bookings, pace, time.time())
+
+def _refresh(app):
+    """Replace the snapshot with a fresh one, in a background thread."""
+    global _snapshot, _refreshing
+    try:
+        with app.app_context():
+            snapshot = compute_snapshot()
+        _snapshot = snapshot
+    except Exception as e:
+        logger.error(f"Error refreshing dashboard snapshot: {e}")
+    finally:
+        _refreshing = False
+
+def dashboard_snapshot():
+    """Return the dashboard snapshot, starting a background refresh when it is stale.
+
+    Only the very first request waits for the statistics to be computed;
+    later ones get the last snapshot straight away, even while it is being
+    refreshed. At most one refresh runs at a time per worker, so however
+    many admins watch the dashboard, the statistics are computed at most
+    about once every DASHBOARD_SNAPSHOT_MAX_AGE seconds.
+
+    Returns:
+        Snapshot
+    """
+    from flask import current_app
+    global _snapshot, _refreshing
+
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = compute_snapshot()
+            return _snapshot
+
+    if time.time() - snapshot.computed_at >= _settings['max_age']:
+        with _snapshot_lock:
+            if _refreshing:
+                return snapshot
+            _refreshing = True
+        threading.Thread(target=_refresh, args=(current_app._get_current_object(),),
+                         name='dashboard-snapshot', daemon=True).start()
+    return snapshot
+
+def invalidate_snapshot():
+    """Drop the snapshot, so the next request computes a fresh one."""
+    global _snapshot
+    _snapshot = None
+
+def init_app(app):
+    """Configure the dashboard snapshot from the app config."""
+    _settings['max_age'] = app.config.get('DASHBOARD_SNAPSHOT_MAX_AGE', _settings['max_age'])
+    invalidate_snapshot()
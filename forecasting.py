@@ -0,0 +1,173 @@
+import logging
+from collections import namedtuple
+from datetime import date, timedelta
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One entry per booked room-night, as parallel arrays:
+# night (date ordinal), lead (days between booking and that night), room_type (code) and price (the night's share of the total)
+StayNights = namedtuple('StayNights', ['night', 'lead', 'room_type', 'price'])
+
+NightForecast = namedtuple('NightForecast', [
+    'night', 'on_the_books', 'last_year_same_lead', 'last_year_final', 'forecast', 'capacity'
+])
+
+# Nights a year apart on the same weekday
+LAST_YEAR = 364
+
+def expand_stays(booked_on, check_in, check_out, room_type, total_price):
+    """Turn bookings into one entry per room-night, without a Python loop.
+
+    Args:
+        booked_on: Booking dates, as date ordinals
+        check_in: Check-in dates, as date ordinals
+        check_out: Check-out dates, as date ordinals
+        room_type: Room type codes
+        total_price: Booking totals
+
+    Returns:
+        StayNights
+    """
+    nights = np.maximum(check_out - check_in, 0)
+    count = int(nights.sum())
+    booking = np.repeat(np.arange(len(nights)), nights)
+    # Position of each room-night within its stay: 0 for the first night, 1 for the second, ...
+    offset = np.arange(count) - np.repeat(np.cumsum(nights) - nights, nights)
+    night = check_in[booking] + offset
+    per_night = total_price / np.maximum(nights, 1)
+    return StayNights(
+        night=night,
+        lead=np.maximum(night - booked_on[booking], 0),
+        room_type=room_type[booking],
+        price=per_night[booking]
+    )
+
+def on_the_books(stays, first_night, nights, max_lead):
+    """Count the room-nights on the books for a run of nights at each lead time.
+
+    Returns:
+        numpy.ndarray: Matrix of shape (nights, max_lead + 1) whose [i, L] entry is the
+            number of room-nights for night first_night + i booked at least L days ahead
+            (bookings made further ahead than max_lead count as made max_lead days ahead)
+    """
+    rows = stays.night - first_night
+    inside = (rows >= 0) & (rows < nights)
+    leads = np.minimum(stays.lead[inside], max_lead)
+    width = max_lead + 1
+    counts = np.bincount(rows[inside] * width + leads, minlength=nights * width).reshape(nights, width)
+    # Booked at least L days ahead = booked exactly L, L + 1, ... days ahead
+    return np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+
+def weekday(ordinals):
+    """Weekday of date ordinals, Monday being 0 like date.weekday()."""
+    return (ordinals - 1) % 7
+
+def pickup_curves(stays, today, history_nights, max_lead):
+    """Average room-nights still to be booked, by weekday and lead time.
+
+    Learned from the last `history_nights` nights before today, whose
+    bookings are complete: entry [w, L] is how many more room-nights an
+    average night on weekday w went on to pick up after being L days out.
+
+    Returns:
+        numpy.ndarray: Matrix of shape (7, max_lead + 1)
+    """
+    first = today - history_nights
+    booked = on_the_books(stays, first, history_nights, max_lead)
+    pickup = booked[:, :1] - booked
+    days = weekday(np.arange(first, today))
+    totals = np.zeros((7, max_lead + 1))
+    np.add.at(totals, days, pickup)
+    return totals / np.maximum(np.bincount(days, minlength=7), 1)[:, None]
+
+def forecast_nights(stays, today, capacity, horizon=60, history_nights=LAST_YEAR, max_lead=365):
+    """Forecast final occupancy for each of the next `horizon` nights.
+
+    A night's forecast is what is on the books for it now plus the
+    average pickup of past nights on the same weekday from the same lead
+    time, capped at capacity. Pace is measured against the night 364 days
+    earlier (same weekday) at the same lead time.
+
+    Args:
+        stays: StayNights of the bookings to count
+        today: Today, as a date ordinal
+        capacity: Rooms available each night
+        horizon: Number of future nights to forecast
+        history_nights: Past nights to learn the pickup curves from
+        max_lead: Longest lead time tracked, in days
+
+    Returns:
+        dict: Arrays keyed by NightForecast field, one entry per night from today
+    """
+    leads = np.minimum(np.arange(horizon), max_lead)
+    rows = np.arange(horizon)
+    booked_now = on_the_books(stays, today, horizon, max_lead)[:, 0]
+    last_year = on_the_books(stays, today - LAST_YEAR, horizon, max_lead)
+    curves = pickup_curves(stays, today, history_nights, max_lead)
+
+    nights = np.arange(today, today + horizon)
+    forecast = np.minimum(booked_now + curves[weekday(nights), leads], capacity)
+    return {
+        'night': nights,
+        'on_the_books': booked_now,
+        'last_year_same_lead': last_year[rows, leads],
+        'last_year_final': last_year[:, 0],
+        'forecast': np.maximum(forecast, booked_now),
+        'capacity': np.full(horizon, capacity)
+    }
+
+def load_stay_nights(since, room_type=None):
+    """Load the room-nights of every booking, archived ones included, that checks out after `since`.
+
+    Returns:
+        StayNights
+    """
+    from app import db
+    from models import Booking, ArchivedBooking, Room
+
+    room_types = {name: code for code, name in enumerate(sorted(t for (t,) in db.session.query(Room.room_type).distinct()))}
+    rows = []
+    for model in (Booking, ArchivedBooking):
+        query = db.session.query(model.created_at, model.check_in_date, model.check_out_date, Room.room_type, model.total_price).join(
+            Room, Room.id == model.room_id
+        ).filter(model.booking_status != 'canceled', model.check_out_date > since)
+        if room_type:
+            query = query.filter(Room.room_type == room_type)
+        rows.extend(query.all())
+
+    count = len(rows)
+    stays = expand_stays(
+        booked_on=np.fromiter((r[0].toordinal() for r in rows), dtype=np.int64, count=count),
+        check_in=np.fromiter((r[1].toordinal() for r in rows), dtype=np.int64, count=count),
+        check_out=np.fromiter((r[2].toordinal() for r in rows), dtype=np.int64, count=count),
+        room_type=np.fromiter((room_types[r[3]] for r in rows), dtype=np.int16, count=count),
+        total_price=np.fromiter((r[4] for r in rows), dtype=float, count=count)
+    )
+    logger.info(f"Loaded {count} bookings as {len(stays.night)} room-nights for forecasting")
+    return stays
+
+def booking_pace(horizon=60, room_type=None, today=None):
+    """Forecast the next `horizon` nights from the bookings in the database.
+
+    Returns:
+        list: NightForecast tuples, one per night from today
+    """
+    from models import Room
+
+    today = today or date.today()
+    # Enough history for the pickup curves and for last year's nights at the longest lead
+    stays = load_stay_nights(today - timedelta(days=LAST_YEAR + 1), room_type)
+    capacity = Room.query.filter_by(room_type=room_type).count() if room_type else Room.query.count()
+    result = forecast_nights(stays, today.toordinal(), capacity, horizon)
+    return [
+        NightForecast(
+            night=date.fromordinal(int(result['night'][i])),
+            on_the_books=int(result['on_the_books'][i]),
+            last_year_same_lead=int(result['last_year_same_lead'][i]),
+            last_year_final=int(result['last_year_final'][i]),
+            forecast=round(float(result['forecast'][i]), 1),
+            capacity=capacity
+        )
+        for i in range(horizon)
+    ]
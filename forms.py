@@ -1,7 +1,9 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectField, IntegerField, TextAreaField, URLField, DateField, HiddenField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, URL, ValidationError
+from flask_wtf.file import FileField, FileAllowed
+from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectField, SelectMultipleField, IntegerField, TextAreaField, URLField, DateField, HiddenField
+from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional, URL, ValidationError
 from datetime import date
+from sqlalchemy import or_
 from models import User
 
 class LoginForm(FlaskForm):
@@ -19,26 +21,40 @@ class RegisterForm(FlaskForm):
     sms_notifications = BooleanField('Receive SMS notifications for bookings', default=True)
     submit = SubmitField('Register')
     
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user:
-            raise ValidationError('Username already taken. Please choose a different one.')
-    
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user:
-            raise ValidationError('Email already registered. Please use a different one.')
-            
     def validate_phone_number(self, phone_number):
         if phone_number.data:
             # Check if the phone number is in E.164 format (e.g., +1234567890)
             if not phone_number.data.startswith('+'):
                 raise ValidationError('Phone number must be in international format starting with + (e.g., +1234567890)')
-            
-            # Check if phone number is already registered
-            user = User.query.filter_by(phone_number=phone_number.data).first()
-            if user:
-                raise ValidationError('This phone number is already registered.')
+    
+    def validate(self, extra_validators=None):
+        # Report clashes together with the other field errors, so they can all be fixed in one go
+        valid = super().validate(extra_validators)
+        return self.check_unique() and valid
+    
+    def check_unique(self):
+        """Check username, email and phone number against existing users in a single query.
+        
+        Returns:
+            bool: True if none of them is in use; otherwise the clashes are added to the field errors
+        """
+        conditions = [User.username == self.username.data, User.email == self.email.data]
+        if self.phone_number.data:
+            conditions.append(User.phone_number == self.phone_number.data)
+        
+        taken = User.query.with_entities(User.username, User.email, User.phone_number).filter(or_(*conditions)).all()
+        messages = {
+            'username': 'Username already taken. Please choose a different one.',
+            'email': 'Email already registered. Please use a different one.',
+            'phone_number': 'This phone number is already registered.'
+        }
+        unique = True
+        for field, message in messages.items():
+            data = getattr(self, field).data
+            if data and any(getattr(row, field) == data for row in taken):
+                getattr(self, field).errors.append(message)
+                unique = False
+        return unique
 
 
 class SearchForm(FlaskForm):
@@ -57,8 +73,45 @@ class SearchForm(FlaskForm):
         (4, '4 Guests'),
         (5, '5+ Guests')
     ], default=1, coerce=int)
+    flexible = BooleanField('My dates are flexible: find any stay between these dates')
+    nights = IntegerField('Number of Nights', default=3, validators=[Optional(), NumberRange(min=1, max=30)])
+    keywords = StringField('Keywords', validators=[Optional(), Length(max=100)])
+    amenities = SelectMultipleField('Must Have', choices=[], coerce=int, validators=[Optional()])  # Choices come from the amenity index
     submit = SubmitField('Search Rooms')
     
+    def validate_check_out(self, check_out):
+        if self.check_in.data and check_out.data:
+            if check_out.data <= self.check_in.data:
+                raise ValidationError('Check-out date must be after check-in date.')
+            if self.flexible.data and (check_out.data - self.check_in.data).days > 90:
+                raise ValidationError('Flexible searches can span at most 90 days.')
+    
+    def validate_check_in(self, check_in):
+        if check_in.data:
+            today = date.today()
+            if check_in.data < today:
+                raise ValidationError('Check-in date cannot be in the past.')
+    
+    def validate_nights(self, nights):
+        if self.flexible.data:
+            if not nights.data:
+                raise ValidationError('Please enter the number of nights.')
+            if self.check_in.data and self.check_out.data and nights.data > (self.check_out.data - self.check_in.data).days:
+                raise ValidationError('The stay is longer than the selected dates.')
+
+
+class GroupBookingForm(FlaskForm):
+    check_in = DateField('Check-in Date', validators=[DataRequired()])
+    check_out = DateField('Check-out Date', validators=[DataRequired()])
+    room_type = SelectField('Room Type', choices=[
+        ('', 'Any Type'),
+        ('standard', 'Standard'),
+        ('deluxe', 'Deluxe'),
+        ('suite', 'Suite')
+    ], default='')
+    party_size = IntegerField('Number of Guests', validators=[DataRequired(), NumberRange(min=2, max=100)])
+    submit = SubmitField('Find Rooms')
+    
     def validate_check_out(self, check_out):
         if self.check_in.data and check_out.data:
             if check_out.data <= self.check_in.data:
@@ -100,7 +153,8 @@ class RoomForm(FlaskForm):
     price_per_night = IntegerField('Price per Night', validators=[DataRequired(), NumberRange(min=1)])
     description = TextAreaField('Description', validators=[DataRequired()])
     amenities = StringField('Amenities', validators=[DataRequired()])
-    image_url = URLField('Image URL', validators=[DataRequired(), URL()])
+    image_url = URLField('Image URL', validators=[Optional(), URL()])
+    image = FileField('Upload Image', validators=[FileAllowed(['jpg', 'jpeg', 'png', 'webp'], 'Upload a JPEG, PNG or WebP image.')])
     submit = SubmitField('Save Room')
 
 
@@ -0,0 +1,101 @@
+import logging
+import threading
+from collections import OrderedDict
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+SLOT_MARKER = '\x00slot:{}\x00'
+
+
+class FragmentCache:
+    """A thread-safe LRU cache of rendered HTML fragments, bounded by total size.
+
+    Entries are keyed by fragment name, room id and room version
+    (Room.updated_at), so an edited room simply stops hitting its old
+    entries, which then age out of the LRU order.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def set(self, key, html):
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = html
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+fragment_cache = FragmentCache()
+
+def _slot(name):
+    """Placeholder for a per-request value inside a cached fragment."""
+    return Markup(SLOT_MARKER.format(name))
+
+def _render(caller):
+    # Call blocks declared without (slot) take no arguments
+    return str(caller(_slot) if caller.arguments else caller())
+
+def cached_fragment(name, room, caller, **slots):
+    """Render a block of room markup once per room version and reuse it.
+
+    Used from templates as a call block. Values that change per request
+    (CSRF tokens, live availability) are passed as slots and filled into
+    the cached HTML each time it is used:
+
+        {% call(slot) cached_fragment('search-card', room, csrf=csrf_token()) %}
+            ... {{ slot('csrf') }} ...
+        {% endcall %}
+    """
+    if fragment_cache.max_bytes <= 0:
+        html = _render(caller)
+    else:
+        key = (name, room.id, room.updated_at)
+        html = fragment_cache.get(key)
+        if html is None:
+            html = _render(caller)
+            fragment_cache.set(key, html)
+
+    for slot_name, value in slots.items():
+        html = html.replace(SLOT_MARKER.format(slot_name), str(escape(value)))
+    return Markup(html)
+
+def init_app(app):
+    """Size the fragment cache from config and expose it to templates."""
+    fragment_cache.max_bytes = app.config.get('FRAGMENT_CACHE_MAX_BYTES', fragment_cache.max_bytes)
+    app.jinja_env.globals['cached_fragment'] = cached_fragment
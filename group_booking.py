@@ -0,0 +1,155 @@
+import math
+import uuid
+import logging
+from collections import defaultdict
+import numpy as np
+from app import db
+from models import Room, Booking
+from occupancy import occupancy_matrix
+from rates import quote_rooms
+
+logger = logging.getLogger(__name__)
+
+
+class GroupBookingError(Exception):
+    """Raised when a group of rooms can no longer be reserved."""
+
+
+def _prune_candidates(rooms, quotes, party_size):
+    """Keep only rooms that could appear in a cheapest allocation.
+
+    No allocation needs more than ceil(party_size / capacity) rooms of one
+    capacity, and it would always take the cheapest of them, so everything
+    else can be dropped before the knapsack runs.
+    """
+    by_capacity = defaultdict(list)
+    for room in rooms:
+        by_capacity[room.capacity].append(room)
+
+    candidates = []
+    for capacity, group in by_capacity.items():
+        group.sort(key=lambda room: (quotes[room.id], room.id))
+        candidates.extend(group[:math.ceil(party_size / capacity)])
+    return candidates
+
+def allocate_rooms(rooms, quotes, party_size):
+    """Choose the cheapest set of rooms whose combined capacity covers a party.
+
+    Solves a 0/1 min-cost covering knapsack over the capacity axis, one
+    vectorized update per candidate room. Ties go to fewer rooms.
+
+    Args:
+        rooms: Available rooms
+        quotes: room id -> total price of the stay
+        party_size: Number of guests to accommodate
+
+    Returns:
+        list: The chosen rooms, largest first, or [] if the party can't be covered
+    """
+    candidates = _prune_candidates(rooms, quotes, party_size)
+    if not candidates or sum(room.capacity for room in candidates) < party_size:
+        return []
+
+    # cost[c] = cheapest way to seat at least c guests; a tiny per-room cost breaks ties
+    per_room = 1e-6
+    cost = np.full(party_size + 1, np.inf)
+    cost[0] = 0.0
+    taken = np.zeros((len(candidates), party_size + 1), dtype=bool)
+    seats = np.arange(party_size + 1)
+
+    for i, room in enumerate(candidates):
+        with_room = cost[np.maximum(seats - room.capacity, 0)] + quotes[room.id] + per_room
+        better = with_room < cost
+        taken[i] = better
+        cost = np.where(better, with_room, cost)
+
+    if not np.isfinite(cost[party_size]):
+        return []
+
+    chosen = []
+    remaining = party_size
+    for i in range(len(candidates) - 1, -1, -1):
+        if remaining > 0 and taken[i, remaining]:
+            chosen.append(candidates[i])
+            remaining = max(remaining - candidates[i].capacity, 0)
+    return sorted(chosen, key=lambda room: (-room.capacity, room.room_number))
+
+def find_group_allocation(room_type, party_size, check_in, check_out):
+    """Find available rooms for a party and the cheapest allocation of them.
+
+    Returns:
+        tuple: (chosen rooms, room id -> stay price)
+    """
+    query = Room.query
+    if room_type:
+        query = query.filter(Room.room_type == room_type)
+    rooms = query.all()
+
+    occupied = occupancy_matrix([room.id for room in rooms], check_in, check_out)
+    free_rooms = [room for room, booked in zip(rooms, occupied.any(axis=1)) if not booked]
+    quotes = quote_rooms(free_rooms, check_in, check_out)
+    chosen = allocate_rooms(free_rooms, quotes, party_size)
+    logger.info(f"Group allocation: {len(chosen)} of {len(free_rooms)} free rooms for {party_size} guests")
+    return chosen, quotes
+
+def split_guests(rooms, party_size):
+    """Spread a party across rooms, filling each room in turn."""
+    guests = []
+    remaining = party_size
+    for room in rooms:
+        count = min(room.capacity, remaining)
+        guests.append(count)
+        remaining -= count
+    return guests
+
+def reserve_group(user, room_ids, check_in, check_out, party_size):
+    """Book every room of a group in a single transaction.
+
+    The rooms are locked (SELECT ... FOR UPDATE on databases that support
+    it) and re-checked inside the transaction, so the group is either
+    booked completely or not at all.
+
+    Returns:
+        list: The new bookings, sharing one group_id
+
+    Raises:
+        GroupBookingError: If a room is gone, booked meanwhile or too small for the party
+    """
+    try:
+        rooms = Room.query.filter(Room.id.in_(room_ids)).order_by(Room.id).with_for_update().all()
+        if len(rooms) != len(set(room_ids)):
+            raise GroupBookingError('Some of the selected rooms no longer exist.')
+
+        rooms.sort(key=lambda room: -room.capacity)
+        guests = split_guests(rooms, party_size)
+        if sum(room.capacity for room in rooms) < party_size or 0 in guests:
+            raise GroupBookingError('The selected rooms do not match the size of your party.')
+
+        occupied = occupancy_matrix([room.id for room in rooms], check_in, check_out)
+        if occupied.any():
+            raise GroupBookingError('Some of the selected rooms were just booked by someone else.')
+
+        quotes = quote_rooms(rooms, check_in, check_out)
+        group_id = uuid.uuid4().hex
+        bookings = [
+            Booking(
+                user_id=user.id,
+                room_id=room.id,
+                check_in_date=check_in,
+                check_out_date=check_out,
+                guests=count,
+                total_price=quotes[room.id],
+                booking_status='confirmed',
+                payment_status='paid',
+                group_id=group_id
+            )
+            for room, count in zip(rooms, guests)
+        ]
+        db.session.add_all(bookings)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Group booking {group_id}: {len(bookings)} rooms for {party_size} guests by user {user.username}")
+    return bookings
@@ -0,0 +1,54 @@
+import time
+import hashlib
+import logging
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+logger = logging.getLogger(__name__)
+
+def page_etag(*parts):
+    """Build a weak ETag for a rendered page from the data it was rendered with.
+
+    Besides the given parts, the tag covers everything in base.html and the
+    forms that varies per visitor: the logged-in user, the session's CSRF
+    token and a time bucket of half the CSRF time limit, so a page answered
+    with a 304 never carries a CSRF token that is about to expire.
+    """
+    csrf_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT') or 3600
+    user_id = current_user.get_id() if current_user.is_authenticated else None
+    validators = parts + (
+        user_id,
+        session.get('csrf_token'),
+        int(time.time() // max(csrf_limit // 2, 1)),
+    )
+    return hashlib.sha1(repr(validators).encode('utf-8')).hexdigest()
+
+def conditional_render(etag, last_modified, render):
+    """Answer with 304 Not Modified if the client already has this version of a page.
+
+    Args:
+        etag: The ETag of the page, e.g. from page_etag()
+        last_modified: When the underlying data last changed, or None
+        render: Callable producing the full response when the page must be sent
+
+    Returns:
+        Response: A 304 response, or the rendered page with validators attached
+    """
+    if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+        # Pending flash messages are only shown by rendering the page
+        return render()
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # Pages differ per visitor, so shared caches must not reuse them
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,178 @@
+import re
+import uuid
+import logging
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, request, session, flash, redirect, url_for, make_response
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+def new_idempotency_key():
+    """Generate a fresh idempotency key for a form."""
+    return uuid.uuid4().hex
+
+def _claim_key(key):
+    """Insert a pending record for the key, or return the existing one.
+
+    The unique constraint on (user_id, key) makes the claim safe across
+    workers: only one request can insert the row, every other request with
+    the same key gets an IntegrityError and reads the stored record instead.
+
+    A pending claim expires after IDEMPOTENCY_PENDING_TIMEOUT, so a key
+    whose request died with its worker can be retried; the full
+    IDEMPOTENCY_KEY_TTL only starts once the outcome is stored.
+
+    Returns:
+        tuple: (record, claimed) where claimed is True if this request owns the key
+    """
+    now = datetime.utcnow()
+    for _ in range(2):
+        record = IdempotencyKey(
+            user_id=current_user.id,
+            key=key,
+            endpoint=request.endpoint,
+            request_path=request.path,
+            status='pending',
+            expires_at=now + current_app.config.get('IDEMPOTENCY_PENDING_TIMEOUT', timedelta(seconds=60))
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+            return record, True
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = IdempotencyKey.query.filter_by(user_id=current_user.id, key=key).first()
+        if existing and existing.expires_at > now:
+            return existing, False
+
+        # The old record expired but hasn't been purged yet, so reuse the key
+        IdempotencyKey.query.filter(
+            IdempotencyKey.user_id == current_user.id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at <= now
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    return None, False
+
+def _replay(record):
+    """Return the stored result of an earlier request with the same key."""
+    fallback = request.referrer or url_for('main.home')
+
+    if record is None:
+        flash('Your request could not be processed. Please try again.', 'danger')
+        return redirect(fallback)
+
+    if record.endpoint != request.endpoint or record.request_path != request.path:
+        logger.warning(f"Idempotency key reused for a different request by user {current_user.id}")
+        flash('This request has already been used for a different action.', 'danger')
+        return redirect(fallback)
+
+    if record.status != 'completed':
+        flash('Your request is already being processed.', 'info')
+        return redirect(fallback)
+
+    logger.info(f"Replaying idempotent {record.endpoint} request for user {current_user.id}")
+    for category, message in record.flash_messages or []:
+        flash(message, category)
+    return redirect(record.response_location, code=record.response_code)
+
+def _succeeded(response, flashes):
+    """Whether a response is a successful outcome worth replaying.
+
+    The views catch their own errors and redirect with a 'danger' flash,
+    so only redirects without one count as success.
+    """
+    return 300 <= response.status_code < 400 and response.location and not any(
+        category == 'danger' for category, _ in flashes
+    )
+
+def _finish(record, response, flashes):
+    """Store the outcome of a successful request, or release the key so it can be retried."""
+    try:
+        if _succeeded(response, flashes):
+            record.status = 'completed'
+            record.response_code = response.status_code
+            record.response_location = response.location
+            record.flash_messages = [list(message) for message in flashes]
+            record.expires_at = datetime.utcnow() + current_app.config['IDEMPOTENCY_KEY_TTL']
+        else:
+            # The view may have left a failed transaction behind
+            db.session.rollback()
+            db.session.delete(record)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to store idempotency key result: {e}")
+
+def idempotent(f):
+    """Make a POST view replay its original result when its key is resent.
+
+    The key is read from the Idempotency-Key header or the idempotency_key
+    form field. Requests without a key run as before. Only successful
+    outcomes are stored; anything else (an error flashed by the view, or a
+    form re-rendered with validation errors) releases the key so the
+    request can be retried.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method != 'POST' or not current_user.is_authenticated:
+            return f(*args, **kwargs)
+
+        key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+        if not key:
+            return f(*args, **kwargs)
+
+        if not KEY_PATTERN.match(key):
+            flash('Invalid request. Please reload the page and try again.', 'danger')
+            return redirect(request.referrer or url_for('main.home'))
+
+        record, claimed = _claim_key(key)
+        if not claimed:
+            return _replay(record)
+
+        flash_count = len(session.get('_flashes', []))
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            db.session.delete(record)
+            db.session.commit()
+            raise
+
+        _finish(record, response, session.get('_flashes', [])[flash_count:])
+        return response
+    return decorated_function
+
+def purge_expired_keys(batch_size=1000):
+    """Delete expired idempotency keys in small batches.
+
+    Each batch is a single indexed DELETE on expires_at, so the job stays
+    cheap and never holds long locks on the table.
+
+    Returns:
+        int: The number of keys deleted
+    """
+    now = datetime.utcnow()
+    deleted = 0
+    while True:
+        ids = db.session.query(IdempotencyKey.id).filter(
+            IdempotencyKey.expires_at <= now
+        ).limit(batch_size).subquery()
+        count = IdempotencyKey.query.filter(
+            IdempotencyKey.id.in_(db.select(ids.c.id))
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += count
+        if count < batch_size:
+            break
+
+    logger.info(f"Purged {deleted} expired idempotency keys")
+    return deleted
@@ -0,0 +1,153 @@
+import math
+import time
+import hashlib
+import logging
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter over strings.
+
+    might_contain() never misses a string that was added, and wrongly
+    reports an absent one with roughly the configured false positive rate
+    while no more than `capacity` strings have been added.
+    """
+
+    def __init__(self, capacity, false_positive_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(false_positive_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class IdentityFilter:
+    """Bloom filters of the usernames and emails in use, kept in step with the users table.
+
+    Users committed by this process are added at once. Users registered by
+    other processes are picked up by an incremental load of new user IDs,
+    at most every `refresh_seconds`. The filters are rebuilt from scratch
+    when they fill up, or every `rebuild_seconds` so that deleted or
+    renamed users stop costing a database lookup.
+    """
+
+    FIELDS = ('username', 'email')
+
+    def __init__(self, capacity=100000, false_positive_rate=0.01, refresh_seconds=5, rebuild_seconds=3600):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.filters = None
+        self.last_user_id = 0
+        self.refreshed_at = 0
+        self.built_at = 0
+        self._lock = threading.Lock()
+
+    def _load(self, rebuild):
+        from app import db
+        from models import User
+
+        if rebuild:
+            total = db.session.query(db.func.count(User.id)).scalar() or 0
+            capacity = max(self.capacity, total * 2)
+            filters = {field: BloomFilter(capacity, self.false_positive_rate) for field in self.FIELDS}
+            last_user_id = 0
+        else:
+            filters, last_user_id = self.filters, self.last_user_id
+
+        rows = db.session.query(User.id, User.username, User.email).filter(
+            User.id > last_user_id
+        ).order_by(User.id).yield_per(5000)
+        for user_id, username, email in rows:
+            filters['username'].add(username)
+            filters['email'].add(email)
+            last_user_id = user_id
+
+        now = time.monotonic()
+        with self._lock:
+            self.filters, self.last_user_id, self.refreshed_at = filters, last_user_id, now
+            if rebuild:
+                self.built_at = now
+        if rebuild:
+            logger.info(f"Identity filter built: {filters['username'].count} users")
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        with self._lock:
+            filters = self.filters
+            rebuild = (
+                filters is None
+                or now - self.built_at > self.rebuild_seconds
+                or filters['username'].count > filters['username'].capacity
+            )
+            refresh = now - self.refreshed_at > self.refresh_seconds
+        if rebuild or refresh:
+            self._load(rebuild)
+
+    def add(self, username, email):
+        with self._lock:
+            if self.filters is not None:
+                self.filters['username'].add(username)
+                self.filters['email'].add(email)
+
+    def might_be_taken(self, field, value):
+        """Return False when `value` is certainly not in use for `field`."""
+        self._ensure_fresh()
+        return self.filters[field].might_contain(value)
+
+
+identity_filter = IdentityFilter()
+
+def is_taken(field, value):
+    """Check whether a username or email is in use, asking the database only when the filter can't rule it out."""
+    from app import db
+    from models import User
+
+    if not identity_filter.might_be_taken(field, value):
+        return False
+    column = getattr(User, field)
+    return db.session.query(User.id).filter(column == value).first() is not None
+
+@event.listens_for(Session, 'after_flush')
+def _collect_new_identities(session, flush_context):
+    from models import User
+
+    identities = session.info.setdefault('new_identities', [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User):
+            identities.append((obj.username, obj.email))
+
+@event.listens_for(Session, 'after_commit')
+def _add_new_identities(session):
+    for username, email in session.info.pop('new_identities', ()):
+        identity_filter.add(username, email)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_new_identities(session):
+    session.info.pop('new_identities', None)
+
+def init_app(app):
+    """Configure the username/email filter from the app config."""
+    identity_filter.capacity = app.config.get('IDENTITY_FILTER_CAPACITY', identity_filter.capacity)
+    identity_filter.false_positive_rate = app.config.get('IDENTITY_FILTER_FALSE_POSITIVE_RATE', identity_filter.false_positive_rate)
+    identity_filter.refresh_seconds = app.config.get('IDENTITY_FILTER_REFRESH_SECONDS', identity_filter.refresh_seconds)
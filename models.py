@@ -1,8 +1,9 @@
 from datetime import datetime
 from app import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password
 from sqlalchemy.ext.hybrid import hybrid_property
+from rates import quote_stay
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -20,10 +21,18 @@ class User(UserMixin, db.Model):
     bookings = db.relationship('Booking', backref='user', lazy='dynamic')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+
+# Which amenities each room has, derived from Room.amenities (see amenities.py)
+room_amenities = db.Table(
+    'room_amenities',
+    db.Column('room_id', db.Integer, db.ForeignKey('rooms.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('amenity_id', db.Integer, db.ForeignKey('amenities.id', ondelete='CASCADE'), primary_key=True, index=True)
+)
 
 
 class Room(db.Model):
@@ -37,9 +46,15 @@ class Room(db.Model):
     description = db.Column(db.Text, nullable=False)
     amenities = db.Column(db.Text, nullable=False)
     image_url = db.Column(db.String(255), nullable=False)
+    image_key = db.Column(db.String(16))  # Uploaded image, stored under this content hash (see room_images.py)
+    image_extension = db.Column(db.String(4))  # Extension of the stored original, e.g. jpg
+    image_widths = db.Column(db.String(64))  # Comma-separated widths of its rendered variants, once rendered
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    availability_version = db.Column(db.Integer, nullable=False, default=0)  # Bumped when its bookings or rates change (see availability_cache.py)
     
     # Relationships
     bookings = db.relationship('Booking', backref='room', lazy='dynamic')
+    amenity_tags = db.relationship('Amenity', secondary=room_amenities, backref='rooms', order_by='Amenity.name')
     
     @hybrid_property
     def is_available(self):
@@ -53,8 +68,22 @@ class Room(db.Model):
         ).first()
 
 
+class Amenity(db.Model):
+    __tablename__ = 'amenities'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    key = db.Column(db.String(64), unique=True, nullable=False)  # Lowercased name with single spaces, e.g. "jacuzzi tub"
+
+
 class Booking(db.Model):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Reporting jobs read the bookings changed since their watermark in (updated_at, id) order
+        db.Index('ix_bookings_updated_at_id', 'updated_at', 'id'),
+        # Never hand out the ID of a deleted or archived booking again (SQLite reuses the highest free rowid otherwise)
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -65,7 +94,12 @@ class Booking(db.Model):
     total_price = db.Column(db.Float, nullable=False)
     booking_status = db.Column(db.String(20), default='confirmed')
     payment_status = db.Column(db.String(20), default='paid')
+    group_id = db.Column(db.String(32), nullable=True, index=True)  # Shared by the bookings of one group reservation
+    room_flexible = db.Column(db.Boolean, default=False)  # Booked by room type; the room may be reassigned before arrival
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Any change, cancellations included
+    
+    is_archived = False
     
     @classmethod
     def check_availability(cls, room_id, check_in_date, check_out_date, exclude_booking_id=None):
@@ -108,11 +142,145 @@ class Booking(db.Model):
         return overlapping_bookings == 0
     
     @staticmethod
-    def calculate_total_price(room_id, check_in_date, check_out_date):
-        """Calculate the total price for a booking."""
-        room = Room.query.get(room_id)
+    def calculate_total_price(room_id, check_in_date, check_out_date, room=None):
+        """Calculate the total price for a booking from the room type's rate plan.
+        
+        Pass the room if it is already loaded to avoid looking it up again.
+        """
+        room = room or db.session.get(Room, room_id)
         if not room:
             return 0
         
-        days = (check_out_date - check_in_date).days
-        return room.price_per_night * days
+        return quote_stay(room, check_in_date, check_out_date)
+
+
+class ArchivedBooking(db.Model):
+    """A booking moved out of the bookings table after its stay ended (see archive.py).
+
+    Keeps the booking's id and columns, so it can be shown wherever a
+    booking is.
+    """
+    __tablename__ = 'bookings_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False)
+    check_in_date = db.Column(db.Date, nullable=False)
+    check_out_date = db.Column(db.Date, nullable=False, index=True)
+    guests = db.Column(db.Integer, nullable=False)
+    total_price = db.Column(db.Float, nullable=False)
+    booking_status = db.Column(db.String(20))
+    payment_status = db.Column(db.String(20))
+    group_id = db.Column(db.String(32), nullable=True)
+    room_flexible = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    is_archived = True
+    
+    # Relationships
+    user = db.relationship('User', backref=db.backref('archived_bookings', lazy='dynamic'))
+    room = db.relationship('Room')
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    endpoint = db.Column(db.String(64), nullable=False)
+    request_path = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, completed
+    response_code = db.Column(db.Integer, nullable=True)
+    response_location = db.Column(db.String(255), nullable=True)
+    flash_messages = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class RatePlan(db.Model):
+    __tablename__ = 'rate_plans'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    room_type = db.Column(db.String(20), unique=True, nullable=False)
+    weekend_uplift = db.Column(db.Float, default=0.0)  # e.g. 0.15 for +15% on Friday and Saturday nights
+    los_discounts = db.Column(db.JSON, default=dict)  # minimum nights -> discount, e.g. {"7": 0.1, "14": 0.15}
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Season(db.Model):
+    __tablename__ = 'seasons'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    room_type = db.Column(db.String(20), nullable=True)  # None applies to every room type
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)  # Exclusive, like check_out_date
+    rate_multiplier = db.Column(db.Float, nullable=False, default=1.0)
+
+
+class WaitlistEntry(db.Model):
+    __tablename__ = 'waitlist_entries'
+    __table_args__ = (
+        # Freed nights are matched with a range scan on check-in date
+        db.Index('ix_waitlist_entries_match', 'status', 'check_in_date', 'check_out_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    room_type = db.Column(db.String(20), nullable=True)  # None accepts any room type
+    check_in_date = db.Column(db.Date, nullable=False)
+    check_out_date = db.Column(db.Date, nullable=False)
+    guests = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='waiting')  # waiting, offered, booked, canceled
+    offered_room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=True)
+    offered_at = db.Column(db.DateTime, nullable=True)
+    notified_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    user = db.relationship('User', backref=db.backref('waitlist_entries', lazy='dynamic'))
+    offered_room = db.relationship('Room')
+
+
+class ReportWatermark(db.Model):
+    __tablename__ = 'report_watermarks'
+    
+    job = db.Column(db.String(32), primary_key=True)
+    updated_at = db.Column(db.DateTime, nullable=False)  # (updated_at, booking_id) of the last booking processed
+    booking_id = db.Column(db.Integer, nullable=False, default=0)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+
+
+class ReportedBooking(db.Model):
+    __tablename__ = 'reported_bookings'
+    
+    job = db.Column(db.String(32), primary_key=True)
+    booking_id = db.Column(db.Integer, primary_key=True)
+    booking_created_at = db.Column(db.DateTime, primary_key=True)  # So a booking given a reused ID is never taken for another
+    contribution = db.Column(db.JSON, nullable=False)  # What the booking last added to the job's summary rows, to take back when it changes
+
+
+class RevenueSummary(db.Model):
+    __tablename__ = 'revenue_summaries'
+    
+    month = db.Column(db.String(7), primary_key=True)  # Check-in month, e.g. "2025-03"
+    room_type = db.Column(db.String(20), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    room_nights = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class NightlyOccupancy(db.Model):
+    __tablename__ = 'nightly_occupancy'
+    
+    night = db.Column(db.Date, primary_key=True)
+    room_type = db.Column(db.String(20), primary_key=True)
+    rooms_occupied = db.Column(db.Integer, nullable=False, default=0)
+    guests = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)  # The night's share of the booking totals
@@ -0,0 +1,114 @@
+import logging
+from collections import namedtuple
+from datetime import timedelta
+import numpy as np
+from app import db
+from models import Booking
+from rates import get_rate_engine
+
+logger = logging.getLogger(__name__)
+
+FlexibleStay = namedtuple('FlexibleStay', ['room', 'check_in', 'check_out', 'total_price'])
+
+def occupancy_matrix(room_ids, start_date, end_date, exclude_booking_id=None):
+    """Load which nights of a date range are booked, for many rooms at once.
+
+    All overlapping bookings are fetched in a single query and painted
+    onto the matrix with a difference array, so no per-room query or
+    per-night Python loop is needed.
+
+    Args:
+        room_ids: Room IDs, one matrix row each (in this order)
+        start_date: First night of the range
+        end_date: Night after the last night of the range
+        exclude_booking_id: Optional booking ID to ignore (for modifications)
+
+    Returns:
+        numpy.ndarray: Boolean matrix of shape (rooms, nights), True where booked
+    """
+    days = (end_date - start_date).days
+    diff = np.zeros((len(room_ids), days + 1), dtype=np.int32)
+    if not room_ids or days <= 0:
+        return diff[:, :max(days, 0)] > 0
+
+    query = db.session.query(Booking.room_id, Booking.check_in_date, Booking.check_out_date).filter(
+        Booking.room_id.in_(room_ids),
+        Booking.booking_status != 'canceled',
+        Booking.check_in_date < end_date,
+        Booking.check_out_date > start_date
+    )
+    if exclude_booking_id:
+        query = query.filter(Booking.id != exclude_booking_id)
+    bookings = query.all()
+
+    if bookings:
+        row_of = {room_id: row for row, room_id in enumerate(room_ids)}
+        rows = np.fromiter((row_of[b.room_id] for b in bookings), dtype=np.intp, count=len(bookings))
+        starts = np.fromiter(((b.check_in_date - start_date).days for b in bookings), dtype=np.intp, count=len(bookings))
+        ends = np.fromiter(((b.check_out_date - start_date).days for b in bookings), dtype=np.intp, count=len(bookings))
+        np.add.at(diff, (rows, np.clip(starts, 0, days)), 1)
+        np.add.at(diff, (rows, np.clip(ends, 0, days)), -1)
+
+    return np.cumsum(diff[:, :days], axis=1) > 0
+
+def free_windows(occupied, nights):
+    """Find every (room row, start offset) whose next `nights` nights are all free.
+
+    Uses a sliding-window sum over the booked nights: a window is free
+    when its count of booked nights is zero.
+
+    Returns:
+        tuple: (room rows, start offsets) as numpy arrays
+    """
+    rooms, days = occupied.shape
+    if nights <= 0 or nights > days:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    booked = np.zeros((rooms, days + 1), dtype=np.int32)
+    np.cumsum(occupied, axis=1, out=booked[:, 1:])
+    window_counts = booked[:, nights:] - booked[:, :-nights]
+    return np.nonzero(window_counts == 0)
+
+def available_rooms(rooms, check_in, check_out):
+    """Return the rooms that are free for the whole stay, using one bookings query."""
+    occupied = occupancy_matrix([room.id for room in rooms], check_in, check_out)
+    free = ~occupied.any(axis=1)
+    return [room for room, is_free in zip(rooms, free) if is_free]
+
+def find_flexible_stays(rooms, window_start, window_end, nights, limit=50):
+    """Find every feasible stay of `nights` nights inside a date window, cheapest first.
+
+    Args:
+        rooms: Candidate rooms (already filtered by type and capacity)
+        window_start: Earliest check-in date
+        window_end: Latest check-out date
+        nights: Length of the stay
+        limit: Maximum number of stays to return
+
+    Returns:
+        list: FlexibleStay tuples ranked by total price, then check-in date
+    """
+    if not rooms:
+        return []
+
+    occupied = occupancy_matrix([room.id for room in rooms], window_start, window_end)
+    room_rows, starts = free_windows(occupied, nights)
+    if not len(starts):
+        return []
+
+    engine = get_rate_engine(window_start, window_end)
+    offset = (window_start - engine.start_date).days
+    type_rows = np.fromiter((engine.row_for(room.room_type) for room in rooms), dtype=np.intp, count=len(rooms))
+    prices = np.fromiter((room.price_per_night for room in rooms), dtype=float, count=len(rooms))
+    totals = engine.quote_offsets(type_rows[room_rows], prices[room_rows], starts + offset, starts + offset + nights)
+
+    order = np.lexsort((starts, totals))[:limit]
+    logger.info(f"Flexible search: {len(starts)} feasible stays across {len(rooms)} rooms")
+    return [
+        FlexibleStay(
+            room=rooms[room_rows[i]],
+            check_in=window_start + timedelta(days=int(starts[i])),
+            check_out=window_start + timedelta(days=int(starts[i]) + nights),
+            total_price=float(totals[i])
+        )
+        for i in order
+    ]
@@ -0,0 +1,89 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(Exception):
+    """Raised when too many password hashes are already running or waiting."""
+
+
+_settings = {
+    'method': 'scrypt',
+    'salt_length': 16,
+    'executor': 'thread',
+    'workers': 0,
+    'max_pending': 8,
+    'wait_seconds': 0,
+}
+_executor = None
+_slots = None
+_method_prefix = None
+_lock = threading.Lock()
+
+def _get_executor():
+    """Create the hashing pool on first use, so worker processes fork after the server does."""
+    global _executor
+    if _settings['workers'] <= 0:
+        return None
+    with _lock:
+        if _executor is None:
+            pool = ProcessPoolExecutor if _settings['executor'] == 'process' else ThreadPoolExecutor
+            _executor = pool(max_workers=_settings['workers'])
+            logger.info(f"Password hashing pool started: {_settings['workers']} {_settings['executor']} workers")
+        return _executor
+
+def _run(fn, *args):
+    """Run a hashing function in the pool, turning callers away when the pool is backed up.
+
+    werkzeug's scrypt and pbkdf2 release the GIL while hashing, so a
+    thread pool runs hashes in parallel and its size caps how many CPU
+    cores hashing can take from request handling. The calling request
+    thread still waits for its own hash, as a sync WSGI view must; what
+    the pool bounds is how many threads can be stuck that way, since
+    callers beyond max_pending get HashingBusy at once (or after
+    wait_seconds, if set).
+    """
+    executor = _get_executor()
+    if executor is None:
+        return fn(*args)
+    wait = _settings['wait_seconds']
+    if not (_slots.acquire(timeout=wait) if wait > 0 else _slots.acquire(blocking=False)):
+        logger.warning("Password hashing pool is saturated, request turned away")
+        raise HashingBusy()
+    try:
+        return executor.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+def hash_password(password):
+    """Hash a password with the configured method."""
+    return _run(generate_password_hash, password, _settings['method'], _settings['salt_length'])
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """Check whether a stored hash was made with other parameters (method or salt length) than the configured ones."""
+    global _method_prefix
+    if _method_prefix is None:
+        # werkzeug fills in default parameters (e.g. "scrypt" -> "scrypt:32768:8:1"), so ask it for the full form
+        _method_prefix = generate_password_hash('', _settings['method'], 1).split('$', 1)[0]
+    method, _, rest = password_hash.partition('$')
+    salt = rest.partition('$')[0]
+    return method != _method_prefix or len(salt) != _settings['salt_length']
+
+def init_app(app):
+    """Configure password hashing from the app config."""
+    global _executor, _slots, _method_prefix
+    _settings['method'] = app.config.get('PASSWORD_HASH_METHOD', _settings['method'])
+    _settings['salt_length'] = app.config.get('PASSWORD_HASH_SALT_LENGTH', _settings['salt_length'])
+    _settings['executor'] = app.config.get('PASSWORD_HASH_EXECUTOR', _settings['executor'])
+    _settings['workers'] = app.config.get('PASSWORD_HASH_WORKERS', _settings['workers'])
+    _settings['max_pending'] = app.config.get('PASSWORD_HASH_MAX_PENDING', _settings['max_pending'])
+    _settings['wait_seconds'] = app.config.get('PASSWORD_HASH_WAIT_SECONDS', _settings['wait_seconds'])
+    _executor = None
+    _method_prefix = None
+    _slots = threading.BoundedSemaphore(max(_settings['max_pending'], _settings['workers'], 1))
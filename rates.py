@@ -0,0 +1,191 @@
+import time
+import logging
+import threading
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Friday and Saturday nights (date.weekday() of the night's date)
+WEEKEND_NIGHTS = (4, 5)
+
+# Row 0 of the grid holds rates for room types without a plan or season of their own
+DEFAULT_ROW = 0
+
+
+class RateEngine:
+    """Nightly rate grid for every room type over a fixed date horizon.
+
+    Each row of the grid holds the multiplier applied to a room's
+    price_per_night on each night, with seasons and weekend uplifts
+    folded in. Pricing a stay is a slice sum over that row. Pricing many
+    rooms at once is one gather over the row-wise cumulative sums.
+
+    Args:
+        seasons: Iterable of objects with room_type, start_date, end_date and rate_multiplier
+        plans: Iterable of objects with room_type, weekend_uplift and los_discounts
+        start_date: First night covered by the grid
+        days: Number of nights covered by the grid
+    """
+
+    def __init__(self, seasons, plans, start_date, days):
+        seasons = list(seasons)
+        plans = list(plans)
+        self.start_date = start_date
+        self.end_date = start_date + timedelta(days=days)
+
+        room_types = sorted({s.room_type for s in seasons if s.room_type} | {p.room_type for p in plans})
+        self.type_rows = {room_type: row for row, room_type in enumerate(room_types, start=1)}
+
+        multipliers = np.ones((len(room_types) + 1, days))
+        for season in seasons:
+            start = max((season.start_date - start_date).days, 0)
+            end = min((season.end_date - start_date).days, days)
+            if start >= end:
+                continue
+            if season.room_type:
+                multipliers[self.type_rows[season.room_type], start:end] *= season.rate_multiplier
+            else:
+                multipliers[:, start:end] *= season.rate_multiplier
+
+        weekdays = (np.arange(days) + start_date.weekday()) % 7
+        weekend = np.isin(weekdays, WEEKEND_NIGHTS)
+        self.los_thresholds = [np.zeros(0, dtype=int)] * (len(room_types) + 1)
+        self.los_rates = [np.zeros(0)] * (len(room_types) + 1)
+        for plan in plans:
+            row = self.type_rows[plan.room_type]
+            if plan.weekend_uplift:
+                multipliers[row, weekend] *= 1 + plan.weekend_uplift
+            discounts = sorted((int(nights), float(rate)) for nights, rate in (plan.los_discounts or {}).items())
+            self.los_thresholds[row] = np.array([nights for nights, _ in discounts], dtype=int)
+            self.los_rates[row] = np.array([rate for _, rate in discounts])
+
+        self.multipliers = multipliers
+        self.cumulative = np.zeros((multipliers.shape[0], days + 1))
+        np.cumsum(multipliers, axis=1, out=self.cumulative[:, 1:])
+
+    def covers(self, check_in, check_out):
+        return self.start_date <= check_in and check_out <= self.end_date
+
+    def row_for(self, room_type):
+        return self.type_rows.get(room_type, DEFAULT_ROW)
+
+    def los_discount(self, row, nights):
+        """Return the length-of-stay discount rate(s) for a room type row."""
+        thresholds = self.los_thresholds[row]
+        if not len(thresholds):
+            return np.zeros_like(nights, dtype=float)
+        index = np.searchsorted(thresholds, nights, side='right') - 1
+        return np.where(index >= 0, self.los_rates[row][np.maximum(index, 0)], 0.0)
+
+    def quote(self, room_type, price_per_night, check_in, check_out):
+        """Price one stay by summing its slice of the nightly rate grid."""
+        row = self.row_for(room_type)
+        start = (check_in - self.start_date).days
+        end = (check_out - self.start_date).days
+        nights = end - start
+        total = price_per_night * self.multipliers[row, start:end].sum()
+        return round(float(total * (1 - self.los_discount(row, nights))), 2)
+
+    def quote_offsets(self, rows, prices, starts, ends):
+        """Price many stays in one vectorized pass.
+
+        Args:
+            rows: Grid row of each stay's room type
+            prices: price_per_night of each stay's room
+            starts: First night of each stay, as an offset from start_date
+            ends: Night after the last night of each stay, as an offset from start_date
+
+        Returns:
+            numpy.ndarray: Total price of each stay, rounded to cents
+        """
+        rows = np.asarray(rows)
+        starts = np.asarray(starts)
+        ends = np.asarray(ends)
+        totals = np.asarray(prices, dtype=float) * (self.cumulative[rows, ends] - self.cumulative[rows, starts])
+
+        nights = ends - starts
+        discounts = np.zeros(totals.shape)
+        for row in np.unique(rows):
+            if len(self.los_thresholds[row]):
+                mask = rows == row
+                discounts[mask] = self.los_discount(row, nights[mask])
+        return np.round(totals * (1 - discounts), 2)
+
+    def quote_rooms(self, rooms, check_in, check_out):
+        """Price the same stay for every room in a list, e.g. a search result.
+
+        Returns:
+            dict: room id -> total price
+        """
+        if not rooms:
+            return {}
+        rows = np.fromiter((self.row_for(room.room_type) for room in rooms), dtype=int, count=len(rooms))
+        prices = np.fromiter((room.price_per_night for room in rooms), dtype=float, count=len(rooms))
+        start = (check_in - self.start_date).days
+        end = (check_out - self.start_date).days
+        totals = self.quote_offsets(rows, prices, np.full(len(rooms), start), np.full(len(rooms), end))
+        return {room.id: float(total) for room, total in zip(rooms, totals)}
+
+
+_engine = None
+_engine_loaded_at = 0
+_engine_lock = threading.Lock()
+
+def load_rate_engine(check_in=None, check_out=None, horizon_days=730):
+    """Build a RateEngine from the rate plans and seasons in the database."""
+    from models import RatePlan, Season
+
+    start_date = min(check_in or date.today(), date.today())
+    end_date = max(check_out or start_date, start_date + timedelta(days=horizon_days))
+    return RateEngine(Season.query.all(), RatePlan.query.all(), start_date, (end_date - start_date).days)
+
+def get_rate_engine(check_in=None, check_out=None):
+    """Return the cached rate engine, rebuilding it when stale or too short for the stay."""
+    from flask import current_app
+
+    global _engine, _engine_loaded_at
+    ttl = current_app.config.get('RATE_ENGINE_TTL', 300)
+    with _engine_lock:
+        engine = _engine
+        stale = engine is None or time.monotonic() - _engine_loaded_at > ttl
+        if not stale and (check_in is None or engine.covers(check_in, check_out)):
+            return engine
+
+    engine = load_rate_engine(check_in, check_out)
+    with _engine_lock:
+        _engine = engine
+        _engine_loaded_at = time.monotonic()
+    logger.info(f"Rate engine loaded for {engine.start_date} to {engine.end_date}")
+    return engine
+
+def invalidate_rate_engine():
+    global _engine
+    with _engine_lock:
+        _engine = None
+
+def quote_stay(room, check_in, check_out):
+    """Price a stay in a room using the current rate plans."""
+    return get_rate_engine(check_in, check_out).quote(room.room_type, room.price_per_night, check_in, check_out)
+
+def quote_rooms(rooms, check_in, check_out):
+    """Price the same stay for every room in a list in one vectorized pass."""
+    return get_rate_engine(check_in, check_out).quote_rooms(rooms, check_in, check_out)
+
+@event.listens_for(Session, 'after_flush')
+def _note_rate_changes(session, flush_context):
+    from models import RatePlan, Season
+
+    if any(isinstance(obj, (RatePlan, Season)) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info['rates_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _reload_rates(session):
+    if session.info.pop('rates_changed', False):
+        invalidate_rate_engine()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rate_changes(session):
+    session.info.pop('rates_changed', None)
@@ -0,0 +1,145 @@
+import time
+import random
+import sqlite3
+import logging
+import threading
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+# Last measured lag per replica bind key: {bind_key: (checked_at, lag_seconds)}
+_replica_lag = {}
+_replica_lag_lock = threading.Lock()
+
+def read_replica(f):
+    """Route the read queries of a view to a read replica when one is configured."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+def _replica_keys(engines):
+    return [key for key in engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+
+def _measure_lag(engine):
+    """Return the replication lag of a replica in seconds."""
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            return connection.execute(text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )).scalar() or 0
+        # Other backends (e.g. SQLite file copies) have no replication stream to measure
+        connection.execute(text("SELECT 1"))
+        return 0
+
+def _replica_is_healthy(key, engine):
+    """Check a replica's lag against REPLICA_MAX_LAG_SECONDS, caching the result briefly."""
+    max_lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS')
+    if not max_lag:
+        return True
+
+    now = time.monotonic()
+    interval = current_app.config.get('REPLICA_LAG_CHECK_INTERVAL', 5)
+    with _replica_lag_lock:
+        checked_at, lag = _replica_lag.get(key, (None, None))
+    if checked_at is None or now - checked_at > interval:
+        try:
+            lag = float(_measure_lag(engine))
+        except Exception as e:
+            logger.warning(f"Replica {key} is unreachable, falling back to primary: {e}")
+            lag = float('inf')
+        with _replica_lag_lock:
+            _replica_lag[key] = (now, lag)
+
+    if lag > max_lag:
+        logger.warning(f"Replica {key} is {lag:.1f}s behind, falling back to primary")
+        return False
+    return True
+
+def _pick_replica(engines):
+    """Choose one healthy replica for the current request, or None for the primary."""
+    if 'replica_key' not in g:
+        keys = [key for key in _replica_keys(engines) if _replica_is_healthy(key, engines[key])]
+        g.replica_key = random.choice(keys) if keys else None
+    return engines.get(g.replica_key) if g.replica_key else None
+
+def _reads_may_use_replica():
+    """Reads go to a replica only inside a @read_replica view, and never right after a write.
+
+    A user who has just written is pinned to the primary for
+    REPLICA_STICKY_SECONDS so they always read their own writes.
+    """
+    if not has_request_context() or not g.get('read_replica') or g.get('wrote_to_primary'):
+        return False
+    return session.get('_primary_until', 0) < time.time()
+
+
+class RoutingSession(Session):
+    """Session that sends reads from @read_replica views to a replica bind.
+
+    Writes, flushes and anything inside a session with pending changes
+    always use the primary engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None
+                and not self._flushing
+                and not isinstance(clause, UpdateBase)
+                and not (self.new or self.dirty or self.deleted)
+                and _reads_may_use_replica()):
+            engine = _pick_replica(self._db.engines)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_primary_write(session, flush_context):
+    if has_request_context():
+        g.wrote_to_primary = True
+
+def init_app(app):
+    """Register the request hook that pins writers to the primary."""
+    @app.after_request
+    def pin_writer_to_primary(response):
+        if g.get('wrote_to_primary') and _replica_keys(app.config.get('SQLALCHEMY_BINDS') or {}):
+            session['_primary_until'] = time.time() + app.config.get('REPLICA_STICKY_SECONDS', 5)
+        return response
+
+def sync_sqlite_replicas(app):
+    """Copy the primary SQLite database into every SQLite replica file.
+
+    This is only meant for local testing of replica routing, where a
+    second SQLite file stands in for a real replica.
+
+    Returns:
+        list: The replica database paths that were refreshed
+    """
+    from sqlalchemy.engine import make_url
+
+    primary = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if primary.get_backend_name() != 'sqlite':
+        raise ValueError("Replica sync is only supported for SQLite databases")
+
+    db = app.extensions['sqlalchemy']
+    with app.app_context():
+        primary_path = db.engines[None].url.database
+        synced = []
+        for key in _replica_keys(app.config.get('SQLALCHEMY_BINDS') or {}):
+            replica_url = db.engines[key].url
+            if replica_url.get_backend_name() != 'sqlite':
+                continue
+            db.engines[key].dispose()
+            with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_url.database) as target:
+                source.backup(target)
+            synced.append(replica_url.database)
+            logger.info(f"Synced SQLite replica {key} from {primary_path}")
+    return synced
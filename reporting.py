@@ -0,0 +1,229 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+logger = logging.getLogger(__name__)
+
+
+class ReportJob:
+    """A summary table kept up to date from the bookings changed since the last run.
+
+    Each job says what one booking contributes to its summary table, as
+    amounts to add to some of the table's rows. When a booking changes,
+    what it contributed before is taken back and its new contribution
+    added, so a run only touches the bookings changed since the job's
+    watermark.
+
+    Subclasses set name, model, keys and measures, and implement
+    contributions().
+    """
+
+    name = None
+    model = None
+    keys = ()
+    measures = ()
+
+    def contributions(self, booking):
+        """Return {row key tuple: {measure: amount}} for a booking."""
+        raise NotImplementedError
+
+    def encode_key(self, key):
+        return [str(part) for part in key]
+
+    def decode_key(self, key):
+        return tuple(key)
+
+
+class RevenueJob(ReportJob):
+    """Bookings, room nights and revenue by check-in month and room type.
+
+    Average length of stay is room_nights / bookings.
+    """
+
+    name = 'revenue'
+    keys = ('month', 'room_type')
+    measures = ('bookings', 'room_nights', 'revenue')
+
+    @property
+    def model(self):
+        from models import RevenueSummary
+        return RevenueSummary
+
+    def contributions(self, booking):
+        if booking.booking_status == 'canceled':
+            return {}
+        key = (booking.check_in_date.strftime('%Y-%m'), booking.room.room_type)
+        nights = (booking.check_out_date - booking.check_in_date).days
+        return {key: {'bookings': 1, 'room_nights': nights, 'revenue': booking.total_price}}
+
+
+class OccupancyJob(ReportJob):
+    """Rooms occupied, guests and revenue for each night and room type."""
+
+    name = 'occupancy'
+    keys = ('night', 'room_type')
+    measures = ('rooms_occupied', 'guests', 'revenue')
+
+    @property
+    def model(self):
+        from models import NightlyOccupancy
+        return NightlyOccupancy
+
+    def contributions(self, booking):
+        if booking.booking_status == 'canceled':
+            return {}
+        nights = (booking.check_out_date - booking.check_in_date).days
+        return {
+            (booking.check_in_date + timedelta(days=n), booking.room.room_type): {
+                'rooms_occupied': 1,
+                'guests': booking.guests,
+                'revenue': booking.total_price / nights
+            }
+            for n in range(nights)
+        }
+
+    def decode_key(self, key):
+        return (datetime.strptime(key[0], '%Y-%m-%d').date(), key[1])
+
+
+JOBS = {job.name: job for job in (RevenueJob(), OccupancyJob())}
+
+def _changed_bookings(watermark, until, batch_size):
+    from models import Booking
+
+    return Booking.query.options(joinedload(Booking.room)).filter(
+        or_(
+            Booking.updated_at > watermark.updated_at,
+            and_(Booking.updated_at == watermark.updated_at, Booking.id > watermark.booking_id)
+        ),
+        Booking.updated_at <= until
+    ).order_by(Booking.updated_at, Booking.id).limit(batch_size).all()
+
+def _apply(job, deltas):
+    """Add per-row amounts to a job's summary table."""
+    from app import db
+
+    for key, amounts in deltas.items():
+        identity = dict(zip(job.keys, key))
+        row = db.session.get(job.model, identity)
+        if row is None:
+            row = job.model(**identity, **{measure: 0 for measure in job.measures})
+            db.session.add(row)
+        for measure, amount in amounts.items():
+            setattr(row, measure, getattr(row, measure) + amount)
+
+def _fold(job, bookings):
+    """Take back what each booking contributed to a job's summary table before and add what it contributes now."""
+    from app import db
+    from models import ReportedBooking
+
+    reported = {
+        (r.booking_id, r.booking_created_at): r for r in ReportedBooking.query.filter(
+            ReportedBooking.job == job.name,
+            ReportedBooking.booking_id.in_([b.id for b in bookings])
+        )
+    }
+    deltas = defaultdict(lambda: defaultdict(int))
+    for booking in bookings:
+        previous = reported.get((booking.id, booking.created_at))
+        if previous is not None:
+            for key, amounts in previous.contribution:
+                for measure, amount in amounts.items():
+                    deltas[job.decode_key(key)][measure] -= amount
+        contribution = job.contributions(booking)
+        for key, amounts in contribution.items():
+            for measure, amount in amounts.items():
+                deltas[key][measure] += amount
+
+        encoded = [[job.encode_key(key), amounts] for key, amounts in contribution.items()]
+        if previous is None:
+            db.session.add(ReportedBooking(
+                job=job.name, booking_id=booking.id, booking_created_at=booking.created_at, contribution=encoded
+            ))
+        else:
+            previous.contribution = encoded
+
+    _apply(job, deltas)
+
+def run_job(job, batch_size=500, lag=timedelta(seconds=60)):
+    """Fold the bookings changed since a job's watermark into its summary table.
+
+    Each batch of bookings is committed together with the watermark, so a
+    run that fails part way resumes after the last batch it committed.
+    Bookings changed within the last `lag` are left for the next run: a
+    transaction still open now may yet commit a change stamped earlier
+    than them, which would otherwise fall behind the watermark.
+
+    Returns:
+        int: Number of bookings processed
+    """
+    from app import db
+    from models import ReportWatermark
+
+    watermark = db.session.get(ReportWatermark, job.name)
+    if watermark is None:
+        watermark = ReportWatermark(job=job.name, updated_at=datetime.min, booking_id=0)
+        db.session.add(watermark)
+    until = datetime.utcnow() - lag
+    processed = 0
+
+    while True:
+        bookings = _changed_bookings(watermark, until, batch_size)
+        if not bookings:
+            break
+
+        _fold(job, bookings)
+        watermark.updated_at, watermark.booking_id = bookings[-1].updated_at, bookings[-1].id
+        watermark.last_run_at = datetime.utcnow()
+        db.session.commit()
+        processed += len(bookings)
+
+    watermark.last_run_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"Report job {job.name}: {processed} bookings processed")
+    return processed
+
+def run_jobs(names=None):
+    """Run the named report jobs, or all of them, with the REPORTING_* settings.
+
+    Returns:
+        dict: Job name -> number of bookings processed
+    """
+    from flask import current_app
+
+    batch_size = current_app.config.get('REPORTING_BATCH_SIZE', 500)
+    lag = timedelta(seconds=current_app.config.get('REPORTING_WATERMARK_LAG', 60))
+    return {name: run_job(JOBS[name], batch_size, lag) for name in (names or JOBS)}
+
+def rebuild_job(job, batch_size=500):
+    """Start a job's summary table over from the archived bookings, so its next run adds the current ones.
+
+    Archived bookings never change again, so the watermark never brings
+    them back: they are folded in here, in the same transaction that
+    empties the table.
+    """
+    from app import db
+    from models import ArchivedBooking, ReportWatermark, ReportedBooking
+
+    try:
+        job.model.query.delete()
+        ReportedBooking.query.filter_by(job=job.name).delete()
+        ReportWatermark.query.filter_by(job=job.name).delete()
+
+        last_id = folded = 0
+        while True:
+            archived = ArchivedBooking.query.options(joinedload(ArchivedBooking.room)).filter(
+                ArchivedBooking.id > last_id
+            ).order_by(ArchivedBooking.id).limit(batch_size).all()
+            if not archived:
+                break
+            _fold(job, archived)
+            last_id = archived[-1].id
+            folded += len(archived)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(f"Report job {job.name}: rebuilt from {folded} archived bookings")
@@ -0,0 +1,418 @@
+import logging
+from dataclasses import dataclass
+from datetime import date
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Free gaps of at most this many nights between two stays are considered unsellable
+STRANDED_GAP_NIGHTS = 1
+
+# Rooms tried when making room for a new stay, fewest blocked nights first
+MAX_ROOMS_TRIED = 50
+
+# Stand-in gap length for "no neighbouring stay in sight"
+FAR = 1 << 20
+
+RESERVED = -1
+
+
+@dataclass
+class RepackResult:
+    """Outcome of re-packing the bookings of one room type."""
+    room_type: str
+    rooms: int
+    bookings: int
+    flexible_bookings: int
+    moved: int
+    stranded_before: int
+    stranded_after: int
+    feasible: bool
+    assignment: dict  # booking id (None for a new stay) -> room id, for stays that move or are new
+
+    @property
+    def recovered(self):
+        """Room-nights that became sellable again."""
+        return self.stranded_before - self.stranded_after
+
+
+def stranded_nights(room_rows, starts, ends, max_gap=STRANDED_GAP_NIGHTS):
+    """Count the nights stuck in short gaps between consecutive stays of the same room."""
+    if len(starts) < 2:
+        return 0
+    order = np.lexsort((starts, room_rows))
+    rows, s, e = room_rows[order], starts[order], ends[order]
+    gaps = s[1:] - e[:-1]
+    same_room = rows[1:] == rows[:-1]
+    return int(gaps[same_room & (gaps > 0) & (gaps <= max_gap)].sum())
+
+
+class RoomGrid:
+    """Nightly occupancy of the rooms of one type, recording which stay holds each night.
+
+    cells[night, row] is the stay number + 1, or 0 when the room is free.
+    Nights are the first axis so the nights of a stay are one contiguous
+    slice, and every query below is a vectorized pass over all rooms.
+
+    Args:
+        capacities: Capacity of each room (one grid column each)
+        days: Number of nights covered, counted from night 0
+        max_gap: Longest gap between stays that counts as stranded
+    """
+
+    def __init__(self, capacities, days, max_gap=STRANDED_GAP_NIGHTS):
+        self.capacities = np.asarray(capacities)
+        self.cells = np.zeros((days, len(self.capacities)), dtype=np.int32)
+        self.max_gap = max_gap
+        self.stays = []  # [row, start, end, guests, movable] per stay number
+        self.movable = [False]  # indexed by cell value
+
+    def _paint(self, value, row, start, end):
+        self.cells[max(start, 0):end, row] = value
+
+    def _place(self, number, row):
+        _, start, end = self.stays[number][:3]
+        self._paint(number + 1, row, start, end)
+        self.stays[number][0] = row
+
+    def _lift(self, number):
+        row, start, end = self.stays[number][:3]
+        self._paint(0, row, start, end)
+
+    def add(self, row, start, end, guests, movable=False):
+        """Place a stay in a room and return its stay number."""
+        self.stays.append([row, start, end, guests, movable])
+        self.movable.append(movable)
+        self._place(len(self.stays) - 1, row)
+        return len(self.stays) - 1
+
+    def stranded_nights(self):
+        stays = np.array([stay[:3] for stay in self.stays], dtype=np.int64).reshape(-1, 3)
+        return stranded_nights(stays[:, 0], stays[:, 1], stays[:, 2], self.max_gap)
+
+    def placement_costs(self, start, end):
+        """Change in stranded nights from putting a stay into each room.
+
+        Only the few nights on either side of the stay can be affected,
+        so just those are inspected. Also returns how many sides of the
+        stay would touch a neighbouring stay, to break ties.
+        """
+        window = self.max_gap + 1
+
+        def gap_to_first_stay(nights):
+            # Nights are ordered moving away from the stay; the horizon edge counts as far away
+            occupied = nights != 0
+            if not len(occupied):
+                return np.full(self.cells.shape[1], FAR)
+            return np.where(occupied.any(axis=0), np.argmax(occupied, axis=0), FAR)
+
+        gap_before = gap_to_first_stay(self.cells[max(start - window, 0):max(start, 0)][::-1])
+        gap_after = gap_to_first_stay(self.cells[end:end + window])
+
+        def stranded(gap):
+            return np.where((gap >= 1) & (gap <= self.max_gap), gap, 0)
+
+        costs = stranded(gap_before) + stranded(gap_after) - stranded(gap_before + (end - start) + gap_after)
+        touches = (gap_before == 0).astype(int) + (gap_after == 0)
+        return costs, touches
+
+    def best_row(self, start, end, guests, current=None):
+        """Pick the free room where a stay strands the fewest nights, or None if no room is free.
+
+        The current room wins ties, so stays only move for a real gain.
+        """
+        free = ~self.cells[max(start, 0):end].any(axis=0) & (self.capacities >= guests)
+        if not free.any():
+            return None
+        costs, touches = self.placement_costs(start, end)
+        # Costs are whole nights, so two touches never outweigh one of them
+        score = np.where(free, 3 * costs - touches, FAR)
+        best = int(np.argmin(score))
+        if current is not None and free[current] and score[current] <= score[best]:
+            return current
+        return best
+
+    def compact(self):
+        """Move each movable stay, in check-in order, to the room where it strands the fewest nights.
+
+        A stay's own room is always a candidate, so every move keeps the
+        grid feasible and never adds stranded nights.
+
+        Returns:
+            int: Number of stays that changed room
+        """
+        moved = 0
+        movable = sorted((stay[1], number) for number, stay in enumerate(self.stays) if stay[4])
+        for _, number in movable:
+            row, start, end, guests, _ = self.stays[number]
+            self._lift(number)
+            best = self.best_row(start, end, guests, current=row)
+            self._place(number, best)
+            moved += best != row
+        return moved
+
+    def make_room(self, start, end, guests, rows=None):
+        """Find a room for a new stay, moving movable stays out of its way if needed.
+
+        Rooms are tried with the fewest blocked nights first. A room
+        qualifies if everything blocking it is movable and fits into some
+        other free room.
+
+        Args:
+            rows: Optional rows the new stay may go in (stays moved out of its way may still use any room)
+
+        Returns:
+            int: Row of the room for the new stay, or None if it can't be fitted in
+        """
+        window = self.cells[start:end]
+        occupied = window != 0
+        pinned = (occupied & ~np.asarray(self.movable)[window]).any(axis=0) | (self.capacities < guests)
+        if rows is not None:
+            pinned |= ~np.isin(np.arange(len(self.capacities)), list(rows))
+        candidates = np.flatnonzero(~pinned)
+        candidates = candidates[np.argsort(occupied.sum(axis=0)[candidates], kind='stable')]
+
+        for row in candidates[:MAX_ROOMS_TRIED]:
+            row = int(row)
+            blockers = [int(value) - 1 for value in np.unique(window[:, row]) if value > 0]
+            if not blockers:
+                return row
+
+            for number in blockers:
+                self._lift(number)
+            self._paint(RESERVED, row, start, end)
+
+            placed = []
+            for number in blockers:
+                _, stay_start, stay_end, stay_guests, _ = self.stays[number]
+                target = self.best_row(stay_start, stay_end, stay_guests)
+                if target is None:
+                    break
+                self._place(number, target)
+                placed.append(number)
+            else:
+                self._paint(0, row, start, end)
+                return row
+
+            # Put everything back and try the next room
+            for number in placed:
+                self._lift(number)
+            self._paint(0, row, start, end)
+            for number in blockers:
+                self._place(number, row)
+        return None
+
+
+def _load_grid(room_type, today, horizon_end=None):
+    """Build the RoomGrid of a room type from its current and future bookings.
+
+    Stays that have already started and bookings pinned to a room can't
+    move; bookings made by room type (Booking.room_flexible) can.
+
+    Returns:
+        tuple: (rooms, grid, booking id per stay number)
+    """
+    from app import db
+    from models import Room, Booking
+
+    rooms = Room.query.filter(Room.room_type == room_type).order_by(Room.id).all()
+    row_of = {room.id: row for row, room in enumerate(rooms)}
+    bookings = db.session.query(
+        Booking.id, Booking.room_id, Booking.check_in_date, Booking.check_out_date,
+        Booking.guests, Booking.room_flexible
+    ).filter(
+        Booking.room_id.in_(row_of.keys()),
+        Booking.booking_status != 'canceled',
+        Booking.check_out_date > today
+    ).all()
+
+    origin = today.toordinal()
+    last_night = max([b.check_out_date.toordinal() for b in bookings] + [(horizon_end or today).toordinal()])
+    grid = RoomGrid([room.capacity for room in rooms], last_night - origin + 1)
+    booking_ids = []
+    for b in bookings:
+        grid.add(
+            row_of[b.room_id],
+            b.check_in_date.toordinal() - origin,
+            b.check_out_date.toordinal() - origin,
+            b.guests,
+            movable=bool(b.room_flexible) and b.check_in_date > today
+        )
+        booking_ids.append(b.id)
+    return rooms, grid, booking_ids
+
+def repack_room_type(room_type, new_stay=None, today=None, room_ids=None):
+    """Re-pack the current and future bookings of a room type.
+
+    Without a new stay, flexible bookings are moved to close gaps between
+    stays. With one, only the bookings in its way are moved to fit it in.
+    Nothing is written to the database.
+
+    Args:
+        room_type: The room type to re-pack
+        new_stay: Optional (check_in, check_out, guests) to fit in
+        today: Reference date, defaults to today
+        room_ids: Optional IDs of the rooms the new stay may be placed in
+
+    Returns:
+        RepackResult
+    """
+    today = today or date.today()
+    rooms, grid, booking_ids = _load_grid(room_type, today, new_stay[1] if new_stay else None)
+    original_rows = [stay[0] for stay in grid.stays]
+    stranded_before = grid.stranded_nights()
+
+    new_row = None
+    if new_stay:
+        check_in, check_out, guests = new_stay
+        start = check_in.toordinal() - today.toordinal()
+        end = check_out.toordinal() - today.toordinal()
+        rows = None if room_ids is None else [row for row, room in enumerate(rooms) if room.id in room_ids]
+        new_row = grid.make_room(start, end, guests, rows) if rooms else None
+        if new_row is not None:
+            grid.add(new_row, start, end, guests, movable=True)
+    else:
+        grid.compact()
+
+    assignment = {
+        booking_ids[number]: rooms[grid.stays[number][0]].id
+        for number, row in enumerate(original_rows)
+        if grid.stays[number][0] != row
+    }
+    moved = len(assignment)
+    if new_row is not None:
+        assignment[None] = rooms[new_row].id
+
+    return RepackResult(
+        room_type=room_type,
+        rooms=len(rooms),
+        bookings=len(booking_ids),
+        flexible_bookings=sum(1 for stay in grid.stays[:len(booking_ids)] if stay[4]),
+        moved=moved,
+        stranded_before=stranded_before,
+        stranded_after=grid.stranded_nights(),
+        feasible=not new_stay or new_row is not None,
+        assignment=assignment
+    )
+
+def apply_assignment(result):
+    """Move bookings to the rooms chosen by repack_room_type (caller commits)."""
+    from models import Booking
+
+    moves = {key: room_id for key, room_id in result.assignment.items() if key is not None}
+    for booking in Booking.query.filter(Booking.id.in_(moves.keys())).all():
+        booking.room_id = moves[booking.id]
+
+def optimize_room_assignments(apply=False):
+    """Re-pack every room type and optionally save the new room assignments.
+
+    Without apply this only reads, taking no locks, so previewing never
+    holds up bookings. With apply, each room type's rooms are locked while
+    it is re-packed and its moves are committed before the next type, so
+    bookings for one type wait for that type only.
+
+    Returns:
+        list: A RepackResult per room type
+    """
+    from app import db
+    from models import Room
+
+    results = []
+    room_types = [row.room_type for row in db.session.query(Room.room_type).distinct().order_by(Room.room_type)]
+    try:
+        for room_type in room_types:
+            if apply:
+                # Lock the rooms so no booking for this type lands while it is re-packed
+                Room.query.filter(Room.room_type == room_type).with_for_update().all()
+            result = repack_room_type(room_type)
+            if apply:
+                if result.moved:
+                    apply_assignment(result)
+                db.session.commit()
+            results.append(result)
+            logger.info(f"Room optimizer ({room_type}): {result.moved} bookings to move, "
+                        f"{result.recovered} room-nights recovered")
+        if not apply:
+            db.session.rollback()
+    except Exception:
+        db.session.rollback()
+        raise
+    return results
+
+def room_type_offers(rooms, check_in, check_out):
+    """Find the room types that could take a stay if their flexible bookings were moved.
+
+    A type qualifies when, on every night of the stay, at least one of
+    its rooms is free. This is only a quick screen; book_room_type does
+    the actual fitting.
+
+    Args:
+        rooms: Candidate rooms (already filtered by type and capacity)
+
+    Returns:
+        dict: room type -> price of the stay (the cheapest room of the type)
+    """
+    from occupancy import occupancy_matrix
+    from rates import quote_rooms
+
+    by_type = {}
+    for room in rooms:
+        by_type.setdefault(room.room_type, []).append(room)
+
+    offers = {}
+    for room_type, type_rooms in sorted(by_type.items()):
+        occupied = occupancy_matrix([room.id for room in type_rooms], check_in, check_out)
+        if occupied.size and not occupied.all(axis=0).any():
+            offers[room_type] = min(quote_rooms(type_rooms, check_in, check_out).values())
+    return offers
+
+def book_room_type(user, room_type, check_in, check_out, guests, room_ids=None):
+    """Book a stay by room type, letting the hotel choose (and later change) the room.
+
+    If no single room of the type is free for the whole stay, flexible
+    bookings in the way are moved to other rooms, all in the same
+    transaction. The stay is charged at the price of the cheapest room
+    of the type that fits the party, whichever room it ends up in.
+
+    With room_ids (the rooms matching the guest's must-have amenities or
+    keywords) the stay is placed in and priced from those rooms only, as
+    room_type_offers offered it, and is pinned to its room so later
+    re-packs can't move it into a room without them.
+
+    Returns:
+        Booking: The new booking, or None if the stay can't be fitted in
+    """
+    from app import db
+    from models import Room, Booking
+    from rates import quote_rooms
+
+    try:
+        rooms = Room.query.filter(Room.room_type == room_type).with_for_update().all()
+        eligible = [room for room in rooms if room.capacity >= guests and (room_ids is None or room.id in room_ids)]
+        result = repack_room_type(room_type, new_stay=(check_in, check_out, guests), room_ids=room_ids) if eligible else None
+        if not result or not result.feasible:
+            db.session.rollback()
+            return None
+
+        apply_assignment(result)
+        room = db.session.get(Room, result.assignment[None])
+        booking = Booking(
+            user_id=user.id,
+            room_id=room.id,
+            check_in_date=check_in,
+            check_out_date=check_out,
+            guests=guests,
+            total_price=min(quote_rooms(eligible, check_in, check_out).values()),
+            booking_status='confirmed',
+            payment_status='paid',
+            room_flexible=room_ids is None
+        )
+        db.session.add(booking)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Room type booking {booking.id} ({room_type}) placed in room {room.room_number}, "
+                f"{result.moved} other bookings moved")
+    return booking
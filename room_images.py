@@ -0,0 +1,239 @@
+import os
+import hashlib
+from io import BytesIO
+import logging
+from urllib.request import urlopen
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, send_from_directory, url_for
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+# Formats every variant is written in, best first; browsers without WebP support get the JPEG
+VARIANT_FORMATS = (
+    ('webp', 'image/webp', 'WEBP'),
+    ('jpg', 'image/jpeg', 'JPEG'),
+)
+
+# Image types admins may upload, by the format Pillow detects
+UPLOAD_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+# Variant widths are rendered here, so request threads never resize images
+_pool = None
+
+
+class InvalidImageError(ValueError):
+    """Raised when an upload is not a JPEG, PNG or WebP image."""
+
+
+def render_variants(source, directory, widths, quality):
+    """Write WebP and JPEG copies of an image at each width no wider than the image itself.
+
+    Runs in a worker process, so it must not touch the app or the database.
+
+    Returns:
+        list: The widths written, narrowest first
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    targets = sorted({min(width, image.width) for width in widths})
+    for width in targets:
+        height = round(image.height * width / image.width)
+        variant = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for extension, mimetype, pil_format in VARIANT_FORMATS:
+            path = os.path.join(directory, f"{width}.{extension}")
+            # Write to a temporary name first, so a half-written file is never served
+            variant.save(f"{path}.tmp", pil_format, quality=quality, optimize=True)
+            os.replace(f"{path}.tmp", path)
+    return targets
+
+def _image_directory(key):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'rooms', key)
+
+def save_upload(file):
+    """Store an uploaded room image under a hash of its content.
+
+    Returns:
+        tuple: (image key, extension of the stored original) to save on the room
+    """
+    return store_image(file.read())
+
+def store_image(data):
+    """Store an image's bytes under a hash of their content.
+
+    Returns:
+        tuple: (image key, extension of the stored original)
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image.verify()
+            extension = UPLOAD_FORMATS.get(image.format)
+    except Exception:
+        extension = None
+    if extension is None:
+        raise InvalidImageError('Upload a JPEG, PNG or WebP image.')
+
+    key = hashlib.sha256(data).hexdigest()[:16]
+    directory = _image_directory(key)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"original.{extension}"), 'wb') as f:
+        f.write(data)
+    return key, extension
+
+def _original_name(room):
+    return f"original.{room.image_extension}"
+
+def queue_variants(room):
+    """Render the variants of a room's uploaded image in the background.
+
+    The room's image_widths are filled in once they are written; until
+    then pages show the original upload.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=current_app.config.get('ROOM_IMAGE_WORKERS', 2))
+    room_id, key = room.id, room.image_key
+    future = _pool.submit(
+        render_variants,
+        os.path.join(_image_directory(key), _original_name(room)),
+        _image_directory(key),
+        current_app.config.get('ROOM_IMAGE_WIDTHS', (320, 640, 1024, 1600)),
+        current_app.config.get('ROOM_IMAGE_QUALITY', 80)
+    )
+    app = current_app._get_current_object()
+    future.add_done_callback(lambda f: _variants_rendered(app, room_id, key, f))
+
+def _variants_rendered(app, room_id, key, future):
+    from app import db
+    from models import Room
+
+    with app.app_context():
+        try:
+            widths = future.result()
+            room = db.session.get(Room, room_id)
+            # The room may have been given another image while this one was rendering
+            if room and room.image_key == key:
+                room.image_widths = ','.join(str(width) for width in widths)
+                db.session.commit()
+            logger.info(f"Rendered room image {key} at widths {widths}")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to render variants of room image {key}: {e}")
+
+def render_missing_variants():
+    """Render, in this process, the variants of uploaded images that have none, e.g. after a restart.
+
+    Returns:
+        int: Number of rooms whose images were rendered
+    """
+    from app import db
+    from models import Room
+
+    rooms = Room.query.filter(Room.image_key.isnot(None), Room.image_widths.is_(None)).all()
+    for room in rooms:
+        directory = _image_directory(room.image_key)
+        if not room.image_extension:
+            # Uploaded before the extension was stored on the room
+            room.image_extension = next(
+                filename.split('.', 1)[1] for filename in os.listdir(directory) if filename.startswith('original.')
+            )
+        widths = render_variants(
+            os.path.join(directory, _original_name(room)),
+            directory,
+            current_app.config.get('ROOM_IMAGE_WIDTHS', (320, 640, 1024, 1600)),
+            current_app.config.get('ROOM_IMAGE_QUALITY', 80)
+        )
+        room.image_widths = ','.join(str(width) for width in widths)
+    db.session.commit()
+    return len(rooms)
+
+def import_remote_images():
+    """Download the remote image_url of every room without an uploaded image and store it as if uploaded.
+
+    The variants are rendered in this process, so the rooms get srcsets
+    like uploaded images. Rooms whose image can't be fetched or isn't a
+    JPEG, PNG or WebP image keep their remote URL.
+
+    Returns:
+        int: Number of rooms whose images were imported
+    """
+    from app import db
+    from models import Room
+
+    limit = current_app.config.get('MAX_CONTENT_LENGTH') or 16 * 1024 * 1024
+    imported = 0
+    for room in Room.query.filter(Room.image_key.is_(None)).all():
+        if not room.image_url.startswith(('http://', 'https://')):
+            continue
+        try:
+            with urlopen(room.image_url, timeout=30) as response:
+                data = response.read(limit + 1)
+            if len(data) > limit:
+                raise InvalidImageError(f"Image is larger than {limit} bytes.")
+            room.image_key, room.image_extension = store_image(data)
+            room.image_widths = None
+            imported += 1
+        except Exception as e:
+            logger.error(f"Failed to import the image of room {room.room_number} from {room.image_url}: {e}")
+    db.session.commit()
+    render_missing_variants()
+    return imported
+
+def room_image(room, sizes='100vw', **attrs):
+    """Render a room's image as a <picture> offering each stored width in WebP and JPEG.
+
+    Rooms with a remote image_url (until flask import-room-images fetches
+    it), or whose variants are still being rendered, get a plain <img>.
+    Nothing here touches the filesystem.
+
+    Args:
+        room: The room
+        sizes: The sizes attribute, i.e. how wide the image is shown at each viewport width
+        **attrs: Extra attributes for the <img>, e.g. class_="card-img-top"; loading defaults to "lazy"
+    """
+    alt = escape(attrs.pop('alt', room.room_type))
+    attrs.setdefault('loading', 'lazy')
+    attributes = ''.join(f' {name.rstrip("_").replace("_", "-")}="{escape(value)}"' for name, value in attrs.items())
+    if not room.image_key:
+        return Markup(f'<img src="{escape(room.image_url)}" alt="{alt}"{attributes}>')
+    if not room.image_widths:
+        src = url_for('room_image_file', key=room.image_key, filename=_original_name(room))
+        return Markup(f'<img src="{src}" alt="{alt}"{attributes}>')
+
+    widths = [int(width) for width in room.image_widths.split(',')]
+    srcsets = {
+        extension: ', '.join(f"{url_for('room_image_file', key=room.image_key, filename=f'{width}.{extension}')} {width}w" for width in widths)
+        for extension, mimetype, pil_format in VARIANT_FORMATS
+    }
+    # Browsers that ignore srcset get the widest variant up to 1024px
+    fallback = max([width for width in widths if width <= 1024] or widths[:1])
+    sources = ''.join(
+        f'<source type="{mimetype}" srcset="{srcsets[extension]}" sizes="{escape(sizes)}">'
+        for extension, mimetype, pil_format in VARIANT_FORMATS[:-1]
+    )
+    jpeg = VARIANT_FORMATS[-1][0]
+    src = url_for('room_image_file', key=room.image_key, filename=f'{fallback}.{jpeg}')
+    return Markup(
+        f'<picture>{sources}<img src="{src}" srcset="{srcsets[jpeg]}" sizes="{escape(sizes)}" '
+        f'alt="{alt}"{attributes}></picture>'
+    )
+
+def serve_room_image(key, filename):
+    """Serve a stored room image. Files never change under their key, so browsers may cache them for good."""
+    from static_assets import IMMUTABLE_MAX_AGE
+
+    response = send_from_directory(_image_directory(key), filename, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init_app(app):
+    """Serve uploaded room images and expose room_image() to templates."""
+    if not app.config.get('UPLOAD_FOLDER'):
+        app.config['UPLOAD_FOLDER'] = os.path.join(app.instance_path, 'uploads')
+    app.add_url_rule('/uploads/rooms/<string(length=16):key>/<filename>', 'room_image_file', serve_room_image)
+    app.jinja_env.globals['room_image'] = room_image
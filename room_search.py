@@ -0,0 +1,200 @@
+import re
+import math
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Room columns covered by the keyword search
+INDEXED_FIELDS = ('description', 'amenities')
+
+# PostgreSQL expression the GIN index is built on; queries must use the same expression to hit it
+TSVECTOR = "to_tsvector('english', coalesce(rooms.description, '') || ' ' || coalesce(rooms.amenities, ''))"
+
+WORD_PATTERN = re.compile(r'\w+')
+
+_settings = {
+    'backend': 'python',
+}
+
+
+def tokenize(value):
+    return WORD_PATTERN.findall((value or '').lower())
+
+
+class InvertedIndex:
+    """In-memory keyword index over room descriptions and amenities, ranked with BM25.
+
+    Used when the database has no full-text index of its own.
+
+    Args:
+        documents: Iterable of (room id, text)
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, documents):
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        for room_id, value in documents:
+            tokens = tokenize(value)
+            self.lengths[room_id] = len(tokens)
+            for token, count in Counter(tokens).items():
+                self.postings[token][room_id] = count
+        self.average_length = sum(self.lengths.values()) / len(self.lengths) if self.lengths else 0
+
+    def search(self, query):
+        """Return the IDs of rooms matching any query word, best match first."""
+        scores = defaultdict(float)
+        total = len(self.lengths)
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for room_id, count in postings.items():
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[room_id] / self.average_length)
+                scores[room_id] += idf * count * (self.K1 + 1) / (count + norm)
+        return sorted(scores, key=lambda room_id: (-scores[room_id], room_id))
+
+
+_index = None
+_index_loaded_at = 0
+_index_lock = threading.Lock()
+
+def _room_text(description, amenities):
+    return f"{description or ''} {amenities or ''}"
+
+def _get_inverted_index():
+    """Return the cached in-memory index, rebuilding it when stale."""
+    from flask import current_app
+    from app import db
+    from models import Room
+
+    global _index, _index_loaded_at
+    ttl = current_app.config.get('ROOM_SEARCH_INDEX_TTL', 300)
+    with _index_lock:
+        if _index is not None and time.monotonic() - _index_loaded_at <= ttl:
+            return _index
+
+    rows = db.session.query(Room.id, Room.description, Room.amenities).all()
+    index = InvertedIndex((room_id, _room_text(description, amenities)) for room_id, description, amenities in rows)
+    with _index_lock:
+        _index = index
+        _index_loaded_at = time.monotonic()
+    logger.info(f"Room keyword index built for {len(rows)} rooms")
+    return index
+
+def _fts5_query(query):
+    # Quote every word, so FTS5 operators and punctuation in guest input are taken literally
+    return ' OR '.join(f'"{token}"' for token in tokenize(query))
+
+def search_rooms(query):
+    """Find rooms whose description or amenities match any of the words in a query.
+
+    Returns:
+        list: Room IDs, best match first (BM25 on SQLite and in memory, ts_rank_cd on PostgreSQL)
+    """
+    from app import db
+
+    if not tokenize(query):
+        return []
+
+    backend = _settings['backend']
+    if backend == 'fts5':
+        rows = db.session.execute(text(
+            "SELECT rowid FROM rooms_fts WHERE rooms_fts MATCH :query ORDER BY bm25(rooms_fts, 1.0, 2.0), rowid"
+        ), {'query': _fts5_query(query)})
+        return [row[0] for row in rows]
+    if backend == 'tsvector':
+        rows = db.session.execute(text(
+            f"SELECT rooms.id FROM rooms, to_tsquery('english', :query) AS query "
+            f"WHERE {TSVECTOR} @@ query ORDER BY ts_rank_cd({TSVECTOR}, query) DESC, rooms.id"
+        ), {'query': ' | '.join(tokenize(query))})
+        return [row[0] for row in rows]
+    return _get_inverted_index().search(query)
+
+def rebuild_index():
+    """Rebuild the keyword index from the rooms table."""
+    from app import db
+
+    global _index
+    if _settings['backend'] == 'fts5':
+        db.session.execute(text("DELETE FROM rooms_fts"))
+        db.session.execute(text("INSERT INTO rooms_fts (rowid, description, amenities) SELECT id, description, amenities FROM rooms"))
+        db.session.commit()
+    with _index_lock:
+        _index = None
+
+@event.listens_for(Session, 'after_flush')
+def _sync_changed_rooms(session, flush_context):
+    """Apply room changes to the FTS5 table in the same transaction, or mark the in-memory index stale."""
+    from models import Room
+
+    changed = [obj for obj in list(session.new) + list(session.dirty) if isinstance(obj, Room) and (
+        obj in session.new or any(getattr(inspect(obj).attrs, field).history.has_changes() for field in INDEXED_FIELDS)
+    )]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Room)]
+    if not changed and not deleted:
+        return
+
+    if _settings['backend'] == 'fts5':
+        connection = session.connection()
+        for room_id in deleted + [room.id for room in changed]:
+            connection.execute(text("DELETE FROM rooms_fts WHERE rowid = :id"), {'id': room_id})
+        for room in changed:
+            connection.execute(text("INSERT INTO rooms_fts (rowid, description, amenities) VALUES (:id, :description, :amenities)"),
+                               {'id': room.id, 'description': room.description, 'amenities': room.amenities})
+    elif _settings['backend'] == 'python':
+        session.info['room_text_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _reload_room_text(session):
+    global _index
+    if session.info.pop('room_text_changed', False):
+        with _index_lock:
+            _index = None
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_room_text_changes(session):
+    session.info.pop('room_text_changed', None)
+
+def init_app(app):
+    """Set up the keyword index the database supports.
+
+    SQLite gets an FTS5 table, filled from the rooms table when it is out
+    of step (e.g. on first run). PostgreSQL gets a GIN index on a tsvector
+    expression, which it keeps up to date itself. Other databases, and
+    SQLite builds without FTS5, use the in-memory index.
+    """
+    from app import db
+    from models import Room
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            try:
+                db.session.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS rooms_fts USING fts5(description, amenities, tokenize='porter unicode61')"
+                ))
+                db.session.commit()
+                _settings['backend'] = 'fts5'
+                if db.session.execute(text("SELECT count(*) FROM rooms_fts")).scalar() != Room.query.count():
+                    rebuild_index()
+            except OperationalError as e:
+                db.session.rollback()
+                logger.warning(f"SQLite has no FTS5, using the in-memory room keyword index: {e}")
+                _settings['backend'] = 'python'
+        elif dialect == 'postgresql':
+            db.session.execute(text(f"CREATE INDEX IF NOT EXISTS ix_rooms_fulltext ON rooms USING GIN ({TSVECTOR})"))
+            db.session.commit()
+            _settings['backend'] = 'tsvector'
+        else:
+            _settings['backend'] = 'python'
+    logger.info(f"Room keyword search uses {_settings['backend']}")
@@ -1,10 +1,14 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app import db
-from models import Room, Booking, User
+from models import Room, Booking, User, ArchivedBooking
 from forms import RoomForm
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from datetime import datetime
+from replicas import read_replica
+from room_assignment import optimize_room_assignments
+from room_images import save_upload, queue_variants, InvalidImageError
+from archive import with_history
+from dashboard_stats import dashboard_snapshot
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,44 +32,10 @@ def admin_required(f):
 def dashboard():
     """Admin dashboard showing booking and revenue statistics."""
     try:
-        # Calculate statistics for the past 30 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        today = datetime.utcnow().date()
-        
-        # Total bookings in last 30 days
-        total_bookings = Booking.query.filter(
-            Booking.created_at >= thirty_days_ago
-        ).count()
-        
-        # Total revenue in last 30 days
-        total_revenue = db.session.query(func.sum(Booking.total_price)).filter(
-            Booking.created_at >= thirty_days_ago
-        ).scalar() or 0
-        
-        # Current occupancy rate
-        total_rooms = Room.query.count()
-        occupied_rooms = Booking.query.filter(
-            Booking.check_in_date <= today,
-            Booking.check_out_date > today,
-            Booking.booking_status != 'cancelled'
-        ).count()
-        
-        occupancy_rate = round((occupied_rooms / total_rooms * 100), 2) if total_rooms > 0 else 0
-        
-        # Available rooms
-        available_rooms = total_rooms - occupied_rooms
-        
-        # Recent bookings
-        recent_bookings = Booking.query.order_by(Booking.created_at.desc()).limit(10).all()
-        
-        stats = {
-            'total_bookings': total_bookings,
-            'total_revenue': round(total_revenue, 2),
-            'occupancy_rate': occupancy_rate,
-            'available_rooms': available_rooms
-        }
-        
-        return render_template('admin/dashboard.html', stats=stats, recent_bookings=recent_bookings)
+        # Served from a shared snapshot, refreshed in the background once stale
+        snapshot = dashboard_snapshot()
+        return render_template('admin/dashboard.html', stats=snapshot.stats, recent_bookings=snapshot.recent_bookings,
+                               pace=snapshot.pace, computed_at=datetime.fromtimestamp(snapshot.computed_at))
     except Exception as e:
         logger.error(f"Error in admin dashboard: {e}")
         flash('An error occurred while loading the dashboard.', 'danger')
@@ -73,6 +43,7 @@ def dashboard():
 
 @bp.route('/rooms')
 @admin_required
+@read_replica
 def rooms():
     """Room management page."""
     try:
@@ -83,6 +54,32 @@ def rooms():
         flash('An error occurred while loading the rooms.', 'danger')
         return redirect(url_for('admin.dashboard'))
 
+def apply_room_image(form, room):
+    """Give a room the uploaded image, or the image URL if it changed.
+
+    Returns:
+        str: An error message, or None
+    """
+    if form.image.data:
+        try:
+            key, extension = save_upload(form.image.data)
+        except InvalidImageError as e:
+            return str(e)
+        if key != room.image_key:
+            room.image_key = key
+            room.image_extension = extension
+            room.image_widths = None
+        room.image_url = ''
+    elif form.image_url.data:
+        if form.image_url.data != room.image_url:
+            room.image_url = form.image_url.data
+            room.image_key = None
+            room.image_extension = None
+            room.image_widths = None
+    elif not room.image_key:
+        return 'Give an image URL or upload an image.'
+    return None
+
 @bp.route('/add_room', methods=['POST'])
 @admin_required
 def add_room():
@@ -96,11 +93,16 @@ def add_room():
                 capacity=form.capacity.data,
                 price_per_night=form.price_per_night.data,
                 description=form.description.data,
-                amenities=form.amenities.data,
-                image_url=form.image_url.data
+                amenities=form.amenities.data
             )
+            error = apply_room_image(form, room)
+            if error:
+                flash(f"Image: {error}", 'danger')
+                return redirect(url_for('admin.rooms'))
             db.session.add(room)
             db.session.commit()
+            if room.image_key and not room.image_widths:
+                queue_variants(room)
             logger.info(f"New room added: {room.room_number}")
             flash(f'Room {room.room_number} added successfully.', 'success')
         except Exception as e:
@@ -128,9 +130,15 @@ def edit_room(room_id):
             room.price_per_night = form.price_per_night.data
             room.description = form.description.data
             room.amenities = form.amenities.data
-            room.image_url = form.image_url.data
+            error = apply_room_image(form, room)
+            if error:
+                db.session.rollback()
+                flash(f"Image: {error}", 'danger')
+                return redirect(url_for('admin.rooms'))
             
             db.session.commit()
+            if room.image_key and not room.image_widths:
+                queue_variants(room)
             logger.info(f"Room updated: {room.room_number}")
             flash(f'Room {room.room_number} updated successfully.', 'success')
         except Exception as e:
@@ -150,8 +158,8 @@ def delete_room(room_id):
     """Delete a room."""
     room = Room.query.get_or_404(room_id)
     try:
-        # Check if room has bookings
-        if room.bookings.count() > 0:
+        # Check if room has bookings, past stays included
+        if room.bookings.count() > 0 or ArchivedBooking.query.filter_by(room_id=room.id).first():
             flash('Cannot delete room with existing bookings.', 'danger')
             return redirect(url_for('admin.rooms'))
         
@@ -169,12 +177,34 @@ def delete_room(room_id):
 
 @bp.route('/bookings')
 @admin_required
+@read_replica
 def bookings():
-    """View all bookings."""
+    """View all bookings, with the archived past stays when asked for history."""
     try:
-        bookings = Booking.query.order_by(Booking.created_at.desc()).all()
-        return render_template('admin/bookings.html', bookings=bookings)
+        history = request.args.get('history') == '1'
+        if history:
+            bookings = with_history(Booking.query, ArchivedBooking.query)
+        else:
+            bookings = Booking.query.order_by(Booking.created_at.desc()).all()
+        return render_template('admin/bookings.html', bookings=bookings, history=history)
     except Exception as e:
         logger.error(f"Error loading bookings page: {e}")
         flash('An error occurred while loading the bookings.', 'danger')
         return redirect(url_for('admin.dashboard'))
+
+@bp.route('/room_assignments')
+@admin_required
+@read_replica
+def room_assignments():
+    """Preview what re-packing bookings made by room type would recover.
+
+    Only reads; the moves are applied by `flask optimize-rooms --apply`,
+    which locks each room type while it re-packs it.
+    """
+    try:
+        results = optimize_room_assignments(apply=False)
+        return render_template('admin/room_assignments.html', results=results)
+    except Exception as e:
+        logger.error(f"Error previewing room assignments: {e}")
+        flash('An error occurred while optimizing room assignments.', 'danger')
+        return redirect(url_for('admin.dashboard'))
@@ -0,0 +1,272 @@
+import json
+import logging
+from datetime import datetime, date
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, current_app
+from flask_login import current_user
+from sqlalchemy import select
+from app import db
+from models import Room, Booking
+from async_db import async_session
+from rates import get_rate_engine
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Confirmation emails and SMS are sent here, so API responses never wait on them
+_notifications = None
+
+def _json(payload, status=200):
+    """Return a JSON response without whitespace, whatever the app's debug setting."""
+    return current_app.response_class(json.dumps(payload, separators=(',', ':')), status, mimetype='application/json')
+
+def _error(message, status):
+    return _json({'error': message}, status)
+
+def _room_json(room):
+    return {'id': room.id, 'number': room.room_number, 'type': room.room_type, 'capacity': room.capacity, 'price': room.price_per_night}
+
+def _booking_json(booking):
+    return {
+        'id': booking.id,
+        'room': booking.room_id,
+        'check_in': booking.check_in_date.isoformat(),
+        'check_out': booking.check_out_date.isoformat(),
+        'guests': booking.guests,
+        'total': booking.total_price,
+        'status': booking.booking_status
+    }
+
+def _parse_stay(values):
+    """Read and validate check_in/check_out (YYYY-MM-DD) from query args or a JSON body.
+
+    Returns:
+        tuple: (check_in, check_out, error message or None)
+    """
+    try:
+        check_in = datetime.strptime(str(values.get('check_in')), '%Y-%m-%d').date()
+        check_out = datetime.strptime(str(values.get('check_out')), '%Y-%m-%d').date()
+    except ValueError:
+        return None, None, 'check_in and check_out must be dates in YYYY-MM-DD format.'
+    if check_in < date.today():
+        return None, None, 'Check-in date cannot be in the past.'
+    if check_out <= check_in:
+        return None, None, 'Check-out date must be after check-in date.'
+    return check_in, check_out, None
+
+def _overlapping(room_ids, check_in, check_out):
+    return select(Booking.room_id).where(
+        Booking.room_id.in_(room_ids),
+        Booking.booking_status != 'canceled',
+        Booking.check_in_date < check_out,
+        Booking.check_out_date > check_in
+    )
+
+def _notify(kind, booking_id):
+    """Send booking notifications from the background pool."""
+    global _notifications
+    if _notifications is None:
+        _notifications = ThreadPoolExecutor(max_workers=current_app.config.get('API_NOTIFICATION_WORKERS', 2), thread_name_prefix='api-notify')
+    _notifications.submit(_send_notifications, current_app._get_current_object(), kind, booking_id)
+
+def _send_notifications(app, kind, booking_id):
+    from routes.booking import send_booking_confirmation, send_booking_cancellation
+    from sms import send_booking_confirmation_sms, send_booking_cancellation_sms
+
+    senders = {
+        'confirmation': (send_booking_confirmation, send_booking_confirmation_sms),
+        'cancellation': (send_booking_cancellation, send_booking_cancellation_sms)
+    }
+    send_email, send_sms = senders[kind]
+    with app.app_context():
+        try:
+            booking = db.session.get(Booking, booking_id)
+            send_email(booking)
+            if booking.user.sms_notifications and booking.user.phone_number:
+                send_sms(booking)
+        except Exception as e:
+            logger.error(f"Failed to send booking {kind} notifications for booking {booking_id}: {e}")
+
+def api_login_required(f):
+    """Answer 401 instead of redirecting to the login page."""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return _error('Login required.', 401)
+        return await f(*args, **kwargs)
+    return decorated_function
+
+@bp.before_request
+def require_json_body():
+    # Browsers can't send a cross-site JSON POST without a CORS preflight, which stands in for the CSRF token
+    if request.method == 'POST' and not request.is_json:
+        return _error('Send a JSON body with Content-Type: application/json.', 415)
+
+@bp.errorhandler(404)
+def not_found(e):
+    return _error('Not found.', 404)
+
+@bp.route('/rooms')
+async def rooms():
+    """List rooms, optionally by type and minimum capacity."""
+    try:
+        query = select(Room).order_by(Room.room_number)
+        if request.args.get('type'):
+            query = query.where(Room.room_type == request.args['type'])
+        if request.args.get('guests', type=int):
+            query = query.where(Room.capacity >= request.args.get('guests', type=int))
+        async with async_session() as session:
+            result = (await session.scalars(query)).all()
+        return _json({'rooms': [_room_json(room) for room in result]})
+    except Exception as e:
+        logger.error(f"API error listing rooms: {e}")
+        return _error('An error occurred while listing rooms.', 500)
+
+@bp.route('/rooms/<int:room_id>')
+async def room(room_id):
+    async with async_session() as session:
+        result = await session.get(Room, room_id)
+    if not result:
+        return _error('Room not found.', 404)
+    return _json(_room_json(result))
+
+@bp.route('/availability')
+async def availability():
+    """List the rooms free for a stay, each with its price.
+
+    Query args: check_in, check_out, and optionally type and guests.
+    """
+    check_in, check_out, message = _parse_stay(request.args)
+    if message:
+        return _error(message, 400)
+    try:
+        query = select(Room).where(Room.capacity >= request.args.get('guests', 1, type=int)).order_by(Room.room_number)
+        if request.args.get('type'):
+            query = query.where(Room.room_type == request.args['type'])
+        async with async_session() as session:
+            candidates = (await session.scalars(query)).all()
+            booked = set((await session.scalars(_overlapping([r.id for r in candidates], check_in, check_out))).all()) if candidates else set()
+        free = [r for r in candidates if r.id not in booked]
+        quotes = get_rate_engine(check_in, check_out).quote_rooms(free, check_in, check_out)
+        return _json({
+            'check_in': check_in.isoformat(),
+            'check_out': check_out.isoformat(),
+            'rooms': [dict(_room_json(r), total=quotes[r.id]) for r in free]
+        })
+    except Exception as e:
+        logger.error(f"API error checking availability: {e}")
+        return _error('An error occurred while checking availability.', 500)
+
+@bp.route('/rooms/<int:room_id>/quote')
+async def quote(room_id):
+    """Price a stay in one room and say whether it is free."""
+    check_in, check_out, message = _parse_stay(request.args)
+    if message:
+        return _error(message, 400)
+    try:
+        async with async_session() as session:
+            result = await session.get(Room, room_id)
+            if not result:
+                return _error('Room not found.', 404)
+            booked = (await session.scalars(_overlapping([room_id], check_in, check_out).limit(1))).first()
+        total = get_rate_engine(check_in, check_out).quote(result.room_type, result.price_per_night, check_in, check_out)
+        return _json({
+            'room': room_id,
+            'check_in': check_in.isoformat(),
+            'check_out': check_out.isoformat(),
+            'nights': (check_out - check_in).days,
+            'total': total,
+            'available': booked is None
+        })
+    except Exception as e:
+        logger.error(f"API error quoting room {room_id}: {e}")
+        return _error('An error occurred while pricing the stay.', 500)
+
+@bp.route('/bookings')
+@api_login_required
+async def bookings():
+    """List the current user's bookings, newest first."""
+    async with async_session() as session:
+        result = (await session.scalars(
+            select(Booking).where(Booking.user_id == current_user.id).order_by(Booking.created_at.desc())
+        )).all()
+    return _json({'bookings': [_booking_json(b) for b in result]})
+
+@bp.route('/bookings', methods=['POST'])
+@api_login_required
+async def create_booking():
+    """Book a room. JSON body: room, check_in, check_out, guests."""
+    payload = request.get_json(silent=True) or {}
+    check_in, check_out, message = _parse_stay(payload)
+    if message:
+        return _error(message, 400)
+    try:
+        room_id = int(payload.get('room'))
+        guests = int(payload.get('guests', 1))
+    except (TypeError, ValueError):
+        return _error('room and guests must be integers.', 400)
+
+    try:
+        async with async_session(write=True) as session:
+            async with session.begin():
+                # Lock the room (SELECT ... FOR UPDATE where supported) so two requests can't both book it
+                result = (await session.scalars(select(Room).where(Room.id == room_id).with_for_update())).first()
+                if not result:
+                    return _error('Room not found.', 404)
+                if not 1 <= guests <= result.capacity:
+                    return _error(f'This room takes 1 to {result.capacity} guests.', 400)
+                if (await session.scalars(_overlapping([room_id], check_in, check_out).limit(1))).first() is not None:
+                    return _error('Room is not available for the selected dates.', 409)
+
+                booking = Booking(
+                    user_id=current_user.id,
+                    room_id=room_id,
+                    check_in_date=check_in,
+                    check_out_date=check_out,
+                    guests=guests,
+                    total_price=get_rate_engine(check_in, check_out).quote(result.room_type, result.price_per_night, check_in, check_out),
+                    booking_status='confirmed',
+                    payment_status='paid'
+                )
+                session.add(booking)
+
+        _notify('confirmation', booking.id)
+        logger.info(f"New booking created through the API: ID {booking.id} by user {current_user.username}")
+        return _json(_booking_json(booking), 201)
+    except Exception as e:
+        logger.error(f"API error during booking creation: {e}")
+        return _error('An error occurred during the booking process.', 500)
+
+@bp.route('/bookings/<int:booking_id>')
+@api_login_required
+async def booking(booking_id):
+    async with async_session() as session:
+        result = await session.get(Booking, booking_id)
+    if not result or (result.user_id != current_user.id and not current_user.is_admin):
+        return _error('Booking not found.', 404)
+    return _json(_booking_json(result))
+
+@bp.route('/bookings/<int:booking_id>/cancel', methods=['POST'])
+@api_login_required
+async def cancel_booking(booking_id):
+    """Cancel a booking that hasn't started yet."""
+    try:
+        async with async_session(write=True) as session:
+            async with session.begin():
+                result = (await session.scalars(select(Booking).where(Booking.id == booking_id).with_for_update())).first()
+                if not result or (result.user_id != current_user.id and not current_user.is_admin):
+                    return _error('Booking not found.', 404)
+                if result.check_in_date <= date.today():
+                    return _error('You cannot cancel a booking that has already started or is in the past.', 409)
+                if result.booking_status == 'canceled':
+                    return _error('This booking is already canceled.', 409)
+                result.booking_status = 'canceled'
+
+        _notify('cancellation', booking_id)
+        logger.info(f"Booking {booking_id} canceled through the API by user {current_user.username}")
+        return _json(_booking_json(result))
+    except Exception as e:
+        logger.error(f"API error canceling booking {booking_id}: {e}")
+        return _error('An error occurred while canceling the booking.', 500)
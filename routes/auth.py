@@ -1,9 +1,15 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, request
+from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash
+from sqlalchemy.exc import IntegrityError
 from app import db
 from forms import LoginForm, RegisterForm
-from models import User
+from models import User, WaitlistEntry
+from replicas import read_replica
+from passwords import needs_rehash, HashingBusy
+from identity_filter import is_taken
+from archive import with_history
+from datetime import date
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,14 +25,23 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
-            login_user(user)
-            logger.info(f"User {user.username} logged in successfully")
-            flash('Logged in successfully.', 'success')
-            next_page = request.args.get('next')
-            return redirect(next_page or url_for('main.home'))
-        flash('Invalid email or password.', 'danger')
-        logger.warning(f"Failed login attempt for email: {form.email.data}")
+        try:
+            if user and user.check_password(form.password.data):
+                # Upgrade hashes made with older parameters while the password is at hand
+                if needs_rehash(user.password_hash):
+                    user.set_password(form.password.data)
+                    db.session.commit()
+                    logger.info(f"Password hash of user {user.username} upgraded")
+                
+                login_user(user)
+                logger.info(f"User {user.username} logged in successfully")
+                flash('Logged in successfully.', 'success')
+                next_page = request.args.get('next')
+                return redirect(next_page or url_for('main.home'))
+            flash('Invalid email or password.', 'danger')
+            logger.warning(f"Failed login attempt for email: {form.email.data}")
+        except HashingBusy:
+            flash('We are handling a lot of logins right now. Please try again in a moment.', 'warning')
     
     return render_template('auth/login.html', form=form)
 
@@ -44,14 +59,21 @@ def register():
             phone_number=form.phone_number.data if form.phone_number.data else None,
             sms_notifications=form.sms_notifications.data
         )
-        user.set_password(form.password.data)
         
         try:
+            user.set_password(form.password.data)
             db.session.add(user)
             db.session.commit()
             logger.info(f"New user registered: {user.username} (Phone: {user.phone_number}, SMS: {user.sms_notifications})")
             flash('Registration successful. Please login.', 'success')
             return redirect(url_for('auth.login'))
+        except HashingBusy:
+            flash('We are handling a lot of registrations right now. Please try again in a moment.', 'warning')
+        except IntegrityError:
+            # Someone registered the same username, email or phone number since the form was checked
+            db.session.rollback()
+            if form.check_unique():
+                flash('An error occurred during registration. Please try again.', 'danger')
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error during user registration: {e}")
@@ -59,6 +81,19 @@ def register():
     
     return render_template('auth/register.html', form=form)
 
+@bp.route('/available')
+def available():
+    """Tell the registration form whether a username or email is still free."""
+    for field in ('username', 'email'):
+        value = request.args.get(field, '').strip()
+        if value:
+            try:
+                return jsonify({'field': field, 'available': not is_taken(field, value)})
+            except Exception as e:
+                logger.error(f"Error checking {field} availability: {e}")
+                return jsonify({'field': field, 'available': None}), 500
+    return jsonify({'error': 'Pass a username or email to check.'}), 400
+
 @bp.route('/logout')
 @login_required
 def logout():
@@ -71,12 +106,21 @@ def logout():
 
 @bp.route('/profile')
 @login_required
+@read_replica
 def profile():
     """Display user profile."""
     try:
-        # Get user's bookings
-        bookings = current_user.bookings.order_by(db.desc('created_at')).all()
-        return render_template('auth/profile.html', bookings=bookings)
+        # Get user's bookings, with the archived past stays when asked for history
+        history = request.args.get('history') == '1'
+        if history:
+            bookings = with_history(current_user.bookings, current_user.archived_bookings)
+        else:
+            bookings = current_user.bookings.order_by(db.desc('created_at')).all()
+        waitlist_entries = current_user.waitlist_entries.filter(
+            WaitlistEntry.status.in_(['waiting', 'offered']),
+            WaitlistEntry.check_in_date >= date.today()
+        ).order_by(WaitlistEntry.check_in_date).all()
+        return render_template('auth/profile.html', bookings=bookings, waitlist_entries=waitlist_entries, history=history)
     except Exception as e:
         logger.error(f"Error displaying user profile: {e}")
         flash('An error occurred while loading your profile.', 'danger')
@@ -1,11 +1,23 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from app import db, mail
-from models import Room, Booking
-from forms import SearchForm, BookingForm, ModifyBookingForm
+from models import Room, Booking, WaitlistEntry
+from forms import SearchForm, BookingForm, ModifyBookingForm, GroupBookingForm
 from datetime import datetime, date
 from flask_mail import Message
-from sms import send_booking_confirmation_sms, send_booking_modification_sms, send_booking_cancellation_sms
+from sms import send_booking_confirmation_sms, send_booking_modification_sms, send_booking_cancellation_sms, send_group_booking_confirmation_sms
+from idempotency import idempotent
+from replicas import read_replica
+from http_cache import page_etag, conditional_render
+from availability_cache import cached_availability
+from rates import quote_rooms
+from occupancy import available_rooms, find_flexible_stays
+from group_booking import find_group_allocation, split_guests, reserve_group, GroupBookingError
+from room_assignment import room_type_offers, book_room_type
+from waitlist import join_waitlist
+from amenities import get_amenity_index
+from archive import find_booking
+from room_search import search_rooms
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,10 +25,17 @@ logger = logging.getLogger(__name__)
 bp = Blueprint('booking', __name__, url_prefix='/booking')
 
 @bp.route('/search', methods=['GET', 'POST'])
+@read_replica
 def search():
     """Search for available rooms."""
     form = SearchForm()
+    amenity_index = get_amenity_index()
+    form.amenities.choices = amenity_index.choices()
     rooms = []
+    quotes = {}
+    flexible_stays = []
+    type_offers = {}
+    waitlist_offered = False
     
     if form.validate_on_submit():
         try:
@@ -36,34 +55,68 @@ def search():
             # Filter by capacity
             query = query.filter(Room.capacity >= guests)
             
-            # Get all rooms that match the criteria
-            potential_rooms = query.all()
+            # Keep only rooms with every must-have amenity, found by intersecting the amenity bitsets
+            if form.amenities.data:
+                query = query.filter(Room.id.in_(amenity_index.rooms_with_all(form.amenities.data)))
             
-            # Filter out rooms that are already booked for the given dates
-            rooms = [room for room in potential_rooms if 
-                     Booking.check_availability(room.id, check_in, check_out)]
+            # Keep only rooms whose description or amenities match the keywords, best match first
+            if form.keywords.data:
+                ranking = search_rooms(form.keywords.data)
+                query = query.filter(Room.id.in_(ranking))
             
-            if not rooms:
-                flash('No rooms available for the selected dates and criteria.', 'info')
+            # Get all rooms that match the criteria
+            potential_rooms = query.all()
+            if form.keywords.data:
+                rank = {room_id: position for position, room_id in enumerate(ranking)}
+                potential_rooms.sort(key=lambda room: rank[room.id])
             
-            logger.info(f"Room search: {len(rooms)} rooms found for {check_in} to {check_out}")
+            if form.flexible.data:
+                # Every feasible stay of the requested length inside the window, cheapest first
+                flexible_stays = find_flexible_stays(potential_rooms, check_in, check_out, form.nights.data)
+                
+                if not flexible_stays:
+                    flash('No rooms available for the selected dates and criteria.', 'info')
+                
+                logger.info(f"Flexible room search: {len(flexible_stays)} stays found for {form.nights.data} nights between {check_in} and {check_out}")
+            else:
+                # Filter out rooms that are already booked for the given dates
+                rooms = available_rooms(potential_rooms, check_in, check_out)
+                
+                # No single room is free for the whole stay, but a room type may be
+                # once bookings made by type are moved between its rooms
+                if not rooms:
+                    type_offers = room_type_offers(potential_rooms, check_in, check_out)
+                
+                if not rooms and not type_offers:
+                    flash('No rooms available for the selected dates and criteria.', 'info')
+                    waitlist_offered = True
+                
+                # Price the stay for every result in one pass over the rate grid
+                quotes = quote_rooms(rooms, check_in, check_out)
+                
+                logger.info(f"Room search: {len(rooms)} rooms found for {check_in} to {check_out}")
         except Exception as e:
             logger.error(f"Error during room search: {e}")
             flash('An error occurred during the search. Please try again.', 'danger')
     
-    return render_template('booking/search.html', form=form, rooms=rooms)
+    return render_template('booking/search.html', form=form, rooms=rooms, quotes=quotes, flexible_stays=flexible_stays, type_offers=type_offers, waitlist_offered=waitlist_offered)
 
 @bp.route('/room/<int:room_id>')
+@read_replica
 def room_detail(room_id):
     """Display room details."""
     try:
         room = Room.query.get_or_404(room_id)
         
-        # Create a booking form with the capacity constraint
-        form = BookingForm()
-        form.guests.choices = [(i, f"{i} Guest{'s' if i > 1 else ''}") for i in range(1, room.capacity + 1)]
+        def render():
+            # Create a booking form with the capacity constraint
+            form = BookingForm()
+            form.guests.choices = [(i, f"{i} Guest{'s' if i > 1 else ''}") for i in range(1, room.capacity + 1)]
+            
+            return render_template('booking/room_detail.html', room=room, form=form)
         
-        return render_template('booking/room_detail.html', room=room, form=form)
+        # Repeat visitors get a 304 without the page being rendered again
+        return conditional_render(page_etag('room', room.id, room.updated_at, request.query_string), room.updated_at, render)
     except Exception as e:
         logger.error(f"Error displaying room details: {e}")
         flash('An error occurred while loading the room details.', 'danger')
@@ -102,9 +155,11 @@ def check_availability(room_id):
                 'total_price': 0
             })
         
-        # Check availability
-        is_available = Booking.check_availability(room_id, check_in, check_out)
-        total_price = Booking.calculate_total_price(room_id, check_in, check_out)
+        # Check availability, reusing recent answers until a booking changes the room
+        is_available, total_price = cached_availability(room_id, check_in, check_out, lambda: (
+            Booking.check_availability(room_id, check_in, check_out),
+            Booking.calculate_total_price(room_id, check_in, check_out)
+        ))
         
         return jsonify({
             'available': is_available,
@@ -121,10 +176,12 @@ def check_availability(room_id):
 
 @bp.route('/book/<int:room_id>', methods=['POST'])
 @login_required
+@idempotent
 def book(room_id):
     """Book a room."""
     try:
-        room = Room.query.get_or_404(room_id)
+        # Lock the room until commit, so the room optimizer can't move a booking into it after the check below
+        room = Room.query.filter_by(id=room_id).with_for_update().first_or_404()
         
         # Parse form data
         check_in_str = request.form.get('check_in')
@@ -150,7 +207,7 @@ def book(room_id):
             return redirect(url_for('booking.room_detail', room_id=room_id))
         
         # Calculate total price
-        total_price = Booking.calculate_total_price(room_id, check_in, check_out)
+        total_price = Booking.calculate_total_price(room_id, check_in, check_out, room=room)
         
         # Create booking
         booking = Booking(
@@ -185,12 +242,173 @@ def book(room_id):
         flash('An error occurred during the booking process. Please try again.', 'danger')
         return redirect(url_for('booking.room_detail', room_id=room_id))
 
+@bp.route('/book_type/<room_type>', methods=['POST'])
+@login_required
+@idempotent
+def book_type(room_type):
+    """Book a room type; the room is assigned by the hotel."""
+    try:
+        guests = int(request.form.get('guests', 1))
+        check_in = datetime.strptime(request.form.get('check_in'), '%Y-%m-%d').date()
+        check_out = datetime.strptime(request.form.get('check_out'), '%Y-%m-%d').date()
+        
+        if check_in < date.today() or check_out <= check_in:
+            flash('Invalid booking dates.', 'danger')
+            return redirect(url_for('booking.search'))
+        
+        # Carry the search's must-have amenities and keywords over to the rooms the stay may go in
+        room_ids = None
+        amenity_ids = request.form.getlist('amenities', type=int)
+        keywords = request.form.get('keywords', '').strip()
+        if amenity_ids or keywords:
+            room_ids = set(get_amenity_index().rooms_with_all(amenity_ids)) if amenity_ids else None
+            if keywords:
+                matches = set(search_rooms(keywords))
+                room_ids = matches if room_ids is None else room_ids & matches
+        
+        booking = book_room_type(current_user, room_type, check_in, check_out, guests, room_ids)
+        if booking is None:
+            flash(f'No {room_type} room is available for the selected dates.', 'danger')
+            return redirect(url_for('booking.search'))
+        
+        # Send confirmation email and SMS
+        try:
+            send_booking_confirmation(booking)
+            if booking.user.sms_notifications and booking.user.phone_number:
+                send_booking_confirmation_sms(booking)
+        except Exception as e:
+            logger.error(f"Failed to send booking confirmation notifications: {e}")
+        
+        logger.info(f"New room type booking created: ID {booking.id} by user {current_user.username}")
+        flash('Your booking has been confirmed!', 'success')
+        return redirect(url_for('booking.confirmation', booking_id=booking.id))
+    except Exception as e:
+        logger.error(f"Error during room type booking: {e}")
+        flash('An error occurred during the booking process. Please try again.', 'danger')
+        return redirect(url_for('booking.search'))
+
+@bp.route('/waitlist', methods=['POST'])
+@login_required
+def waitlist_join():
+    """Join the waitlist for a stay that is fully booked."""
+    try:
+        room_type = request.form.get('room_type', '')
+        guests = request.form.get('guests', type=int)
+        check_in = datetime.strptime(request.form.get('check_in'), '%Y-%m-%d').date()
+        check_out = datetime.strptime(request.form.get('check_out'), '%Y-%m-%d').date()
+        
+        rooms = Room.query.filter(Room.room_type == room_type) if room_type else Room.query
+        largest = rooms.with_entities(db.func.max(Room.capacity)).scalar()
+        if largest is None:
+            flash('Please choose a valid room type.', 'danger')
+            return redirect(url_for('booking.search'))
+        if not guests or guests < 1 or guests > largest:
+            flash(f'Our {room_type + " rooms" if room_type else "rooms"} take up to {largest} guests.', 'danger')
+            return redirect(url_for('booking.search'))
+        
+        max_nights = current_app.config.get('WAITLIST_MAX_NIGHTS', 30)
+        if check_in < date.today() or check_out <= check_in or (check_out - check_in).days > max_nights:
+            flash(f'You can join the waitlist for stays of up to {max_nights} nights.', 'danger')
+            return redirect(url_for('booking.search'))
+        
+        entry, created = join_waitlist(current_user, room_type, check_in, check_out, guests)
+        if created:
+            flash('You are on the waitlist. We will let you know as soon as a room frees up.', 'success')
+        else:
+            flash('You are already on the waitlist for these dates.', 'info')
+        return redirect(url_for('auth.profile'))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error joining the waitlist: {e}")
+        flash('An error occurred while joining the waitlist. Please try again.', 'danger')
+        return redirect(url_for('booking.search'))
+
+@bp.route('/waitlist/<int:entry_id>/leave', methods=['POST'])
+@login_required
+def waitlist_leave(entry_id):
+    """Leave the waitlist."""
+    try:
+        entry = WaitlistEntry.query.get_or_404(entry_id)
+        if entry.user_id != current_user.id:
+            flash('You do not have permission to change this waitlist entry.', 'danger')
+            return redirect(url_for('auth.profile'))
+        
+        entry.status = 'canceled'
+        db.session.commit()
+        flash('You have left the waitlist.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error leaving the waitlist: {e}")
+        flash('An error occurred while processing your request.', 'danger')
+    return redirect(url_for('auth.profile'))
+
+@bp.route('/group', methods=['GET', 'POST'])
+@read_replica
+def group():
+    """Find the cheapest set of available rooms for a group."""
+    form = GroupBookingForm()
+    allocation = []
+    quotes = {}
+    guests = []
+    
+    if form.validate_on_submit():
+        try:
+            allocation, quotes = find_group_allocation(
+                form.room_type.data, form.party_size.data, form.check_in.data, form.check_out.data
+            )
+            guests = split_guests(allocation, form.party_size.data)
+            
+            if not allocation:
+                flash('Not enough rooms are available for your group on the selected dates.', 'info')
+        except Exception as e:
+            logger.error(f"Error during group room search: {e}")
+            flash('An error occurred during the search. Please try again.', 'danger')
+    
+    total_price = sum(quotes[room.id] for room in allocation)
+    return render_template('booking/group.html', form=form, allocation=allocation, quotes=quotes, guests=guests, total_price=total_price)
+
+@bp.route('/group/book', methods=['POST'])
+@login_required
+@idempotent
+def group_book():
+    """Book all rooms of a group allocation in one transaction."""
+    try:
+        room_ids = [int(room_id) for room_id in request.form.getlist('room_ids')]
+        party_size = int(request.form.get('party_size', 0))
+        check_in = datetime.strptime(request.form.get('check_in'), '%Y-%m-%d').date()
+        check_out = datetime.strptime(request.form.get('check_out'), '%Y-%m-%d').date()
+        
+        if not room_ids or party_size < 1 or check_in < date.today() or check_out <= check_in:
+            flash('Invalid group booking request.', 'danger')
+            return redirect(url_for('booking.group'))
+        
+        bookings = reserve_group(current_user, room_ids, check_in, check_out, party_size)
+        
+        # Send one confirmation email and SMS for the whole group
+        try:
+            send_group_booking_confirmation(bookings)
+            if current_user.sms_notifications and current_user.phone_number:
+                send_group_booking_confirmation_sms(bookings)
+        except Exception as e:
+            logger.error(f"Failed to send group booking confirmation notifications: {e}")
+        
+        flash(f'Your group booking of {len(bookings)} rooms has been confirmed!', 'success')
+        return redirect(url_for('auth.profile'))
+    except GroupBookingError as e:
+        flash(f'{e} Please search again.', 'danger')
+        return redirect(url_for('booking.group'))
+    except Exception as e:
+        logger.error(f"Error during group booking: {e}")
+        flash('An error occurred during the booking process. Please try again.', 'danger')
+        return redirect(url_for('booking.group'))
+
 @bp.route('/confirmation/<int:booking_id>')
 @login_required
 def confirmation(booking_id):
     """Display booking confirmation."""
     try:
-        booking = Booking.query.get_or_404(booking_id)
+        # Past stays may have been moved to the archive
+        booking = find_booking(booking_id) or abort(404)
         
         # Ensure user can only see their own bookings (unless admin)
         if booking.user_id != current_user.id and not current_user.is_admin:
@@ -208,7 +426,8 @@ def confirmation(booking_id):
 def view(booking_id):
     """View booking details with options to modify or cancel."""
     try:
-        booking = Booking.query.get_or_404(booking_id)
+        # Past stays may have been moved to the archive
+        booking = find_booking(booking_id) or abort(404)
         
         # Ensure user can only see their own bookings (unless admin)
         if booking.user_id != current_user.id and not current_user.is_admin:
@@ -225,6 +444,7 @@ def view(booking_id):
 
 @bp.route('/modify/<int:booking_id>', methods=['GET', 'POST'])
 @login_required
+@idempotent
 def modify(booking_id):
     """Modify an existing booking."""
     try:
@@ -258,6 +478,15 @@ def modify(booking_id):
             form.guests.data = booking.guests
         
         if form.validate_on_submit():
+            # Lock the room as book() does, then make sure the optimizer hasn't just moved the booking out of it
+            Room.query.filter_by(id=booking.room_id).with_for_update().one()
+            locked_room_id = booking.room_id
+            db.session.refresh(booking, with_for_update=True)
+            if booking.room_id != locked_room_id:
+                db.session.rollback()
+                flash('Your booking was just moved to another room. Please try again.', 'warning')
+                return redirect(url_for('booking.modify', booking_id=booking_id))
+            
             # Check if the room is available for the new dates
             if form.check_in.data != booking.check_in_date or form.check_out.data != booking.check_out_date:
                 # We need to exclude current booking when checking availability
@@ -268,7 +497,7 @@ def modify(booking_id):
                     return redirect(url_for('booking.modify', booking_id=booking_id))
             
             # Calculate new total price
-            new_total_price = Booking.calculate_total_price(booking.room_id, form.check_in.data, form.check_out.data)
+            new_total_price = Booking.calculate_total_price(booking.room_id, form.check_in.data, form.check_out.data, room=booking.room)
             
             # Store old values for notification
             old_check_in = booking.check_in_date
@@ -308,12 +537,14 @@ def modify(booking_id):
         
         return render_template('booking/modify_booking.html', booking=booking, form=form, today=today)
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error modifying booking: {e}")
         flash('An error occurred while processing your request.', 'danger')
         return redirect(url_for('booking.view', booking_id=booking_id))
 
 @bp.route('/cancel/<int:booking_id>', methods=['POST'])
 @login_required
+@idempotent
 def cancel(booking_id):
     """Cancel a booking."""
     try:
@@ -412,6 +643,74 @@ def send_booking_confirmation(booking):
     except Exception as e:
         logger.error(f"Failed to send confirmation email: {e}")
 
+def send_group_booking_confirmation(bookings):
+    """Send one confirmation email for all bookings of a group reservation."""
+    first = bookings[0]
+    msg = Message(
+        'Group Booking Confirmation - Luxury Hotel',
+        recipients=[first.user.email]
+    )
+    
+    room_lines = "\n".join(
+        f"    - Booking #{b.id}: {b.room.room_type.title()} Room {b.room.room_number}, {b.guests} guest(s), ${b.total_price}"
+        for b in bookings
+    )
+    room_items = "".join(
+        f"<li><strong>Booking #{b.id}:</strong> {b.room.room_type.title()} Room {b.room.room_number}, {b.guests} guest(s), ${b.total_price}</li>"
+        for b in bookings
+    )
+    total_price = round(sum(b.total_price for b in bookings), 2)
+    
+    msg.body = f"""
+    Dear {first.user.username},
+    
+    Thank you for choosing Luxury Hotel. Your group booking has been confirmed!
+    
+    Booking Details:
+    - Check-in Date: {first.check_in_date.strftime('%B %d, %Y')}
+    - Check-out Date: {first.check_out_date.strftime('%B %d, %Y')}
+    - Number of Guests: {sum(b.guests for b in bookings)}
+    - Total Price: ${total_price}
+    
+    Rooms:
+{room_lines}
+    
+    We look forward to welcoming your group to our hotel!
+    
+    Best regards,
+    Luxury Hotel Team
+    """
+    
+    msg.html = f"""
+    <h2>Group Booking Confirmation</h2>
+    <p>Dear {first.user.username},</p>
+    <p>Thank you for choosing Luxury Hotel. Your group booking has been confirmed!</p>
+    
+    <h3>Booking Details:</h3>
+    <ul>
+        <li><strong>Check-in Date:</strong> {first.check_in_date.strftime('%B %d, %Y')}</li>
+        <li><strong>Check-out Date:</strong> {first.check_out_date.strftime('%B %d, %Y')}</li>
+        <li><strong>Number of Guests:</strong> {sum(b.guests for b in bookings)}</li>
+        <li><strong>Total Price:</strong> ${total_price}</li>
+    </ul>
+    
+    <h3>Rooms:</h3>
+    <ul>
+        {room_items}
+    </ul>
+    
+    <p>We look forward to welcoming your group to our hotel!</p>
+    
+    <p>Best regards,<br>
+    Luxury Hotel Team</p>
+    """
+    
+    try:
+        mail.send(msg)
+        logger.info(f"Group booking confirmation email sent to {first.user.email}")
+    except Exception as e:
+        logger.error(f"Failed to send group confirmation email: {e}")
+
 def send_booking_modification(booking, old_data):
     """Send booking modification email."""
     msg = Message(
@@ -556,3 +855,55 @@ def send_booking_cancellation(booking):
         logger.info(f"EMAIL CONTENT: Subject: {msg.subject}, Recipient: {msg.recipients}, Body: {msg.body[:100]}...")
     except Exception as e:
         logger.error(f"Failed to send cancellation email: {e}")
+
+def send_waitlist_offer(entry):
+    """Send an email telling a waitlisted guest that a matching room is free again."""
+    room = entry.offered_room
+    msg = Message(
+        'A Room Is Available - Luxury Hotel',
+        recipients=[entry.user.email]
+    )
+    
+    msg.body = f"""
+    Dear {entry.user.username},
+    
+    Good news! A room matching your waitlist request is available again.
+    
+    Room Details:
+    - Room Type: {room.room_type.title()}
+    - Room Number: {room.room_number}
+    - Check-in Date: {entry.check_in_date.strftime('%B %d, %Y')}
+    - Check-out Date: {entry.check_out_date.strftime('%B %d, %Y')}
+    - Number of Guests: {entry.guests}
+    
+    The room is not held for you, so please book soon: it goes to the first guest to book.
+    
+    Best regards,
+    Luxury Hotel Team
+    """
+    
+    msg.html = f"""
+    <h2>A Room Is Available</h2>
+    <p>Dear {entry.user.username},</p>
+    <p>Good news! A room matching your waitlist request is available again.</p>
+    
+    <h3>Room Details:</h3>
+    <ul>
+        <li><strong>Room Type:</strong> {room.room_type.title()}</li>
+        <li><strong>Room Number:</strong> {room.room_number}</li>
+        <li><strong>Check-in Date:</strong> {entry.check_in_date.strftime('%B %d, %Y')}</li>
+        <li><strong>Check-out Date:</strong> {entry.check_out_date.strftime('%B %d, %Y')}</li>
+        <li><strong>Number of Guests:</strong> {entry.guests}</li>
+    </ul>
+    
+    <p>The room is not held for you, so please book soon: it goes to the first guest to book.</p>
+    
+    <p>Best regards,<br>
+    Luxury Hotel Team</p>
+    """
+    
+    try:
+        mail.send(msg)
+        logger.info(f"Waitlist offer email sent to {entry.user.email}")
+    except Exception as e:
+        logger.error(f"Failed to send waitlist offer email: {e}")
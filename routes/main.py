@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for
 from models import Room
+from replicas import read_replica
+from http_cache import page_etag, conditional_render
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,12 +9,17 @@ logger = logging.getLogger(__name__)
 bp = Blueprint('main', __name__)
 
 @bp.route('/')
+@read_replica
 def home():
     """Render the home page."""
     try:
         # Get a sample of rooms to display on the home page
         rooms = Room.query.limit(3).all()
-        return render_template('home.html', rooms=rooms)
+        
+        # Repeat visitors get a 304 without the page being rendered again
+        etag = page_etag('home', [(room.id, room.updated_at) for room in rooms])
+        last_modified = max((room.updated_at for room in rooms if room.updated_at), default=None)
+        return conditional_render(etag, last_modified, lambda: render_template('home.html', rooms=rooms))
     except Exception as e:
         logger.error(f"Error rendering home page: {e}")
         return render_template('errors/500.html'), 500
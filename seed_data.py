@@ -1,7 +1,7 @@
 import os
-from datetime import datetime
+from datetime import datetime, date
 from app import app, db
-from models import User, Room, Booking
+from models import User, Room, Booking, RatePlan, Season, room_amenities
 from werkzeug.security import generate_password_hash
 
 def seed_rooms():
@@ -9,6 +9,7 @@ def seed_rooms():
     # Check if rooms already exist and delete them
     if Room.query.count() > 0:
         print("Deleting existing rooms...")
+        db.session.execute(room_amenities.delete())
         Room.query.delete()
         db.session.commit()
         print("All existing rooms deleted.")
@@ -116,8 +117,40 @@ def seed_users():
         db.session.rollback()
         print(f"Error creating users: {str(e)}")
 
+def seed_rate_plans():
+    """Add sample rate plans and seasons."""
+    if RatePlan.query.count() > 0 or Season.query.count() > 0:
+        print("Deleting existing rate plans and seasons...")
+        RatePlan.query.delete()
+        Season.query.delete()
+        db.session.commit()
+        print("All existing rate plans and seasons deleted.")
+    
+    year = date.today().year
+    plans = [
+        RatePlan(room_type="standard", weekend_uplift=0.10, los_discounts={"7": 0.05}),
+        RatePlan(room_type="deluxe", weekend_uplift=0.15, los_discounts={"5": 0.05, "10": 0.10}),
+        RatePlan(room_type="suite", weekend_uplift=0.20, los_discounts={"7": 0.10, "14": 0.15}),
+    ]
+    seasons = []
+    for y in (year, year + 1):
+        seasons.extend([
+            Season(name=f"Summer {y}", start_date=date(y, 6, 15), end_date=date(y, 9, 1), rate_multiplier=1.25),
+            Season(name=f"Holidays {y}", start_date=date(y, 12, 20), end_date=date(y + 1, 1, 3), rate_multiplier=1.4),
+            Season(name=f"Low season {y}", room_type="suite", start_date=date(y, 1, 10), end_date=date(y, 3, 1), rate_multiplier=0.85),
+        ])
+    
+    try:
+        db.session.add_all(plans + seasons)
+        db.session.commit()
+        print(f"Successfully added {len(plans)} rate plans and {len(seasons)} seasons.")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error adding rate plans: {str(e)}")
+
 if __name__ == "__main__":
     with app.app_context():
         seed_rooms()
         seed_users()
+        seed_rate_plans()
         print("Database seeding completed.")
\ No newline at end of file
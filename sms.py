@@ -79,4 +79,35 @@ def send_booking_cancellation_sms(booking):
     
     If this was a mistake, please contact us.
     """
-    return send_sms(booking.user.phone_number, message.strip())
\ No newline at end of file
+    return send_sms(booking.user.phone_number, message.strip())
+
+def send_group_booking_confirmation_sms(bookings):
+    """Send one confirmation SMS for all bookings of a group reservation."""
+    first = bookings[0]
+    rooms = ", ".join(f"{b.room.room_type.title()} ({b.room.room_number})" for b in bookings)
+    message = f"""
+    Group Booking Confirmed - Luxury Hotel
+    
+    Rooms: {rooms}
+    Check-in: {first.check_in_date.strftime('%b %d, %Y')}
+    Check-out: {first.check_out_date.strftime('%b %d, %Y')}
+    Guests: {sum(b.guests for b in bookings)}
+    Total: ${sum(b.total_price for b in bookings):.2f}
+    
+    Welcome to Luxury Hotel!
+    """
+    return send_sms(first.user.phone_number, message.strip())
+
+def send_waitlist_offer_sms(entry):
+    """Tell a waitlisted guest that a matching room is free again."""
+    message = f"""
+    Room Available - Luxury Hotel
+    
+    A {entry.offered_room.room_type.title()} room ({entry.offered_room.room_number}) is free for your dates:
+    Check-in: {entry.check_in_date.strftime('%b %d, %Y')}
+    Check-out: {entry.check_out_date.strftime('%b %d, %Y')}
+    Guests: {entry.guests}
+    
+    Book soon, rooms go to the first guest to book.
+    """
+    return send_sms(entry.user.phone_number, message.strip())
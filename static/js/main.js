@@ -32,6 +32,11 @@ document.addEventListener('DOMContentLoaded', function() {
                 checkAvailability();
             }
         });
+
+        // Dates prefilled from a flexible search result
+        if (checkInDate.value && checkOutDate.value) {
+            checkAvailability();
+        }
     }
 
     // Function to check room availability
@@ -75,6 +80,46 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Give every page load its own idempotency key, so a page served from the
+    // browser cache after a 304 never replays an earlier booking request.
+    // Double submissions from the same page load still share a key.
+    document.querySelectorAll('form input[name="idempotency_key"]').forEach(function(keyInput) {
+        if (window.crypto && crypto.randomUUID) {
+            keyInput.value = crypto.randomUUID().replace(/-/g, '');
+        }
+
+        // Prevent double submission while the request is in flight
+        keyInput.form.addEventListener('submit', function() {
+            keyInput.form.querySelectorAll('button[type="submit"], input[type="submit"]').forEach(function(button) {
+                button.disabled = true;
+            });
+        });
+    });
+
+    // Tell people on the registration form right away when a username or email is taken
+    document.querySelectorAll('input[data-availability-url]').forEach(function(input) {
+        const feedback = document.createElement('div');
+        feedback.className = 'invalid-feedback';
+        input.insertAdjacentElement('afterend', feedback);
+
+        input.addEventListener('change', function() {
+            const value = input.value.trim();
+            if (!value) {
+                return;
+            }
+            fetch(`${input.dataset.availabilityUrl}?${input.name}=${encodeURIComponent(value)}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (input.value.trim() !== value) {
+                        return;
+                    }
+                    input.classList.toggle('is-invalid', data.available === false);
+                    feedback.textContent = data.available === false ? `This ${input.name} is already in use.` : '';
+                })
+                .catch(error => console.error('Error checking availability:', error));
+        });
+    });
+
     // Initialize tooltips
     var tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'))
     var tooltipList = tooltipTriggerList.map(function (tooltipTriggerEl) {
@@ -139,4 +184,45 @@ function initializeCharts() {
             }
         });
     }
+    
+    if (document.getElementById('paceChart')) {
+        const canvas = document.getElementById('paceChart');
+        const ctx = canvas.getContext('2d');
+        new Chart(ctx, {
+            type: 'line',
+            data: {
+                labels: JSON.parse(canvas.dataset.nights),
+                datasets: [{
+                    label: 'On the books',
+                    data: JSON.parse(canvas.dataset.onTheBooks),
+                    borderColor: 'rgb(54, 162, 235)',
+                    tension: 0.1
+                }, {
+                    label: 'Last year, same lead time',
+                    data: JSON.parse(canvas.dataset.lastYear),
+                    borderColor: 'rgb(201, 203, 207)',
+                    tension: 0.1
+                }, {
+                    label: 'Forecast',
+                    data: JSON.parse(canvas.dataset.forecast),
+                    borderColor: 'rgb(255, 159, 64)',
+                    borderDash: [5, 5],
+                    tension: 0.1
+                }]
+            },
+            options: {
+                responsive: true,
+                scales: {
+                    y: {
+                        beginAtZero: true
+                    }
+                },
+                plugins: {
+                    legend: {
+                        position: 'bottom',
+                    }
+                }
+            }
+        });
+    }
 }
@@ -0,0 +1,142 @@
+import os
+import io
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+from flask import current_app, request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+# Directories under static/ that make up the site's own assets (uploads and the like are left alone)
+ASSET_DIRS = ('css', 'js', 'img')
+
+# Built assets and the manifest mapping each asset to its fingerprinted copy, under static/
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+# File types worth storing gzip and brotli copies of; images are compressed already
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.map'}
+
+# Browser icons rendered from the project icon, by asset name and pixel size
+ICON_SOURCE = 'generated-icon.png'
+ICON_SIZES = {
+    'img/icon-32.png': 32,
+    'img/icon-180.png': 180,
+}
+
+# A fingerprinted file never changes, so browsers may keep it for a year without revalidating
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Asset name -> fingerprinted path under static/, e.g. "css/style.css" -> "dist/css/style.3f2a9c1be07d.css"
+_manifest = {}
+
+def fingerprint(name, data):
+    """Insert a hash of the content into a file name, e.g. "js/main.js" -> "js/main.0c4f1e2ab39d.js"."""
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+def render_icon(source, size):
+    """Scale the project icon down to a browser icon and save it as an optimized PNG."""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        icon = image.convert('RGBA').resize((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    icon.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def build_assets(app):
+    """Write fingerprinted, precompressed copies of the static assets and their manifest.
+
+    Copies from earlier builds are kept, so pages still cached by browsers
+    or proxies can load the assets they refer to.
+
+    Returns:
+        dict: The new manifest
+    """
+    import brotli
+
+    static = app.static_folder
+    assets = {}
+    for directory in ASSET_DIRS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(static, directory)):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    assets[os.path.relpath(path, static).replace(os.sep, '/')] = f.read()
+    for name, size in ICON_SIZES.items():
+        assets[name] = render_icon(os.path.join(app.root_path, ICON_SOURCE), size)
+
+    manifest = {}
+    for name, data in sorted(assets.items()):
+        built = f"{BUILD_DIR}/{fingerprint(name, data)}"
+        path = os.path.join(static, built)
+        _write(path, data)
+        if os.path.splitext(name)[1] in COMPRESSIBLE:
+            for suffix, compressed in (('.gz', gzip.compress(data, 9, mtime=0)), ('.br', brotli.compress(data, quality=11))):
+                if len(compressed) < len(data):
+                    _write(path + suffix, compressed)
+        manifest[name] = built
+        logger.info(f"Built {name} -> {built} ({len(data)} bytes)")
+
+    _write(os.path.join(static, BUILD_DIR, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _manifest.clear()
+    _manifest.update(manifest)
+    return manifest
+
+def load_manifest(app):
+    """Read the manifest of the last build, if there was one."""
+    _manifest.clear()
+    try:
+        with open(os.path.join(app.static_folder, BUILD_DIR, MANIFEST)) as f:
+            _manifest.update(json.load(f))
+    except FileNotFoundError:
+        logger.info("No built static assets, serving the source files")
+    return _manifest
+
+def has_asset(name):
+    """Whether a static asset is available, built or in the source tree."""
+    return name in _manifest or os.path.isfile(os.path.join(current_app.static_folder, name))
+
+def _fingerprinted_url(endpoint, values):
+    # Point url_for('static', filename=...) at the fingerprinted copy when there is one
+    if endpoint == 'static' and values.get('filename') in _manifest:
+        values['filename'] = _manifest[values['filename']]
+
+def serve_static(filename):
+    """Serve static files, sending fingerprinted assets precompressed and cacheable forever."""
+    if not filename.startswith(f"{BUILD_DIR}/") or filename.endswith(('.gz', '.br')):
+        return current_app.send_static_file(filename)
+
+    path, encoding = filename, None
+    if os.path.splitext(filename)[1] in COMPRESSIBLE:
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[candidate] and os.path.isfile(os.path.join(current_app.static_folder, filename + suffix)):
+                path, encoding = filename + suffix, candidate
+                break
+
+    response = send_from_directory(current_app.static_folder, path, mimetype=mimetypes.guess_type(filename)[0], max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init_app(app):
+    """Serve the fingerprinted assets of the last `flask build-assets`.
+
+    Without a build, the app keeps serving the source files under their
+    own names with Flask's default caching.
+    """
+    load_manifest(app)
+    app.url_defaults(_fingerprinted_url)
+    app.view_functions['static'] = serve_static
+    app.jinja_env.globals['has_asset'] = has_asset
@@ -0,0 +1,35 @@
+import os
+import logging
+from jinja2 import FileSystemBytecodeCache
+
+logger = logging.getLogger(__name__)
+
+def precompile_templates(app):
+    """Compile every template into the bytecode cache, so no worker compiles one on first use.
+
+    Templates whose source has not changed since the last run are loaded
+    from the cache rather than compiled again.
+
+    Returns:
+        int: Number of templates compiled or found up to date
+    """
+    env = app.jinja_env
+    names = env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+def init_app(app):
+    """Keep compiled templates on disk, shared by every worker on the host.
+
+    Jinja checks each cached entry against a checksum of the template
+    source, so a changed template is compiled again rather than served
+    stale. Point JINJA_BYTECODE_CACHE_DIR at /dev/shm to keep the cache
+    in shared memory.
+    """
+    if not app.config.get('JINJA_BYTECODE_CACHE', True):
+        return
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    logger.info(f"Jinja bytecode cache in {directory}")
@@ -0,0 +1,104 @@
+import logging
+import threading
+from collections import defaultdict
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from availability_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Columns read on most requests through current_user
+CACHED_FIELDS = ('id', 'username', 'email', 'phone_number', 'is_admin', 'sms_notifications')
+
+user_cache = TTLCache(ttl=30)
+
+# Per-user generation counters, bumped after every committed change to the user
+_user_generations = defaultdict(int)
+_generations_lock = threading.Lock()
+
+
+class CachedUser(UserMixin):
+    """The logged-in user as served from the identity cache.
+
+    Carries the columns in CACHED_FIELDS. Anything else, such as
+    relationships or check_password, loads the real User row on first
+    use and is delegated to it.
+    """
+
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+        self._user = None
+
+    def _load(self):
+        from app import db
+        from models import User
+
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        user = self._load()
+        if user is None:
+            raise AttributeError(name)
+        return getattr(user, name)
+
+    def __repr__(self):
+        return f'<CachedUser {self.id} {self.username}>'
+
+
+def invalidate_user(user_id):
+    with _generations_lock:
+        _user_generations[user_id] += 1
+
+def load_cached_user(user_id):
+    """Return the user for Flask-Login, querying the database only on a cache miss.
+
+    The key includes the user's generation as read before the database
+    is queried, so a row loaded while the user is being changed is cached
+    under a key that is never read again.
+
+    Generations are per process, so other processes only see a change
+    once their entry expires. Admins are therefore never cached: every
+    admin request reads the row, and a demoted admin loses admin rights
+    in every process at once.
+    """
+    from app import db
+    from models import User
+
+    key = (user_id, _user_generations[user_id])
+    fields = user_cache.get(key)
+    if fields is None:
+        row = db.session.query(*(getattr(User, field) for field in CACHED_FIELDS)).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        fields = dict(zip(CACHED_FIELDS, row))
+        if not fields['is_admin']:
+            user_cache.set(key, fields)
+    return CachedUser(fields)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    from models import User
+
+    changed = session.info.setdefault('changed_user_ids', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('changed_user_ids', None)
+
+def init_app(app):
+    """Configure the user identity cache from the app config."""
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', user_cache.ttl)
+    user_cache.max_entries = app.config.get('USER_CACHE_MAX_ENTRIES', user_cache.max_entries)
@@ -30,18 +30,13 @@ def check_room_availability(room_id, check_in, check_out):
 
 def calculate_total_price(room_id, check_in, check_out):
     """Calculate total price for the booking"""
-    room = Room.query.get(room_id)
-    if not room:
-        return 0
-
     # Convert string dates to datetime if needed
     if isinstance(check_in, str):
         check_in = datetime.strptime(check_in, '%Y-%m-%d').date()
     if isinstance(check_out, str):
         check_out = datetime.strptime(check_out, '%Y-%m-%d').date()
 
-    delta = (check_out - check_in).days
-    return room.price_per_night * delta
+    return Booking.calculate_total_price(room_id, check_in, check_out)
 
 def send_booking_confirmation(booking):
     """Send booking confirmation email"""
@@ -0,0 +1,322 @@
+import queue
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# (room id, first freed night, night after the last freed night), filled after commit
+_freed_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def join_waitlist(user, room_type, check_in, check_out, guests):
+    """Put a guest on the waitlist for a stay, unless they are already waiting for it.
+
+    Returns:
+        tuple: (entry, created)
+    """
+    from app import db
+    from models import WaitlistEntry
+
+    entry = WaitlistEntry.query.filter_by(
+        user_id=user.id,
+        room_type=room_type or None,
+        check_in_date=check_in,
+        check_out_date=check_out,
+        guests=guests,
+        status='waiting'
+    ).first()
+    if entry:
+        return entry, False
+
+    entry = WaitlistEntry(
+        user_id=user.id,
+        room_type=room_type or None,
+        check_in_date=check_in,
+        check_out_date=check_out,
+        guests=guests
+    )
+    db.session.add(entry)
+    db.session.commit()
+    logger.info(f"Waitlist entry {entry.id}: {room_type or 'any room'} for {guests} guests, {check_in} to {check_out}")
+    return entry, True
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def match_freed_inventory(freed, today=None, exclude=()):
+    """Offer freed room-nights to the guests who have waited longest for them.
+
+    Only entries whose stay overlaps the freed nights are loaded, with a
+    range scan on the check-in date index, so the cost depends on the
+    nights freed rather than on the size of the waitlist. Each entry is
+    checked against the room's current bookings and outstanding offers:
+    nights offered to one guest are not offered to another until that
+    offer expires or is lost (see expire_offers).
+
+    Args:
+        freed: Iterable of (room id, first freed night, night after the last freed night)
+        today: Reference date, defaults to today
+        exclude: IDs of entries not to offer anything this time
+
+    Returns:
+        list: The entries that received an offer
+    """
+    from app import db
+    from models import Room, WaitlistEntry
+    from occupancy import occupancy_matrix
+
+    today = today or date.today()
+    max_nights = timedelta(days=current_app.config.get('WAITLIST_MAX_NIGHTS', 30))
+    by_room = defaultdict(list)
+    for room_id, start, end in freed:
+        by_room[room_id].append((max(start, today), end))
+
+    offered = []
+    for room_id, ranges in by_room.items():
+        room = db.session.get(Room, room_id)
+        if not room:
+            continue
+        for start, end in _merge_ranges(ranges):
+            if start >= end:
+                continue
+
+            # Waiting stays may reach past the freed nights into nights that were already free
+            window_start = max(start - max_nights, today)
+            window_end = end + max_nights
+            occupied = occupancy_matrix([room.id], window_start, window_end)[0]
+            for offer in WaitlistEntry.query.filter(
+                WaitlistEntry.status == 'offered',
+                WaitlistEntry.offered_room_id == room.id,
+                WaitlistEntry.check_in_date < window_end,
+                WaitlistEntry.check_out_date > window_start
+            ):
+                occupied[max((offer.check_in_date - window_start).days, 0):(offer.check_out_date - window_start).days] = True
+
+            candidates = WaitlistEntry.query.filter(
+                WaitlistEntry.status == 'waiting',
+                WaitlistEntry.check_in_date >= window_start,
+                WaitlistEntry.check_in_date < end,
+                WaitlistEntry.check_out_date > start,
+                WaitlistEntry.check_out_date <= window_end,
+                WaitlistEntry.guests <= room.capacity,
+                db.or_(WaitlistEntry.room_type == room.room_type, WaitlistEntry.room_type.is_(None))
+            ).order_by(WaitlistEntry.created_at, WaitlistEntry.id).all()
+
+            for entry in candidates:
+                first = (entry.check_in_date - window_start).days
+                last = (entry.check_out_date - window_start).days
+                if entry.id in exclude or occupied[first:last].any():
+                    continue
+
+                # Claim the entry, so another process matching the same nights can't offer it too
+                claimed = WaitlistEntry.query.filter_by(id=entry.id, status='waiting').update({
+                    'status': 'offered',
+                    'offered_room_id': room.id,
+                    'offered_at': datetime.utcnow()
+                }, synchronize_session=False)
+                if claimed:
+                    occupied[first:last] = True
+                    offered.append(entry.id)
+
+    db.session.commit()
+    entries = WaitlistEntry.query.filter(WaitlistEntry.id.in_(offered)).all() if offered else []
+    if entries:
+        logger.info(f"Waitlist: {len(entries)} offers for {len(by_room)} rooms with freed nights")
+    return entries
+
+def notify_offers(entries):
+    """Tell guests that a room they waited for is free again."""
+    from app import db
+    from routes.booking import send_waitlist_offer
+    from sms import send_waitlist_offer_sms
+
+    for entry in entries:
+        try:
+            send_waitlist_offer(entry)
+            if entry.user.sms_notifications and entry.user.phone_number:
+                send_waitlist_offer_sms(entry)
+            entry.notified_at = datetime.utcnow()
+        except Exception as e:
+            logger.error(f"Failed to send waitlist offer for entry {entry.id}: {e}")
+    db.session.commit()
+
+def rematch_waitlist():
+    """Match every waiting entry against all rooms, e.g. after a restart lost queued work.
+
+    Returns:
+        int: Number of offers made
+    """
+    from app import db
+    from models import Room, WaitlistEntry
+
+    expire_offers()
+    today = date.today()
+    last_night = db.session.query(db.func.max(WaitlistEntry.check_out_date)).filter(
+        WaitlistEntry.status == 'waiting'
+    ).scalar()
+    if not last_night or last_night <= today:
+        return 0
+
+    entries = match_freed_inventory([(room.id, today, last_night) for room in Room.query.all()], today)
+    notify_offers(entries)
+    return len(entries)
+
+def expire_offers(now=None):
+    """Put offers that lapsed or were lost back on the waitlist, and offer their nights again.
+
+    An offer doesn't hold the room. It lapses after WAITLIST_OFFER_TTL_HOURS,
+    and is lost as soon as someone else books the room for any of its
+    nights. Either way the entry goes back to waiting and the nights are
+    matched again, so the next guest in line gets them and the guest who
+    missed out can be offered another room. Offers the guest took up by
+    booking the room are marked booked.
+
+    Every worker runs this, so each change is claimed with a conditional
+    update on the offer as it was read. An offer another process has
+    already put back, or offered again, is left alone.
+
+    Returns:
+        int: Number of offers put back on the waitlist
+    """
+    from app import db
+    from models import Room, Booking, WaitlistEntry
+
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(hours=current_app.config.get('WAITLIST_OFFER_TTL_HOURS', 24))
+    freed = []
+    lapsed = []
+    returned = 0
+    for entry in WaitlistEntry.query.filter(WaitlistEntry.status == 'offered').all():
+        taken_by = [user_id for (user_id,) in db.session.query(Booking.user_id).filter(
+            Booking.room_id == entry.offered_room_id,
+            Booking.check_in_date < entry.check_out_date,
+            Booking.check_out_date > entry.check_in_date,
+            Booking.booking_status != 'canceled'
+        )]
+        seen = WaitlistEntry.query.filter_by(id=entry.id, status='offered', offered_at=entry.offered_at)
+        if entry.user_id in taken_by:
+            seen.update({'status': 'booked'}, synchronize_session=False)
+            continue
+        if not taken_by and entry.offered_at > cutoff:
+            continue
+
+        claimed = seen.update({
+            'status': 'waiting',
+            'offered_room_id': None,
+            'offered_at': None,
+            'notified_at': None
+        }, synchronize_session=False)
+        if not claimed:
+            continue
+        if taken_by:
+            # Lost: look for the guest's stay in every other room they would take
+            rooms = Room.query.filter(Room.capacity >= entry.guests)
+            if entry.room_type:
+                rooms = rooms.filter(Room.room_type == entry.room_type)
+            freed.extend((room.id, entry.check_in_date, entry.check_out_date) for room in rooms)
+        else:
+            freed.append((entry.offered_room_id, entry.check_in_date, entry.check_out_date))
+            lapsed.append(entry.id)
+        returned += 1
+    db.session.commit()
+
+    if returned:
+        logger.info(f"Waitlist: {returned} offers lapsed or lost, matching their nights again")
+        # The next guests in line come first; a lapsed offer is only renewed if nobody else can use the nights
+        entries = match_freed_inventory(freed, exclude=set(lapsed))
+        notify_offers(entries + match_freed_inventory(freed))
+    return returned
+
+def _run_worker(app):
+    """Match freed nights off the request path, a batch at a time, and expire offers when idle."""
+    interval = app.config.get('WAITLIST_EXPIRY_INTERVAL', 300)
+    while True:
+        try:
+            batch = [_freed_queue.get(timeout=interval)]
+        except queue.Empty:
+            try:
+                with app.app_context():
+                    expire_offers()
+            except Exception as e:
+                logger.error(f"Error expiring waitlist offers: {e}")
+            continue
+        while True:
+            try:
+                batch.append(_freed_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with app.app_context():
+                notify_offers(match_freed_inventory(batch))
+        except Exception as e:
+            logger.error(f"Error matching waitlist entries: {e}")
+        finally:
+            for _ in batch:
+                _freed_queue.task_done()
+
+def _ensure_worker(app):
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, args=(app,), name='waitlist-matcher', daemon=True)
+            _worker.start()
+
+def _freed_by(booking, deleted):
+    """Return the (room id, check-in, check-out) a flushed booking no longer occupies, if any."""
+    if deleted:
+        return booking.room_id, booking.check_in_date, booking.check_out_date
+
+    attrs = inspect(booking).attrs
+    status = attrs.booking_status.history
+    if booking.booking_status == 'canceled' and status.added and 'canceled' not in status.deleted:
+        return booking.room_id, booking.check_in_date, booking.check_out_date
+
+    room_id, check_in, check_out = attrs.room_id.history, attrs.check_in_date.history, attrs.check_out_date.history
+    if room_id.deleted or check_in.deleted or check_out.deleted:
+        # The old stay may overlap the new one; matching checks what is really free
+        return (
+            room_id.deleted[0] if room_id.deleted else booking.room_id,
+            check_in.deleted[0] if check_in.deleted else booking.check_in_date,
+            check_out.deleted[0] if check_out.deleted else booking.check_out_date
+        )
+    return None
+
+@event.listens_for(Session, 'after_flush')
+def _collect_freed_inventory(session, flush_context):
+    from models import Booking
+
+    freed = session.info.setdefault('freed_inventory', [])
+    for obj in session.dirty:
+        if isinstance(obj, Booking):
+            released = _freed_by(obj, deleted=False)
+            if released:
+                freed.append(released)
+    for obj in session.deleted:
+        if isinstance(obj, Booking) and obj.booking_status != 'canceled':
+            freed.append(_freed_by(obj, deleted=True))
+
+@event.listens_for(Session, 'after_commit')
+def _queue_freed_inventory(session):
+    freed = session.info.pop('freed_inventory', None)
+    if not freed or not has_app_context():
+        return
+    for item in freed:
+        _freed_queue.put(item)
+    _ensure_worker(current_app._get_current_object())
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_freed_inventory(session):
+    session.info.pop('freed_inventory', None)